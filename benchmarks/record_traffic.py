@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Records ``AgentRequest`` batches of a running agent into a fixture file.
+
+Agent's sqlite buffer is polled, rows not seen before are collected into
+250-row batches and appended to the fixture. Shipper removes rows once they
+are sent, so poll interval has to be shorter than the time rows stay in the
+buffer (about a second).
+
+Usage::
+
+    $ python benchmarks/record_traffic.py --db .agentdata.db --duration 600 \\
+        benchmarks/fixtures/myhost.jsonl
+'''
+import argparse
+import sqlite3
+import time
+
+# Import position: `traffic` sets up the path.
+# pylint: disable=C0411
+from traffic import BATCH_SIZE, rows_to_batch, write_batch
+
+
+def record(conn, fixture, duration, interval):
+    '''
+    Polls ``conn`` buffer for ``duration`` seconds and writes batches to
+    ``fixture``.
+
+    :returns: number of recorded rows
+    '''
+    seen = set()
+    pending = []
+    recorded = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        rows = conn.execute('SELECT * FROM sensordata ORDER BY stamp').fetchall()
+        # Rows are never added back once sent, so only keys still present in
+        # the buffer need to be remembered.
+        current = set()
+        for row in rows:
+            key = row[:3]
+            current.add(key)
+            if key not in seen:
+                pending.append(row)
+        seen = current
+
+        while len(pending) >= BATCH_SIZE:
+            write_batch(fixture, rows_to_batch(pending[:BATCH_SIZE]))
+            del pending[:BATCH_SIZE]
+            recorded += BATCH_SIZE
+        time.sleep(interval)
+
+    if pending:
+        write_batch(fixture, rows_to_batch(pending))
+        recorded += len(pending)
+    return recorded
+
+
+def main():
+    '''Records fixture.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('fixture', help='file to append batches to')
+    parser.add_argument('--db', default='.agentdata.db', help="agent's sqlite buffer")
+    parser.add_argument('--duration', type=float, default=300, help='seconds to record')
+    parser.add_argument('--interval', type=float, default=0.2, help='poll interval')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        with open(args.fixture, 'a') as fixture:
+            recorded = record(conn, fixture, args.duration, args.interval)
+    finally:
+        conn.close()
+    print 'Recorded {} rows into {}'.format(recorded, args.fixture)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Serialization benchmark over recorded agent traffic.
+
+Every serializer from ``SERIALIZERS_REGISTRY`` is run with every compression
+level over ``AgentRequest`` batches (see ``traffic.py``). For each case it
+reports:
+
+* encode throughput - serialize and compress, chunks/s and MB/s of output,
+* decode throughput - decompress and deserialize, chunks/s,
+* ``objects`` - gc-tracked objects held by decoded batches, per chunk,
+* ``peak_kb`` - peak RSS growth over the whole case,
+* ``bytes`` - compressed size, also per chunk.
+
+Each case runs in a separate process, so peak memory does not leak between
+cases. Results go to a JSON file; pass a previous one with ``--compare`` to
+see relative changes.
+
+Usage::
+
+    $ python benchmarks/serialization.py [--levels 0 1 6 9] [--output FILE]
+        [--compare FILE] [--db .agentdata.db] [FIXTURE ...]
+'''
+import argparse
+import gc
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import time
+import zlib
+
+# Import position: `traffic` sets up the path.
+# pylint: disable=C0411
+from traffic import load_batches
+from whmonit.common.serialization.registry import SERIALIZERS_REGISTRY
+
+
+def best_time(func, repeat):
+    '''Returns the best of ``repeat`` wall clock timings of ``func()``.'''
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_case(signature, level, batches, repeat):
+    '''
+    Measures single (serializer, compression level) case.
+
+    :returns: dict with results
+    '''
+    serializer = SERIALIZERS_REGISTRY[signature]
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if level:
+        compress = lambda data: zlib.compress(data, level)
+        decompress = zlib.decompress
+    else:
+        compress = decompress = lambda data: data
+
+    def encode():
+        '''Batches as they would go to the wire.'''
+        return [compress(serializer.serialize(batch)) for batch in batches]
+
+    encoded = encode()
+
+    def decode():
+        '''Batches as collector would get them.'''
+        return [serializer.deserialize(decompress(data), 'AgentRequest') for data in encoded]
+
+    encode_time = best_time(encode, repeat)
+    decode_time = best_time(decode, repeat)
+
+    gc.collect()
+    objects = len(gc.get_objects())
+    decoded = decode()
+    objects = len(gc.get_objects()) - objects
+    assert sum(map(len, decoded)) == sum(map(len, batches))
+
+    chunks = sum(map(len, batches))
+    size = sum(map(len, encoded))
+    return {
+        'serializer': type(serializer).__name__,
+        'signature': signature,
+        'level': level,
+        'encode_chunks_per_s': chunks / encode_time,
+        'encode_mb_per_s': size / encode_time / 2 ** 20,
+        'decode_chunks_per_s': chunks / decode_time,
+        'objects_per_chunk': float(objects) / chunks,
+        'peak_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_kb,
+        'bytes': size,
+        'bytes_per_chunk': float(size) / chunks,
+    }
+
+
+def _run_case_process(queue, *args):
+    ''':func:`run_case` wrapper for child process.'''
+    queue.put(run_case(*args))
+
+
+def run_isolated(*args):
+    '''Runs :func:`run_case` in a forked process.'''
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_case_process, args=(queue,) + args)
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def git_commit():
+    '''Current commit hash or ``None`` outside of git checkout.'''
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_key(case):
+    '''Identifies case across results files.'''
+    return case['signature'], case['level']
+
+
+COLUMNS = (
+    ('encode_chunks_per_s', 'enc chunk/s', '{:>12.0f}'),
+    ('encode_mb_per_s', 'enc MB/s', '{:>9.2f}'),
+    ('decode_chunks_per_s', 'dec chunk/s', '{:>12.0f}'),
+    ('objects_per_chunk', 'obj/chunk', '{:>10.2f}'),
+    ('peak_kb', 'peak kB', '{:>8d}'),
+    ('bytes_per_chunk', 'B/chunk', '{:>8.1f}'),
+)
+
+
+def print_results(cases, previous=None):
+    '''Prints results table, with relative change to ``previous`` cases.'''
+    previous = dict((case_key(case), case) for case in previous or ())
+    print '{:<32} {:>5}'.format('serializer', 'zlib') + ''.join(
+        ' ' * (len(fmt.format(0)) - len(title)) + title for _, title, fmt in COLUMNS)
+    for case in cases:
+        line = '{:<32} {:>5}'.format(case['serializer'], case['level'])
+        for key, _, fmt in COLUMNS:
+            line += fmt.format(case[key])
+        print line
+        old = previous.get(case_key(case))
+        if old:
+            line = '{:<32} {:>5}'.format('', 'diff')
+            for key, _, fmt in COLUMNS:
+                change = (float(case[key]) / old[key] - 1) * 100 if old[key] else 0
+                line += ' ' * (len(fmt.format(0)) - 8) + '{:>+7.1f}%'.format(change)
+            print line
+
+
+def main():
+    '''Runs all cases and writes results.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('fixtures', nargs='*', help='recorded fixture files')
+    parser.add_argument('--db', help='agent sqlite buffer to read batches from')
+    parser.add_argument('--batches', type=int, default=40,
+                        help='number of synthetic batches, when there are no fixtures')
+    parser.add_argument('--levels', type=int, nargs='+', default=[0, 1, 6, 9],
+                        help='zlib compression levels, 0 means no compression')
+    parser.add_argument('--repeat', type=int, default=3, help='timing repetitions')
+    parser.add_argument('--output', default='serialization_results.json',
+                        help='results file')
+    parser.add_argument('--compare', help='previous results file')
+    args = parser.parse_args()
+
+    source, batches = load_batches(args.db, args.fixtures, args.batches)
+    if not batches:
+        parser.error('no data to serialize')
+
+    cases = [
+        run_isolated(signature, level, batches, args.repeat)
+        for signature in sorted(SERIALIZERS_REGISTRY.serializers)
+        for level in args.levels
+    ]
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as results:
+            previous = json.load(results)['cases']
+
+    print '{}: {} batches, {} chunks'.format(source, len(batches), sum(map(len, batches)))
+    print_results(cases, previous)
+
+    with open(args.output, 'w') as results:
+        json.dump({
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'source': source,
+            'batches': len(batches),
+            'chunks': sum(map(len, batches)),
+            'cases': cases,
+        }, results, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Size of ``AgentRequest`` batches serialized with JSON and columnar serializers.
+
+Batches are read from agent's sqlite buffer the way Shipper does (250 rows
+each), from recorded fixtures, or made up from typical sensor traffic when
+neither is available.
+
+Usage::
+
+    $ python benchmarks/serialization_ratio.py [--db .agentdata.db] [--zlib LEVEL] [FIXTURE ...]
+'''
+import argparse
+import zlib
+
+# Import position: `traffic` sets up the path.
+# pylint: disable=C0411
+from traffic import load_batches
+from whmonit.common.serialization.columnar import ColumnarTypeRegistrySerializer
+from whmonit.common.serialization.json import JSONTypeRegistrySerializer
+from whmonit.common.types import PRIMITIVE_TYPE_REGISTRY
+
+
+def main():
+    '''Serializes batches and prints total sizes.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('fixtures', nargs='*', help='recorded fixture files')
+    parser.add_argument('--db', help='agent sqlite buffer to read batches from')
+    parser.add_argument('--batches', type=int, default=40,
+                        help='number of synthetic batches')
+    parser.add_argument('--zlib', type=int, default=6, help='zlib compression level')
+    args = parser.parse_args()
+
+    serializers = (
+        JSONTypeRegistrySerializer(PRIMITIVE_TYPE_REGISTRY),
+        ColumnarTypeRegistrySerializer(PRIMITIVE_TYPE_REGISTRY),
+    )
+    source, batches = load_batches(args.db, args.fixtures, args.batches)
+    if not batches:
+        parser.error('no data to serialize')
+
+    sizes = {}
+    for serializer in serializers:
+        raw = compressed = 0
+        for batch in batches:
+            serialized = serializer.serialize(batch)
+            raw += len(serialized)
+            compressed += len(zlib.compress(serialized, args.zlib))
+        sizes[serializer.signature] = raw, compressed
+
+    base_raw, base_compressed = sizes[serializers[0].signature]
+    print '{}: {} batches, {} chunks'.format(source, len(batches), sum(map(len, batches)))
+    print '{:<32} {:>10} {:>7} {:>10} {:>7}'.format('serializer', 'bytes', 'ratio',
+                                                     'zlib', 'ratio')
+    for serializer in serializers:
+        raw, compressed = sizes[serializer.signature]
+        print '{:<32} {:>10} {:>7.2f} {:>10} {:>7.2f}'.format(
+            type(serializer).__name__,
+            raw, float(base_raw) / raw,
+            compressed, float(base_compressed) / compressed,
+        )
+
+
+if __name__ == '__main__':
+    main()
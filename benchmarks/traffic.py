@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+'''
+Agent traffic for serialization benchmarks.
+
+``AgentRequest`` batches come from agent's sqlite buffer, from fixture files
+written by ``record_traffic.py`` or are made up when neither is available.
+
+Fixture file holds one ``AgentRequest`` per line, serialized with
+``JSONTypeRegistrySerializer`` - its wire format never changes, so fixtures
+stay readable across commits.
+'''
+import glob
+import hashlib
+import os
+import sqlite3
+import sys
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Import position: path has to be set up first.
+# pylint: disable=C0413
+from whmonit.common.serialization.json import JSONTypeRegistrySerializer
+from whmonit.common.types import (
+    AgentRequest, AgentRequestChunk, ID, PRIMITIVE_TYPE_REGISTRY, StreamName,
+)
+
+
+#: Rows per batch, the same as Shipper sends.
+BATCH_SIZE = 250
+
+#: Default location of recorded fixtures.
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+SERIALIZER = JSONTypeRegistrySerializer(PRIMITIVE_TYPE_REGISTRY)
+
+
+def rows_to_batch(rows):
+    '''Builds ``AgentRequest`` from sqlite buffer rows, like Shipper does.'''
+    return AgentRequest(
+        AgentRequestChunk(
+            ID.interned(config_id), StreamName.interned(stream),
+            int(timestamp), SERIALIZER.unpack(str(result)),
+        )
+        for timestamp, config_id, stream, result in rows
+    )
+
+
+def buffer_batches(path):
+    '''Yields batches currently stored in agent's sqlite buffer.'''
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.execute('SELECT * FROM sensordata ORDER BY stamp DESC')
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            yield rows_to_batch(rows)
+    finally:
+        conn.close()
+
+
+def write_batch(fixture, batch):
+    '''Appends ``batch`` to open ``fixture`` file.'''
+    fixture.write(SERIALIZER.serialize(batch))
+    fixture.write('\n')
+
+
+def fixture_batches(path):
+    '''Yields batches stored in fixture file.'''
+    with open(path) as fixture:
+        for line in fixture:
+            if line.strip():
+                yield SERIALIZER.deserialize(line, 'AgentRequest')
+
+
+def fixture_paths(directory=FIXTURES_DIR):
+    '''Returns sorted fixture files found in ``directory``.'''
+    return sorted(glob.glob(os.path.join(directory, '*.jsonl')))
+
+
+def synthetic_batches(count):
+    '''
+    Yields batches of made up traffic: 20 sensors with a few float streams
+    each, sampled every 10 seconds, occasional error messages.
+    '''
+    random = Random(1234)
+    streams = []
+    for sensor in xrange(20):
+        config_id = ID(hashlib.sha1(str(sensor)).hexdigest())
+        for stream in ('default', 'read', 'write')[:random.randint(1, 3)]:
+            streams.append([config_id, StreamName(stream), random.uniform(0, 1000)])
+
+    timestamp = 1136171045000
+    for _ in xrange(count):
+        batch = AgentRequest()
+        while len(batch) < BATCH_SIZE:
+            timestamp += 10000
+            for stream in streams:
+                # Mix of gauges drifting a bit and counters standing still.
+                if random.random() < 0.5:
+                    stream[2] = round(stream[2] + random.uniform(-1, 1), 2)
+                batch.append(AgentRequestChunk(
+                    stream[0], stream[1], timestamp + random.randint(0, 3), stream[2],
+                ))
+            if random.random() < 0.05:
+                batch.append(AgentRequestChunk(
+                    streams[0][0], StreamName('error'), timestamp, 'Connection refused',
+                ))
+        yield AgentRequest(batch[:BATCH_SIZE])
+
+
+def load_batches(db=None, fixtures=None, synthetic=40):
+    '''
+    Returns ``(source description, list of batches)``.
+
+    Agent buffer ``db`` is used when given, then ``fixtures`` files (or all
+    fixtures from :data:`FIXTURES_DIR`), ``synthetic`` made up batches if
+    there are none.
+    '''
+    if db:
+        return db, list(buffer_batches(db))
+    fixtures = fixtures or fixture_paths()
+    if fixtures:
+        return ', '.join(fixtures), [
+            batch for path in fixtures for batch in fixture_batches(path)
+        ]
+    return 'synthetic', list(synthetic_batches(synthetic))
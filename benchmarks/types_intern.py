@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Per-row cost of building ``ID`` / ``StreamName`` values, the way Shipper
+does for every row of a 250-row batch read from the sqlite buffer.
+
+Usage::
+
+    $ python benchmarks/types_intern.py [--configs N] [--repeat N]
+'''
+import argparse
+import hashlib
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Import position: path has to be set up first.
+# pylint: disable=C0413
+from whmonit.common.types import ID, StreamName
+
+
+BATCH_SIZE = 250
+STREAMS = ('default', 'read_bytes', 'write_bytes', 'queue_depth', 'error')
+
+
+def make_batch(configs):
+    '''
+    Returns list of (config_id, stream) raw string pairs, cycling over
+    `configs` distinct config ids.
+    '''
+    config_ids = [hashlib.sha1(str(i)).hexdigest() for i in xrange(configs)]
+    return [
+        (config_ids[i % configs], STREAMS[i % len(STREAMS)])
+        for i in xrange(BATCH_SIZE)
+    ]
+
+
+def construct(batch):
+    '''Builds values with plain constructors.'''
+    for config_id, stream in batch:
+        ID(config_id)
+        StreamName(stream)
+
+
+def construct_interned(batch):
+    '''Builds values with intern cache.'''
+    for config_id, stream in batch:
+        ID.interned(config_id)
+        StreamName.interned(stream)
+
+
+def main():
+    '''Runs benchmark and prints per-row cost.'''
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--configs', type=int, default=300,
+                        help='distinct config_ids in the batch')
+    parser.add_argument('--repeat', type=int, default=2000,
+                        help='number of batches to time')
+    args = parser.parse_args()
+
+    batch = make_batch(args.configs)
+    for func in (construct, construct_interned):
+        best = min(timeit.repeat(
+            lambda: func(batch), repeat=5, number=args.repeat,
+        ))
+        print '{:<20} {:8.3f} us/row'.format(
+            func.__name__, best / args.repeat / BATCH_SIZE * 1e6,
+        )
+
+
+if __name__ == '__main__':
+    main()
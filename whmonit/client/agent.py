@@ -58,7 +58,7 @@ from whmonit.client.sensors.base import (
 )
 from whmonit.common.serialization.json import JSONTypeRegistrySerializer
 from whmonit.common.time import (
-    milliseconds_to_datetime, MillisecondTimestampRangeError
+    milliseconds_to_datetime, to_milliseconds, MillisecondTimestampRangeError
 )
 from whmonit.common.types import (
     AgentRequestChunk, AgentRequest, ID, StreamName, SensorConfig,
@@ -552,10 +552,13 @@ class Receiver(AgentInternal):
                         data = self.serializer.pack(msg['datatype'](msg['data']))
 
                         cursor = conn.cursor()
+                        # Timestamps are stored as milliseconds, either
+                        # passed by sensor as they are or converted from
+                        # `datetime` for legacy sensors.
                         cursor.execute(
                             'INSERT INTO sensordata (stamp, config_id, stream, '
                             'result) VALUES (?, ?, ?, ?)',
-                            [self.serializer.serialize(msg['timestamp']),
+                            [str(to_milliseconds(msg['timestamp'])),
                              msg['config_id'],
                              msg['stream_name'],
                              data]
@@ -607,9 +610,9 @@ class Shipper(AgentInternal):
                 data_to_remove = []
                 for timestamp, config_id, stream, result in data:
                     req = AgentRequestChunk(
-                        ID(config_id),
-                        StreamName(stream),
-                        self.serializer.deserialize(timestamp, 'datetime'),
+                        ID.interned(config_id),
+                        StreamName.interned(stream),
+                        int(timestamp),
                         self.serializer.unpack(result)
                     )
                     req_list.append(req)
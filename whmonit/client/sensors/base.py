@@ -9,6 +9,7 @@ from jsonschema import ValidationError
 
 from whmonit.common.enums import INTERNAL_SENSORS
 from whmonit.common.metaclasses import BaseCheckMeta, CheckException
+from whmonit.common.time import now_milliseconds
 from whmonit.common.types import PRIMITIVE_TYPE_REGISTRY
 from whmonit.common.validators import ValidatorWithDefault
 
@@ -173,6 +174,12 @@ class SensorBase(object):
 
     config_schema = {}
 
+    #: Stamp results with integer millisecond timestamps (see
+    #: :meth:`timestamp`) instead of :obj:`datetime.datetime` objects.
+    #: Integer timestamps are passed as they are through agent's queue,
+    #: buffer and serializer.
+    millisecond_timestamps = False
+
     @abstractproperty
     def name(self):
         '''Sensor's name. Max 32 chars, must match ^\\w{1,32}$'''
@@ -319,10 +326,20 @@ class SensorBase(object):
         '''
         raise NotImplementedError
 
+    def timestamp(self):
+        '''
+        Current time to stamp results with. Integer millisecond timestamp
+        if sensor sets :attr:`millisecond_timestamps`, naive UTC
+        :obj:`datetime.datetime` otherwise.
+        '''
+        if self.millisecond_timestamps:
+            return now_milliseconds()
+        return datetime.utcnow()
+
     def log(self, logmsg):
         '''This way sensors can pass diagnostics/error information.'''
         # TODO #1429: logmsg should have a format ex: (header, txt, stacktrace)
-        self.send_results(datetime.utcnow(), (('error', logmsg),))
+        self.send_results(self.timestamp(), (('error', logmsg),))
 
 
 class AdvancedSensorBase(SensorBase):
@@ -356,7 +373,7 @@ class TaskSensorBase(SensorBase):
 
     def run(self):
         '''Run a check.'''
-        runtime = datetime.utcnow()
+        runtime = self.timestamp()
         data = self.do_run()
         # please validate
         if data is not None:
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Control group (cgroup v2) resource usage and pressure stall sensor.
+'''
+import os
+import time
+
+from whmonit.client.sensors import TaskSensorBase
+from whmonit.client.sensors.counters import CounterDeltas, selected
+from whmonit.common.units import unit_reg
+
+#: Counters of ``cpu.stat``.
+CPU_FIELDS = (
+    'usage_usec', 'user_usec', 'system_usec', 'nr_periods', 'nr_throttled', 'throttled_usec',
+)
+#: Counters of ``io.stat``, summed over devices.
+IO_FIELDS = ('rbytes', 'wbytes', 'rios', 'wios')
+#: Lines of ``*.pressure`` files, as (resource, line).
+PRESSURE_FIELDS = (('cpu', 'some'), ('memory', 'some'), ('memory', 'full'), ('io', 'some'),
+                   ('io', 'full'))
+
+# Positions of counters in samples, see Sensor._read.
+USAGE, USER, SYSTEM, _, THROTTLED, THROTTLED_TIME, READ_BYTES, WRITE_BYTES, READS, WRITES, \
+    CPU_SOME, MEMORY_SOME, MEMORY_FULL, IO_SOME, IO_FULL = range(15)
+
+
+def parse_flat(data):
+    '''Parses flat keyed file (``cpu.stat``, ``memory.stat``) into dict.'''
+    values = {}
+    for line in data.splitlines():
+        fields = line.split()
+        if len(fields) == 2:
+            values[fields[0]] = int(fields[1])
+    return values
+
+
+def parse_io_stat(data):
+    '''Parses ``io.stat`` into dict of :data:`IO_FIELDS` summed over devices.'''
+    totals = dict.fromkeys(IO_FIELDS, 0)
+    for line in data.splitlines():
+        for field in line.split()[1:]:
+            key, _, value = field.partition('=')
+            if key in totals:
+                totals[key] += int(value)
+    return totals
+
+
+def parse_pressure(data):
+    '''
+    Parses ``*.pressure`` file into dict mapping ``some`` and ``full`` to
+    total stall time (in microseconds).
+    '''
+    totals = {}
+    for line in data.splitlines():
+        fields = line.split()
+        for field in fields[1:]:
+            key, _, value = field.partition('=')
+            if key == 'total':
+                totals[fields[0]] = int(value)
+    return totals
+
+
+def _read(path, name):
+    '''
+    Returns contents of cgroup file, ``None`` if it can't be read (e.g.
+    controller not enabled or kernel without pressure stall information).
+    '''
+    try:
+        with open(os.path.join(path, name), 'rb') as cgroupf:
+            return cgroupf.read()
+    except IOError:
+        return None
+
+
+class Sensor(TaskSensorBase):
+    '''
+    Control group sensor class.
+
+    Reads resource usage of cgroups in the unified (v2) hierarchy: CPU time
+    and throttling (``cpu.stat``), memory (``memory.current`` and
+    ``memory.stat``), I/O (``io.stat``) and pressure stall information
+    (``cpu.pressure``, ``memory.pressure``, ``io.pressure``). Cgroups are
+    named by path in the hierarchy (e.g. ``/system.slice/cron.service``),
+    selected by ``include`` and ``exclude`` glob patterns, up to ``depth``
+    levels below the root (which itself is not reported).
+
+    The hierarchy is scanned every ``rescan_interval`` seconds and when a
+    cgroup disappears, runs in between read files of cgroups found by the
+    last scan only, so hosts with thousands of cgroups stay cheap to
+    monitor.
+
+    Rates and percentages are computed from counters of the previous run,
+    so they are not reported by the first one, nor for a cgroup re-created
+    since. Percentages of CPU time are
+    of one CPU, stall percentages tell how much of the time some (or all)
+    tasks of the cgroup waited for the resource. They go to a ``;``
+    separated table, one row per cgroup, empty cells where the controller
+    is not enabled. Totals are summed over selected cgroups none of whose
+    ancestors is selected, as usage of a cgroup includes its descendants.
+    '''
+    # R0903: Too few public methods
+    # pylint: disable=R0903
+
+    name = 'cgroup'
+    streams = {
+        'count': {
+            'type': float,
+            'description': 'Number of cgroups selected.'
+        },
+        'cpu_percent': {
+            'type': float,
+            'description': 'Percentage of one CPU used by cgroups.',
+            'unit': '%'
+        },
+        'throttled_count': {
+            'type': float,
+            'description': 'Number of periods in which cgroups were throttled.'
+        },
+        'throttled_pct': {
+            'type': float,
+            'description': 'Percentage of time cgroups were throttled.',
+            'unit': '%'
+        },
+        'memory': {
+            'type': float,
+            'description': 'Memory used by cgroups.',
+            'unit': str(unit_reg.byte)
+        },
+        'read_rate': {
+            'type': float,
+            'description': 'Bytes read per second.',
+            'unit': str(unit_reg.byte / unit_reg.second)
+        },
+        'write_rate': {
+            'type': float,
+            'description': 'Bytes written per second.',
+            'unit': str(unit_reg.byte / unit_reg.second)
+        },
+        'read_iops': {
+            'type': float,
+            'description': 'Reads per second.',
+            'unit': str(unit_reg.second ** -1)
+        },
+        'write_iops': {
+            'type': float,
+            'description': 'Writes per second.',
+            'unit': str(unit_reg.second ** -1)
+        },
+        'cpu_pressure': {
+            'type': float,
+            'description': 'Highest percentage of time some tasks of a cgroup waited for CPU.',
+            'unit': '%'
+        },
+        'memory_pressure': {
+            'type': float,
+            'description': 'Highest percentage of time some tasks of a cgroup waited for memory.',
+            'unit': '%'
+        },
+        'io_pressure': {
+            'type': float,
+            'description': 'Highest percentage of time some tasks of a cgroup waited for I/O.',
+            'unit': '%'
+        },
+        'cgroups': {
+            'type': str,
+            'description': 'CPU, memory and I/O usage and pressure stalls of each cgroup.'
+        },
+    }
+    config_schema = {
+        '$schema': 'http://json-schema.org/schema#',
+        'type': 'object',
+        'properties': {
+            'include': {'type': 'array', 'items': {'type': 'string'}, 'default': []},
+            'exclude': {'type': 'array', 'items': {'type': 'string'}, 'default': []},
+            'depth': {'type': 'integer', 'minimum': 1, 'default': 2},
+            'rescan_interval': {'type': 'integer', 'minimum': 0, 'default': 60},
+        },
+        'additionalProperties': False
+    }
+
+    columns = (
+        'cgroup', 'cpu_percent', 'user_percent', 'system_percent', 'throttled_count',
+        'throttled_pct', 'memory', 'anon', 'file', 'read_rate', 'write_rate', 'read_iops',
+        'write_iops', 'cpu_some', 'memory_some', 'memory_full', 'io_some', 'io_full',
+    )
+
+    root = '/sys/fs/cgroup'
+    deltas = None
+    #: Names of cgroups selected by the last scan.
+    cgroups = None
+    #: Time of the last scan.
+    scanned = None
+
+    def _scan(self):
+        '''Returns sorted names of selected cgroups.'''
+        include, exclude = self.config['include'], self.config['exclude']
+        found = []
+        pending = [('', 1)]
+        while pending:
+            name, depth = pending.pop()
+            try:
+                entries = os.listdir(self.root + name)
+            except OSError:
+                # Removed while scanning.
+                continue
+            for entry in entries:
+                child = '{}/{}'.format(name, entry)
+                # Other entries are interface files.
+                if not os.path.isdir(self.root + child):
+                    continue
+                if selected(child, include, exclude):
+                    found.append(child)
+                if depth < self.config['depth']:
+                    pending.append((child, depth + 1))
+        return sorted(found)
+
+    def _read(self, name):
+        '''
+        Reads files of cgroup ``name``.
+
+        :returns: (inode, counters, (memory.current, anon, file)), memory
+            values ``None`` if memory controller is not enabled; ``None`` if
+            the cgroup is gone
+        '''
+        path = self.root + name
+        try:
+            inode = os.stat(path).st_ino
+        except OSError:
+            return None
+        cpu = _read(path, 'cpu.stat')
+        if cpu is None:
+            return None
+        cpu = parse_flat(cpu)
+        counters = [cpu.get(field, 0) for field in CPU_FIELDS]
+        io_stat = parse_io_stat(_read(path, 'io.stat') or '')
+        counters.extend(io_stat[field] for field in IO_FIELDS)
+        pressure = {}
+        for resource in ('cpu', 'memory', 'io'):
+            pressure[resource] = parse_pressure(_read(path, resource + '.pressure') or '')
+        counters.extend(pressure[resource].get(line, 0) for resource, line in PRESSURE_FIELDS)
+
+        current = _read(path, 'memory.current')
+        if current is None:
+            return inode, tuple(counters), (None, None, None)
+        stat = parse_flat(_read(path, 'memory.stat') or '')
+        return inode, tuple(counters), (int(current), stat.get('anon'), stat.get('file'))
+
+    @staticmethod
+    def _top(names):
+        '''Names of cgroups in ``names`` none of whose ancestors is in it.'''
+        names = set(names)
+        top = set()
+        for name in names:
+            parent = name.rpartition('/')[0]
+            while parent and parent not in names:
+                parent = parent.rpartition('/')[0]
+            if not parent:
+                top.add(name)
+        return top
+
+    def do_run(self):
+        '''Executes itself.'''
+        # R0914: Too many local variables
+        # pylint: disable=R0914
+        if not os.path.exists(os.path.join(self.root, 'cgroup.controllers')):
+            self.log('No cgroup v2 hierarchy at {}'.format(self.root))
+            return ()
+        if self.deltas is None:
+            self.deltas = CounterDeltas()
+        now = time.time()
+        if (self.cgroups is None or not self.scanned <= now <
+                self.scanned + self.config['rescan_interval']):
+            self.cgroups = self._scan()
+            self.scanned = now
+
+        elapsed = self.deltas.start(now)
+        if elapsed is not None and elapsed <= 0:
+            # Clock went back, no rates this time.
+            elapsed = None
+
+        samples = []
+        for name in self.cgroups:
+            sample = self._read(name)
+            if sample is None:
+                continue
+            inode, counters, memory = sample
+            # Cgroup re-created under the same name (e.g. service restarted)
+            # is a new one, with counters from zero.
+            delta = self.deltas.add((name, inode), counters)
+            samples.append((name, delta, memory))
+        if len(samples) < len(self.cgroups):
+            # Some are gone, look for new ones next time.
+            self.cgroups = None
+
+        top = self._top(name for name, _, _ in samples)
+        memory_total = [memory[0] for name, _, memory in samples
+                        if name in top and memory[0] is not None]
+        result = [('count', float(len(samples)))]
+        if memory_total:
+            result.append(('memory', float(sum(memory_total))))
+        if elapsed is None:
+            return tuple(result)
+
+        rows = []
+        for name, delta, memory in samples:
+            if delta is None:
+                continue
+            # Microseconds to percentage of elapsed time.
+            percent = [value / (elapsed * 1e4) for value in delta]
+            rows.append((name, (
+                percent[USAGE], percent[USER], percent[SYSTEM], float(delta[THROTTLED]),
+                percent[THROTTLED_TIME],
+            ) + memory + (
+                delta[READ_BYTES] / elapsed, delta[WRITE_BYTES] / elapsed,
+                delta[READS] / elapsed, delta[WRITES] / elapsed,
+            ) + tuple(percent[CPU_SOME:])))
+        if not rows:
+            return tuple(result)
+
+        # Without cgroup name.
+        columns = dict(zip(self.columns[1:], zip(*(row for _, row in rows))))
+        top_columns = dict(zip(self.columns[1:], zip(*(
+            row for name, row in rows if name in top
+        ))))
+        if top_columns:
+            # Not when top cgroups have no rates (e.g. just re-created).
+            result.extend(
+                (stream, sum(top_columns[stream])) for stream in (
+                    'cpu_percent', 'throttled_count', 'throttled_pct', 'read_rate',
+                    'write_rate', 'read_iops', 'write_iops',
+                )
+            )
+        result.extend((
+            ('cpu_pressure', max(columns['cpu_some'])),
+            ('memory_pressure', max(columns['memory_some'])),
+            ('io_pressure', max(columns['io_some'])),
+            ('cgroups', '\n'.join([';'.join(self.columns)] + [
+                ';'.join([name] + ['' if value is None else repr(float(value)) for value in row])
+                for name, row in rows
+            ] + [''])),
+        ))
+        return tuple(result)
@@ -0,0 +1,3 @@
+'''
+Sensor cgroup test __init__.
+'''
@@ -0,0 +1,197 @@
+'''
+Tests for whmonit.client.sensors.cgroup
+'''
+import time
+
+import pytest
+from mock import Mock
+
+from ..linux_01 import Sensor, parse_io_stat, parse_pressure
+
+
+def write_cgroup(root, name, usage, throttled, io_bytes, stall, memory=None):
+    '''Writes files of fake cgroup ``name`` (with controllers enabled if ``memory``).'''
+    cgroup = root.join(name)
+    cgroup.ensure(dir=True)
+    cgroup.join('cpu.stat').write(
+        'usage_usec {}\nuser_usec {}\nsystem_usec {}\n'
+        'nr_periods 10\nnr_throttled {}\nthrottled_usec {}\n'.format(
+            usage, usage // 2, usage // 2, throttled, throttled * 1000
+        )
+    )
+    cgroup.join('cgroup.procs').write('')
+    if memory is None:
+        return
+    cgroup.join('memory.current').write('{}\n'.format(memory))
+    cgroup.join('memory.stat').write('anon {}\nfile 0\n'.format(memory // 2))
+    cgroup.join('io.stat').write(
+        '8:0 rbytes={0} wbytes={0} rios=1 wios=1 dbytes=0 dios=0\n'
+        '8:16 rbytes={0} wbytes=0 rios=1 wios=0 dbytes=0 dios=0\n'.format(io_bytes)
+    )
+    for resource in ('cpu', 'memory', 'io'):
+        cgroup.join(resource + '.pressure').write(
+            'some avg10=0.00 avg60=0.00 avg300=0.00 total={}\n'
+            'full avg10=0.00 avg60=0.00 avg300=0.00 total={}\n'.format(stall, stall // 2)
+        )
+
+
+def write_tree(root, usage=0, throttled=0, io_bytes=0, stall=0):
+    '''
+    Writes fake hierarchy: ``/system.slice`` with two services (one with a
+    nested cgroup) and ``/user.slice`` without controllers enabled.
+    '''
+    root.join('cgroup.controllers').write('cpu io memory pids\n')
+    root.join('cpu.stat').write('usage_usec 1\n')
+    for name, memory in (('system.slice', 3000), ('system.slice/a.service', 1000),
+                         ('system.slice/b.service', 2000),
+                         ('system.slice/b.service/payload', 1000)):
+        write_cgroup(root, name, usage, throttled, io_bytes, stall, memory)
+    write_cgroup(root, 'user.slice', usage, throttled, io_bytes, stall)
+
+
+@pytest.fixture
+def sensor(tmpdir, monkeypatch):
+    '''Sensor reading fake hierarchy in `tmpdir`, clock in `sensor.clock`.'''
+    monkeypatch.setattr(Sensor, 'root', str(tmpdir))
+    clock = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+
+    def make(**config):
+        '''Makes sensor with `config`.'''
+        config['sampling_period'] = 10
+        sensor = Sensor(config, Mock(), None)
+        sensor.log = Mock()
+        sensor.clock = clock
+        return sensor
+    return make
+
+
+def rows(result):
+    '''Table of ``cgroups`` stream as dict of rows by cgroup.'''
+    lines = [line.split(';') for line in result['cgroups'].splitlines()]
+    assert lines[0] == list(Sensor.columns)
+    return dict((row[0], dict(zip(Sensor.columns, row))) for row in lines[1:])
+
+
+def test_parse():
+    ''' Counters of io.stat are summed over devices, pressure totals parsed. '''
+    assert parse_io_stat('8:0 rbytes=1 wbytes=2 rios=3 wios=4 dbytes=5 dios=6\n'
+                         '8:16 rbytes=10 wbytes=0 rios=1 wios=0\n') == {
+                             'rbytes': 11, 'wbytes': 2, 'rios': 4, 'wios': 4}
+    assert parse_pressure('some avg10=1.00 avg60=0.50 avg300=0.10 total=123\n'
+                          'full avg10=0.00 avg60=0.00 avg300=0.00 total=45\n') == {
+                              'some': 123, 'full': 45}
+
+
+class TestCgroup(object):
+    ''' Test cgroup sensor. '''
+
+    def test_rates(self, tmpdir, sensor):
+        ''' Rates are computed since previous run, totals of top cgroups only. '''
+        sensor = sensor()
+        write_tree(tmpdir)
+        result = dict(sensor.do_run())
+        assert result == {'count': 4, 'memory': 3000}
+
+        # 10 seconds later: 5 s of CPU, 1 s throttled and 2 s stalled.
+        write_tree(tmpdir, usage=5000000, throttled=1000, io_bytes=1000, stall=2000000)
+        sensor.clock[0] += 10
+        result = dict(sensor.do_run())
+        assert result['cpu_percent'] == 100
+        assert result['throttled_count'] == 2000
+        assert result['throttled_pct'] == 20
+        assert result['read_rate'] == 200
+        assert result['write_rate'] == 100
+        assert result['read_iops'] == result['write_iops'] == 0
+        assert result['memory'] == 3000
+        assert result['cpu_pressure'] == result['memory_pressure'] == 20
+
+        table = rows(result)
+        assert sorted(table) == [
+            '/system.slice', '/system.slice/a.service', '/system.slice/b.service', '/user.slice',
+        ]
+        row = table['/system.slice/a.service']
+        assert float(row['cpu_percent']) == 50
+        assert float(row['user_percent']) == 25
+        assert float(row['memory']) == 1000
+        assert float(row['anon']) == 500
+        assert float(row['io_full']) == 10
+        assert table['/user.slice']['memory'] == ''
+
+    def test_restart(self, tmpdir, sensor):
+        ''' Cgroup re-created under the same name has no rates until next run. '''
+        sensor = sensor(include=['/user.slice'])
+        write_tree(tmpdir, usage=6000000000)
+        sensor.do_run()
+
+        # Counters start over.
+        write_tree(tmpdir, usage=1000)
+        sensor.clock[0] += 10
+        assert 'cgroups' not in dict(sensor.do_run())
+        write_tree(tmpdir, usage=5001000)
+        sensor.clock[0] += 10
+        assert dict(sensor.do_run())['cpu_percent'] == 50
+
+        # New directory, counters happen to be higher.
+        tmpdir.join('user.slice').rename(tmpdir.join('old.slice'))
+        write_tree(tmpdir, usage=6000000000)
+        sensor.clock[0] += 10
+        assert 'cgroups' not in dict(sensor.do_run())
+        write_tree(tmpdir, usage=6005000000)
+        sensor.clock[0] += 10
+        assert dict(sensor.do_run())['cpu_percent'] == 50
+
+    def test_top_restarted(self, tmpdir, sensor):
+        ''' Totals are left out while top cgroups have no rates, table is sent. '''
+        sensor = sensor(include=['/system.slice', '/system.slice/a.service'])
+        write_tree(tmpdir, usage=1000000)
+        sensor.do_run()
+
+        write_tree(tmpdir, usage=2000000)
+        write_cgroup(tmpdir, 'system.slice', 0, 0, 0, 0, 3000)
+        sensor.clock[0] += 10
+        result = dict(sensor.do_run())
+        assert 'cpu_percent' not in result
+        assert sorted(rows(result)) == ['/system.slice/a.service']
+
+    def test_empty(self, tmpdir, sensor):
+        ''' Hierarchy without cgroups gives count only. '''
+        sensor = sensor()
+        tmpdir.join('cgroup.controllers').write('cpu io memory pids\n')
+        assert dict(sensor.do_run()) == {'count': 0}
+        sensor.clock[0] += 10
+        assert dict(sensor.do_run()) == {'count': 0}
+
+    def test_select(self, tmpdir, sensor):
+        ''' Cgroups are selected by patterns and depth. '''
+        write_tree(tmpdir)
+        assert dict(sensor(depth=3).do_run())['count'] == 5
+        assert dict(sensor(depth=1).do_run())['count'] == 2
+        result = dict(sensor(include=['/system.slice/*']).do_run())
+        assert result == {'count': 2, 'memory': 3000}
+        assert dict(sensor(exclude=['/user.slice*']).do_run())['count'] == 3
+
+    def test_rescan(self, tmpdir, sensor):
+        ''' Hierarchy is scanned again after interval or when a cgroup is gone. '''
+        sensor = sensor(rescan_interval=60)
+        write_tree(tmpdir)
+        assert dict(sensor.do_run())['count'] == 4
+
+        write_cgroup(tmpdir, 'machine.slice', 0, 0, 0, 0)
+        sensor.clock[0] += 10
+        assert dict(sensor.do_run())['count'] == 4
+        sensor.clock[0] += 50
+        assert dict(sensor.do_run())['count'] == 5
+
+        tmpdir.join('machine.slice').remove()
+        sensor.clock[0] += 10
+        assert dict(sensor.do_run())['count'] == 4
+        write_cgroup(tmpdir, 'machine.slice', 0, 0, 0, 0)
+        sensor.clock[0] += 10
+        assert dict(sensor.do_run())['count'] == 5
+
+    def test_no_hierarchy(self, sensor):
+        ''' Missing cgroup v2 hierarchy is logged. '''
+        sensor = sensor()
+        assert sensor.do_run() == ()
+        assert sensor.log.call_count == 1
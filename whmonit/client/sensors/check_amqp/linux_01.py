@@ -3,19 +3,45 @@
 '''
 Sensor that connects to amqp server and checks queue.
 '''
+import fnmatch
+import glob
+import time
+import urllib
+
 from whmonit.client.sensors import TaskSensorBase
 
 
 class Sensor(TaskSensorBase):
     """
     Sensor class that checks queue in amqp server using pika lib.
+
+    Connection and channel are kept open between runs and reopened when
+    lost. Heartbeats are turned off, as the connection is idle between
+    runs and the broker would close it for missed heartbeats. Each run
+    first handles what the broker sent meanwhile, a connection closed by
+    the broker (e.g. restarted) is opened again before any queue is
+    checked.
+
+    ``queue_name`` checks a single queue. ``queues`` is a list of names or
+    glob patterns; patterns are matched against queues listed by RabbitMQ
+    management API at ``management_url`` (listing is refreshed every
+    ``list_interval`` seconds). Depth and consumer count of each queue are
+    sent as a ``;`` separated table.
     """
     name = 'check_amqp'
     streams = {
         'queue_depth': {
             'type': float,
             'description': 'Depth of queue in amqp server.'
-        }
+        },
+        'consumers': {
+            'type': float,
+            'description': 'Number of consumers of queue in amqp server.'
+        },
+        'queues': {
+            'type': str,
+            'description': 'Depth and number of consumers of each queue.'
+        },
     }
     config_schema = {
         '$schema': 'http://json-schema.org/schema#',
@@ -33,46 +59,163 @@ class Sensor(TaskSensorBase):
             'user': {'type': 'string'},
             'password': {'type': 'string'},
             'queue_name': {'type': 'string'},
+            'queues': {'type': 'array', 'items': {'type': 'string'}, 'minItems': 1},
+            'management_url': {'type': 'string'},
+            'list_interval': {'type': 'integer', 'minimum': 1, 'default': 60},
         },
-        'required': ['host', 'user', 'password', 'queue_name'],
+        'required': ['host', 'user', 'password'],
         'additionalProperties': False
     }
 
+    connection = None
+    channel = None
+    _listed = None
+    _listed_at = None
+
+    def _connect(self):
+        '''Opens connection and channel, unless already open.'''
+        import pika
+
+        if self.connection is None or not self.connection.is_open:
+            credentials = pika.credentials.PlainCredentials(
+                self.config['user'],
+                self.config['password']
+            )
+            params = pika.ConnectionParameters(
+                host=self.config['host'],
+                port=self.config['port'],
+                virtual_host=self.config['vhost'],
+                credentials=credentials,
+                heartbeat_interval=0,
+            )
+            self.connection = pika.BlockingConnection(parameters=params)
+            self.channel = None
+        if self.channel is None or not self.channel.is_open:
+            self.channel = self.connection.channel()
+
+    def _service(self):
+        '''
+        Processes frames received since the last run, forgets the
+        connection if the broker closed it.
+        '''
+        import pika
+
+        if self.connection is None or not self.connection.is_open:
+            return
+        try:
+            self.connection.process_data_events(0)
+        except pika.exceptions.AMQPConnectionError:
+            self._disconnect()
+
+    def _disconnect(self):
+        '''Forgets the connection, closing it if still open.'''
+        import pika
+
+        if self.connection is not None and self.connection.is_open:
+            try:
+                self.connection.close()
+            except pika.exceptions.AMQPError:
+                pass
+        self.connection = self.channel = None
+
+    def _list_queues(self):
+        '''Returns names of queues in vhost, from management API.'''
+        import requests
+
+        now = time.time()
+        if self._listed is None or now - self._listed_at >= self.config['list_interval']:
+            response = requests.get(
+                '{}/api/queues/{}'.format(
+                    self.config['management_url'].rstrip('/'),
+                    urllib.quote(self.config['vhost'], safe=''),
+                ),
+                params={'columns': 'name'},
+                auth=(self.config['user'], self.config['password']),
+                timeout=5,
+            )
+            response.raise_for_status()
+            self._listed = [str(queue['name']) for queue in response.json()]
+            self._listed_at = now
+        return self._listed
+
+    def _queue_names(self):
+        '''Returns names of queues to check.'''
+        patterns = self.config['queues']
+        names = [name for name in patterns if not glob.has_magic(name)]
+        patterns = [pattern for pattern in patterns if glob.has_magic(pattern)]
+        if patterns:
+            if 'management_url' not in self.config:
+                self.log('Queue name patterns need management_url to list queues')
+            else:
+                listed = self._list_queues()
+                for pattern in patterns:
+                    matches = sorted(fnmatch.filter(listed, pattern))
+                    names.extend(name for name in matches if name not in names)
+        return names
+
+    def _declare(self, queue_name):
+        '''
+        Returns (message count, consumer count) of queue, ``None`` if
+        the queue does not exist. Reconnects once if connection was lost.
+        '''
+        import pika
+
+        for retry in (True, False):
+            try:
+                self._connect()
+                method = self.channel.queue_declare(queue=queue_name, passive=True).method
+                return method.message_count, method.consumer_count
+            except pika.exceptions.ChannelClosed as ccerr:
+                # Channel is closed by the server, it is reopened next time.
+                self.log(
+                    '{}: Queue {} does not exist in vhost {}'
+                    .format(str(ccerr), queue_name, self.config['vhost'])
+                )
+                return None
+            except pika.exceptions.ConnectionClosed:
+                self._disconnect()
+                if not retry:
+                    raise
+
     def do_run(self):
         '''
-        Connects to AMQP server and gets number of messages from given queue.
+        Connects to AMQP server and gets number of messages from given queues.
         '''
         import pika
-        credentials = pika.credentials.PlainCredentials(
-            self.config['user'],
-            self.config['password']
-        )
-        params = pika.ConnectionParameters(
-            host=self.config['host'],
-            port=self.config['port'],
-            virtual_host=self.config['vhost'],
-            credentials=credentials,
-        )
+        import requests
+
+        if 'queue_name' not in self.config and 'queues' not in self.config:
+            self.log('Either queue_name or queues has to be configured')
+            return ()
 
         try:
-            conn = pika.BlockingConnection(parameters=params)
-            channel = conn.channel()
-            queue = channel.queue_declare(queue=self.config['queue_name'], passive=True)
-            queue_depth = queue.method.message_count
+            self._service()
+            if 'queue_name' in self.config:
+                counts = self._declare(self.config['queue_name'])
+                if counts is None:
+                    return ()
+                return (
+                    ('queue_depth', float(counts[0])),
+                    ('consumers', float(counts[1])),
+                )
 
-            return (('queue_depth', float(queue_depth)),)
+            lines = ['queue;queue_depth;consumers']
+            for queue_name in self._queue_names():
+                counts = self._declare(queue_name)
+                if counts is not None:
+                    lines.append('{};{};{}'.format(queue_name, *counts))
+            return (('queues', '\n'.join(lines + [''])),)
         except pika.exceptions.ProbableAuthenticationError as paerr:
+            self._disconnect()
             self.log(
                 '{}: Incorrect user or password'.format(str(paerr))
             )
         except pika.exceptions.AMQPConnectionError as cerr:
+            self._disconnect()
             self.log(
                 '{}: Unable to connect with {}'
                 .format(str(cerr), self.config['host'])
             )
-        except pika.exceptions.ChannelClosed as ccerr:
-            self.log(
-                '{}: Queue {} does not exist in vhost {}'
-                .format(str(ccerr), self.config['queue_name'], self.config['vhost'])
-            )
-
+        except requests.RequestException as rerr:
+            self.log('{}: Unable to list queues'.format(rerr))
+        return ()
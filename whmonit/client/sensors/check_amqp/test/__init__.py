@@ -0,0 +1,3 @@
+'''
+Sensor check_amqp test __init__.
+'''
@@ -0,0 +1,129 @@
+'''
+Tests for whmonit.client.sensors.check_amqp
+'''
+import pika
+import pytest
+import requests
+from mock import Mock
+
+from ..linux_01 import Sensor
+
+
+class FakeChannel(object):
+    '''Channel of fake broker with `queues` mapping name to counts.'''
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.is_open = True
+
+    def queue_declare(self, queue, passive):
+        '''Passive declare, fails like the broker does.'''
+        assert passive
+        if self.broker.down:
+            self.broker.failed += 1
+            raise pika.exceptions.ConnectionClosed()
+        if queue not in self.broker.queues:
+            self.is_open = False
+            raise pika.exceptions.ChannelClosed(404, 'NOT_FOUND')
+        messages, consumers = self.broker.queues[queue]
+        return Mock(method=Mock(message_count=messages, consumer_count=consumers))
+
+
+class FakeBroker(object):
+    '''Counts connections made, `down` breaks current connection.'''
+
+    def __init__(self, queues):
+        self.queues = queues
+        self.down = False
+        self.closed = False
+        self.connections = 0
+        self.channels = 0
+        self.failed = 0
+
+    def connect(self, parameters):
+        '''Makes new connection.'''
+        assert parameters.host == 'broker'
+        assert parameters.heartbeat == 0
+        self.down = self.closed = False
+        self.connections += 1
+        return Mock(is_open=True, channel=self.channel,
+                    process_data_events=self.process_data_events)
+
+    def process_data_events(self, time_limit):
+        '''Tells that connection was `closed` by broker meanwhile.'''
+        assert time_limit == 0
+        if self.closed:
+            self.down = True
+            raise pika.exceptions.ConnectionClosed(320, 'CONNECTION_FORCED')
+
+    def channel(self):
+        '''Opens new channel.'''
+        self.channels += 1
+        return FakeChannel(self)
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    '''Fake broker with a few queues.'''
+    broker = FakeBroker({'jobs': (5, 2), 'jobs.retry': (1, 0), 'mail': (0, 1)})
+    monkeypatch.setattr(pika, 'BlockingConnection', broker.connect)
+    return broker
+
+
+def make_sensor(**config):
+    '''Makes sensor with `config`.'''
+    config.update(sampling_period=10, host='broker', user='guest', password='guest')
+    sensor = Sensor(config, Mock(), None)
+    sensor.log = Mock()
+    return sensor
+
+
+class TestCheckAmqp(object):
+    ''' Test check_amqp sensor. '''
+
+    def test_persistent(self, broker):
+        ''' Connection is kept between runs, reopened when lost. '''
+        sensor = make_sensor(queue_name='jobs')
+
+        for _ in xrange(3):
+            assert sensor.do_run() == (('queue_depth', 5.0), ('consumers', 2.0))
+        assert (broker.connections, broker.channels) == (1, 1)
+
+        broker.down = True
+        assert sensor.do_run() == (('queue_depth', 5.0), ('consumers', 2.0))
+        assert broker.connections == 2
+
+    def test_closed_by_broker(self, broker):
+        ''' Connection closed between runs is opened again before checking queue. '''
+        sensor = make_sensor(queue_name='jobs')
+        sensor.do_run()
+
+        # E.g. broker restarted.
+        broker.closed = True
+        assert sensor.do_run() == (('queue_depth', 5.0), ('consumers', 2.0))
+        assert broker.connections == 2
+        assert broker.failed == 0
+        assert not sensor.log.called
+
+    def test_missing_queue(self, broker):
+        ''' Channel closed by missing queue is reopened. '''
+        sensor = make_sensor(queues=['missing', 'mail'])
+
+        result = sensor.do_run()
+        assert result == (('queues', 'queue;queue_depth;consumers\nmail;0;1\n'),)
+        assert sensor.log.called
+        assert (broker.connections, broker.channels) == (1, 2)
+
+    def test_patterns(self, broker, monkeypatch):
+        ''' Patterns are matched against queues listed by management API. '''
+        get = Mock(return_value=Mock(json=lambda: [{'name': name} for name in broker.queues]))
+        monkeypatch.setattr(requests, 'get', get)
+        sensor = make_sensor(queues=['mail', 'jobs*'], management_url='http://broker:15672/')
+
+        lines = dict(sensor.do_run())['queues'].splitlines()
+        assert lines[1:] == ['mail;0;1', 'jobs;5;2', 'jobs.retry;1;0']
+        sensor.do_run()
+        get.assert_called_once_with(
+            'http://broker:15672/api/queues/%2F', params={'columns': 'name'},
+            auth=('guest', 'guest'), timeout=5,
+        )
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+'''
+Many DNS queries sent at once over UDP.
+
+All queries are sent before waiting for any response, each from its own
+socket, so a batch takes about as long as the slowest nameserver to answer.
+Responses are matched to queries by socket, source address and message id.
+'''
+import errno
+import select
+import socket
+import time
+
+DNS_PORT = 53
+
+
+class Result(object):
+    '''Outcome of a single query.'''
+    # R0903: Too few public methods
+    # pylint: disable=R0903
+
+    def __init__(self, latency=None, rcode=None, answers=None, error=None):
+        #: Seconds from sending query to getting response.
+        self.latency = latency
+        #: Response code, e.g. ``NOERROR`` or ``NXDOMAIN``.
+        self.rcode = rcode
+        #: Number of records in answer section.
+        self.answers = answers
+        self.error = error
+
+
+def _error(err):
+    '''Message of exception ``err``, some of dns ones have none.'''
+    return str(err) or err.__class__.__name__
+
+
+def _address(nameserver):
+    '''Returns (family, socket address) of ``nameserver`` on DNS port.'''
+    family, _, _, _, address = socket.getaddrinfo(
+        nameserver, DNS_PORT, 0, socket.SOCK_DGRAM
+    )[0]
+    return family, address
+
+
+def send_queries(queries, timeout):
+    '''
+    Sends ``queries`` (list of (name, record type, nameserver)) and waits up
+    to ``timeout`` seconds for responses.
+
+    :returns: list of :class:`Result`, in ``queries`` order
+    '''
+    # R0914: Too many local variables
+    # pylint: disable=R0914
+    import dns.exception
+    import dns.message
+    import dns.rcode
+
+    results = [None] * len(queries)
+    # Maps socket to (query index, message, address, time sent).
+    pending = {}
+    try:
+        for index, (name, rdtype, nameserver) in enumerate(queries):
+            try:
+                message = dns.message.make_query(name, rdtype)
+                family, address = _address(nameserver)
+                sock = socket.socket(family, socket.SOCK_DGRAM)
+            except (dns.exception.DNSException, socket.error) as err:
+                results[index] = Result(error=_error(err))
+                continue
+            sock.setblocking(0)
+            try:
+                sock.sendto(message.to_wire(), address)
+            except socket.error as err:
+                sock.close()
+                results[index] = Result(error=_error(err))
+                continue
+            pending[sock] = index, message, address, time.time()
+
+        deadline = time.time() + timeout
+        while pending:
+            wait = deadline - time.time()
+            if wait <= 0:
+                break
+            try:
+                ready = select.select(list(pending), (), (), wait)[0]
+            except select.error as err:
+                if err.args[0] == errno.EINTR:
+                    continue
+                raise
+            received = time.time()
+            for sock in ready:
+                index, message, address, sent = pending[sock]
+                try:
+                    data, source = sock.recvfrom(65535)
+                except socket.error as err:
+                    # E.g. ICMP port unreachable.
+                    results[index] = Result(error=_error(err))
+                else:
+                    if source[:2] != address[:2]:
+                        continue
+                    try:
+                        response = dns.message.from_wire(data)
+                    except dns.exception.DNSException:
+                        # Garbage, keep waiting for the answer.
+                        continue
+                    if not message.is_response(response):
+                        continue
+                    results[index] = Result(
+                        received - sent,
+                        dns.rcode.to_text(response.rcode()),
+                        sum(len(rrset) for rrset in response.answer),
+                    )
+                del pending[sock]
+                sock.close()
+    finally:
+        for sock in pending:
+            sock.close()
+    return [result or Result(error='timed out') for result in results]
@@ -3,14 +3,22 @@
 '''
 Check DNS sensor.
 '''
+import os
+import time
+
 from whmonit.client.sensors import TaskSensorBase
+from whmonit.common.units import unit_reg
 
 
 class Sensor(TaskSensorBase):
     '''
     Check DNS sensor class.
 
-    Use dns library to get response from dns service.
+    Use dns library to get response from dns service. Resolver is kept
+    between runs and configured again only when resolv.conf changes.
+
+    Many ``queries``, each to its own nameserver, are sent at once over UDP
+    (see :mod:`.batch`), results are sent as ``queries`` table.
     '''
     name = 'check_dns'
     streams = {
@@ -21,6 +29,24 @@ class Sensor(TaskSensorBase):
         'answer': {
             'type': str,
             'description': 'Answer from dns service.'
+        },
+        'latency': {
+            'type': float,
+            'description': 'Time from sending query to getting answer.',
+            'unit': str(unit_reg.second)
+        },
+        'rcode': {
+            'type': str,
+            'description': 'Response code, e.g. NOERROR or NXDOMAIN.'
+        },
+        'answer_count': {
+            'type': float,
+            'description': 'Number of records in answer.'
+        },
+        'queries': {
+            'type': str,
+            'description': 'Table of queries: '
+                           'name;type;nameserver;latency;rcode;answer_count;error.'
         }
     }
     config_schema = {
@@ -35,6 +61,23 @@ class Sensor(TaskSensorBase):
                 'type': 'string',
                 'description': 'DNS record type'
             },
+            'queries': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'name': {'type': 'string'},
+                        'type': {'type': 'string', 'default': 'A'},
+                        'nameserver': {
+                            'type': 'string',
+                            'description': 'first one from resolv.conf by default'
+                        }
+                    },
+                    'required': ['name'],
+                    'additionalProperties': False
+                },
+                'minItems': 1
+            },
             'timeout': {
                 'type': 'number',
                 'minimum': 0.5,
@@ -42,25 +85,45 @@ class Sensor(TaskSensorBase):
                 'description': 'query execution timeout'
             }
         },
-        'required': ['query', 'record_type'],
         'additionalProperties': False
     }
 
-    def do_run(self):
-        '''
-        Return answer from dns service, or information that query is invalid.
-        If record type is invalid raise SensorBaseError.
-        '''
-        from dns import resolver, exception
+    resolv_conf = '/etc/resolv.conf'
+    resolver = None
+    #: Inode, modification time and size of resolv.conf read by resolver.
+    _resolv_conf_stat = None
 
-        sensor_resolver = resolver.Resolver()
-        sensor_resolver.lifetime = self.config['timeout']
+    def _resolver(self):
+        '''Returns resolver, made again if resolv.conf changed.'''
+        from dns import resolver
 
         try:
-            answer = sensor_resolver.query(
+            info = os.stat(self.resolv_conf)
+            resolv_conf_stat = info.st_ino, info.st_mtime, info.st_size
+        except OSError:
+            resolv_conf_stat = None
+        if self.resolver is None or resolv_conf_stat != self._resolv_conf_stat:
+            self.resolver = resolver.Resolver(self.resolv_conf)
+            self.resolver.lifetime = self.config['timeout']
+            self._resolv_conf_stat = resolv_conf_stat
+        return self.resolver
+
+    def _query(self):
+        '''Resolves single ``query`` as before, timing it.'''
+        from dns import resolver, exception
+
+        started = time.time()
+        try:
+            answer = self._resolver().query(
                 qname=self.config['query'],
                 rdtype=self.config['record_type']
             )
+        except resolver.NXDOMAIN as ex:
+            return (
+                ('name', self.config['query']),
+                ('rcode', 'NXDOMAIN'),
+                ('error', str(ex))
+            )
         except exception.DNSException as ex:
             return (
                 ('name', self.config['query']),
@@ -68,5 +131,36 @@ class Sensor(TaskSensorBase):
             )
         return (
             ('name', str(answer.name)),
-            ('answer', str(answer.rrset))
+            ('answer', str(answer.rrset)),
+            ('latency', time.time() - started),
+            ('rcode', 'NOERROR'),
+            ('answer_count', float(len(answer.rrset)))
         )
+
+    def do_run(self):
+        '''
+        Return answer from dns service, or information that query is invalid.
+        If record type is invalid raise SensorBaseError.
+        '''
+        from .batch import send_queries
+
+        if 'queries' not in self.config:
+            if 'query' not in self.config or 'record_type' not in self.config:
+                return (('error', 'Either query and record_type or queries has to be configured.'),)
+            return self._query()
+
+        default = self._resolver().nameservers[0]
+        queries = [
+            (str(query['name']), str(query['type']), str(query.get('nameserver', default)))
+            for query in self.config['queries']
+        ]
+        results = send_queries(queries, self.config['timeout'])
+        lines = ['name;type;nameserver;latency;rcode;answer_count;error']
+        for query, result in zip(queries, results):
+            lines.append(';'.join(list(query) + [
+                '' if result.latency is None else repr(result.latency),
+                result.rcode or '',
+                '' if result.answers is None else str(result.answers),
+                (result.error or '').replace(';', ',').replace('\n', ' '),
+            ]))
+        return (('queries', '\n'.join(lines + [''])),)
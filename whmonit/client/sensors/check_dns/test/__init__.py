@@ -0,0 +1,3 @@
+'''
+Sensor check_dns test __init__.
+'''
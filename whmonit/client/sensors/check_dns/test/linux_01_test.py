@@ -0,0 +1,145 @@
+'''
+Tests for whmonit.client.sensors.check_dns
+'''
+import socket
+import threading
+
+import dns.message
+import dns.rcode
+import dns.rrset
+import pytest
+from mock import Mock
+
+from ..batch import send_queries
+from ..linux_01 import Sensor
+
+ZONE = {
+    ('example.com.', 'A'): ['192.0.2.1', '192.0.2.2'],
+    ('example.com.', 'MX'): ['10 mail.example.com.'],
+}
+
+
+class FakeNameserver(threading.Thread):
+    '''Answers queries from `ZONE`, after `delay` seconds when given.'''
+
+    def __init__(self):
+        super(FakeNameserver, self).__init__()
+        self.daemon = True
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(('127.0.0.1', 0))
+        self.address = self.socket.getsockname()
+        self.queries = []
+
+    def run(self):
+        while True:
+            try:
+                data, source = self.socket.recvfrom(4096)
+            except socket.error:
+                return
+            query = dns.message.from_wire(data)
+            question = query.question[0]
+            name = question.name.to_text()
+            rdtype = dns.rdatatype.to_text(question.rdtype)
+            self.queries.append((name, rdtype))
+            response = dns.message.make_response(query)
+            records = ZONE.get((name, rdtype))
+            if records is None:
+                response.set_rcode(dns.rcode.NXDOMAIN)
+            else:
+                response.answer.append(
+                    dns.rrset.from_text_list(name, 300, 'IN', rdtype, records)
+                )
+            self.socket.sendto(response.to_wire(), source)
+
+
+@pytest.fixture
+def nameserver(monkeypatch):
+    '''Fake nameserver, all queries go to its port.'''
+    server = FakeNameserver()
+    server.start()
+    monkeypatch.setattr('whmonit.client.sensors.check_dns.batch.DNS_PORT', server.address[1])
+    yield server
+    server.socket.close()
+
+
+@pytest.fixture
+def silent():
+    '''Nameserver not answering.'''
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.2', 0))
+    yield sock
+    sock.close()
+
+
+def make_sensor(tmpdir, **config):
+    '''Makes sensor with `config` and resolv.conf in `tmpdir`.'''
+    resolv_conf = tmpdir.join('resolv.conf')
+    resolv_conf.write('nameserver 127.0.0.1\n')
+    config.update(sampling_period=10)
+    sensor = Sensor(config, Mock(), None)
+    sensor.resolv_conf = str(resolv_conf)
+    return sensor
+
+
+def test_send_queries(nameserver):
+    ''' Responses are matched to queries. '''
+    results = send_queries([
+        ('example.com', 'A', '127.0.0.1'),
+        ('missing.example.com', 'A', '127.0.0.1'),
+        ('example.com', 'MX', '127.0.0.1'),
+        ('example.com', 'BOGUS', '127.0.0.1'),
+    ], 1.0)
+
+    assert [(result.rcode, result.answers) for result in results] == [
+        ('NOERROR', 2), ('NXDOMAIN', 0), ('NOERROR', 1), (None, None),
+    ]
+    assert all(result.latency < 1.0 for result in results[:3])
+    assert results[3].error == 'UnknownRdatatype'
+    assert len(nameserver.queries) == 3
+
+
+def test_send_queries_timeout(nameserver, silent, monkeypatch):
+    ''' Nameservers not answering do not hold up others. '''
+    monkeypatch.setattr('whmonit.client.sensors.check_dns.batch.DNS_PORT', silent.getsockname()[1])
+
+    results = send_queries([('example.com', 'A', '127.0.0.2')], 0.1)
+    assert results[0].error == 'timed out'
+
+
+class TestCheckDns(object):
+    ''' Test check_dns sensor. '''
+
+    def test_resolver_kept(self, tmpdir):
+        ''' Resolver is made again only when resolv.conf changes. '''
+        sensor = make_sensor(tmpdir, query='example.com', record_type='A')
+
+        resolver = sensor._resolver()
+        assert sensor._resolver() is resolver
+        assert resolver.nameservers == ['127.0.0.1']
+
+        tmpdir.join('resolv.conf').write('nameserver 127.0.0.2\nnameserver 127.0.0.3\n')
+        resolver = sensor._resolver()
+        assert resolver.nameservers == ['127.0.0.2', '127.0.0.3']
+        assert resolver.lifetime == 0.5
+
+    def test_queries(self, tmpdir, nameserver):
+        ''' Queries go to their nameservers, the first one by default. '''
+        sensor = make_sensor(tmpdir, queries=[
+            {'name': 'example.com'},
+            {'name': 'example.com', 'type': 'MX', 'nameserver': '127.0.0.1'},
+            {'name': 'missing.example.com'},
+        ])
+
+        rows = [line.split(';') for line in dict(sensor.do_run())['queries'].splitlines()]
+        assert rows[0] == ['name', 'type', 'nameserver', 'latency', 'rcode', 'answer_count', 'error']
+        assert [row[:3] + row[4:] for row in rows[1:]] == [
+            ['example.com', 'A', '127.0.0.1', 'NOERROR', '2', ''],
+            ['example.com', 'MX', '127.0.0.1', 'NOERROR', '1', ''],
+            ['missing.example.com', 'A', '127.0.0.1', 'NXDOMAIN', '0', ''],
+        ]
+
+    def test_nothing_to_query(self, tmpdir):
+        ''' Query has to be configured. '''
+        assert make_sensor(tmpdir, query='example.com').do_run() == (
+            ('error', 'Either query and record_type or queries has to be configured.'),
+        )
@@ -17,7 +17,7 @@ class Sensor(TaskSensorBase):
             'type': str,
             'description': 'FTP connection status text.'
         },
-        'connection_success': {
+        'connect_success': {
             'type': bool,
             'description': 'True if connection was successful, False otherwise.'
         }
@@ -44,18 +44,18 @@ class Sensor(TaskSensorBase):
         except ftplib.all_errors:
             return (
                 ('status_text', 'connection failed'),
-                ('connection_success', False)
+                ('connect_success', False)
             )
         try:
             ftp.login(user=self.config['user'], passwd=self.config['password'])
         except ftplib.all_errors:
             return (
                 ('status_text', 'login failed'),
-                ('connection_success', False)
+                ('connect_success', False)
             )
         finally:
             ftp.quit()
         return (
             ('status_text', 'connection success'),
-            ('connection_success', True)
+            ('connect_success', True)
         )
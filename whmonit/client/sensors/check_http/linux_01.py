@@ -6,6 +6,15 @@ Check HTTP sensor.
 from whmonit.client.sensors import TaskSensorBase
 from whmonit.common.units import unit_reg
 
+#: Streams of phase timings of single request, see :mod:`.timing`.
+PHASE_STREAMS = (
+    ('dns', 'dns_time'),
+    ('connect', 'connect_time'),
+    ('tls', 'tls_time'),
+    ('ttfb', 'ttfb'),
+)
+
+
 class Sensor(TaskSensorBase):
     '''
     Check HTTP sensor class.
@@ -14,6 +23,15 @@ class Sensor(TaskSensorBase):
     Arguments 'protocol', 'address' and 'port' are used to form a 'url'.
     All other arguments have the same meaning as described on
     http://docs.python-requests.org/en/latest/api/#requests.request.
+
+    Time of each phase of the request is sent: name resolution, connect, TLS
+    handshake, time to first byte and total time of reading the response.
+    With ``keep_alive`` connections are kept open between runs, phases of
+    connecting are skipped then, as they are for clients reusing
+    connections.
+
+    Many ``urls`` are requested concurrently (by ``concurrency`` threads),
+    results are sent as ``urls`` table.
     '''
 
     name = 'check_http'
@@ -30,6 +48,41 @@ class Sensor(TaskSensorBase):
             'type': float,
             'description': 'Response time.',
             'unit': str(unit_reg.second)
+        },
+        'dns_time': {
+            'type': float,
+            'description': 'Time of resolving host name.',
+            'unit': str(unit_reg.second)
+        },
+        'connect_time': {
+            'type': float,
+            'description': 'Time of establishing TCP connection.',
+            'unit': str(unit_reg.second)
+        },
+        'tls_time': {
+            'type': float,
+            'description': 'Time of TLS handshake.',
+            'unit': str(unit_reg.second)
+        },
+        'ttfb': {
+            'type': float,
+            'description': 'Time from sending request to receiving response headers.',
+            'unit': str(unit_reg.second)
+        },
+        'total_time': {
+            'type': float,
+            'description': 'Time from starting request to reading whole response.',
+            'unit': str(unit_reg.second)
+        },
+        'bytes': {
+            'type': float,
+            'description': 'Size of response body.',
+            'unit': str(unit_reg.byte)
+        },
+        'urls': {
+            'type': str,
+            'description': 'Table of requests: '
+                           'url;status_code;dns;connect;tls;ttfb;total;bytes;error.'
         }
     }
 
@@ -58,42 +111,96 @@ class Sensor(TaskSensorBase):
             'timeout': {
                 'type': 'number',
                 'minimum': 0,
+            },
+            'urls': {
+                'type': 'array',
+                'items': {'type': 'string'},
+                'minItems': 1,
+                'uniqueItems': True
+            },
+            'keep_alive': {
+                'type': 'boolean',
+                'default': False,
+                'description': 'Keep connections open between runs'
+            },
+            'concurrency': {
+                'type': 'integer',
+                'minimum': 1,
+                'default': 10,
+                'description': 'Number of urls requested at once'
             }
         },
-        'required': ['address'],
         'additionalProperties': False
     }
 
-    def do_run(self):
-        '''Returns info about a given HTTP service.'''
-        import requests
+    session = None
+    workers = None
+
+    def _urls(self):
+        '''Returns list of urls to request.'''
         from furl import furl
 
-        url = furl().set(
+        if 'urls' in self.config:
+            return self.config['urls']
+        if 'address' not in self.config:
+            return []
+        return [furl().set(
             scheme=self.config['protocol'],
             host=self.config['address'],
             port=self.config['port'],
             path=self.config['path'],
-        )
-        method = self.config['method']
+        ).url]
 
-        # Optional arguments for requests.request. The `requests.request` API
-        # interprets `None` as "use default value".
-        args = {
-            'timeout': self.config.get('timeout', None),
-        }
+    def _measure_all(self, urls):
+        '''Requests all ``urls``, see :func:`.timing.measure`.'''
+        from multiprocessing.pool import ThreadPool
+        from .timing import measure, timing_session
 
+        concurrency = min(self.config['concurrency'], len(urls))
+        session = self.session or timing_session(concurrency)
+        # The `requests.request` API interprets `None` as "use default value".
+        args = self.config['method'], self.config.get('timeout', None)
         try:
-            req = requests.request(method, url.url, **args)
-            return (
-                ('status_code', float(req.status_code)),
-                ('status_text', req.reason),
-                ('response_time', req.elapsed.total_seconds()),
-            )
-        except requests.exceptions.ConnectionError as err:
-            return (
-                ('status_code', float(err.args[0].reason.errno)),
-                ('status_text', err.args[0].reason.strerror),
-            )
-        except requests.exceptions.Timeout as err:
-            return (('status_text', 'Request timed out.'),)
+            if len(urls) == 1:
+                return [measure(session, args[0], urls[0], args[1])]
+            if self.workers is None:
+                self.workers = ThreadPool(self.config['concurrency'])
+            return self.workers.map(lambda url: measure(session, args[0], url, args[1]), urls)
+        finally:
+            if self.config['keep_alive']:
+                self.session = session
+            else:
+                session.close()
+
+    def do_run(self):
+        '''Returns info about a given HTTP service.'''
+        urls = self._urls()
+        if not urls:
+            return (('error', 'Either address or urls has to be configured.'),)
+        results = self._measure_all(urls)
+
+        if 'urls' in self.config:
+            lines = ['url;status_code;dns;connect;tls;ttfb;total;bytes;error']
+            for url, result in zip(urls, results):
+                values = [result.status_code] + [
+                    result.timings.get(phase) for phase, _ in PHASE_STREAMS
+                ] + [result.total, result.bytes]
+                lines.append(';'.join([str(url)] + [
+                    '' if value is None else repr(value) for value in values
+                ] + [(result.error or '').replace(';', ',').replace('\n', ' ')]))
+            return (('urls', '\n'.join(lines + [''])),)
+
+        result = results[0]
+        if result.error is not None:
+            return (('status_text', result.error),)
+        return tuple([
+            ('status_code', float(result.status_code)),
+            ('status_text', result.reason),
+            ('response_time', result.elapsed),
+        ] + [
+            (stream, result.timings[phase])
+            for phase, stream in PHASE_STREAMS if phase in result.timings
+        ] + [
+            ('total_time', result.total),
+            ('bytes', float(result.bytes)),
+        ])
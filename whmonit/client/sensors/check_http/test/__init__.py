@@ -0,0 +1,3 @@
+'''
+Sensor check_http test __init__.
+'''
@@ -0,0 +1,193 @@
+'''
+Tests for whmonit.client.sensors.check_http
+'''
+import socket
+import ssl
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+import pytest
+from mock import Mock
+
+from .. import timing
+from ..linux_01 import Sensor
+
+BODY = 'x' * 1000
+
+
+class Handler(BaseHTTPRequestHandler):
+    '''Keeps connections alive, counts them.'''
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def do_GET(self):
+        '''Sends `BODY`, not found for other paths.'''
+        # C0103: Invalid name
+        # pylint: disable=C0103
+        code = 200 if self.path in ('/', '/status') else 404
+        self.send_response(code)
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    '''HTTP server counting connections.'''
+    daemon_threads = True
+    connections = 0
+
+
+@pytest.fixture
+def server():
+    '''HTTP server on localhost.'''
+    httpd = Server(('localhost', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def https_server(tmpdir):
+    '''HTTPS server on localhost, with self-signed certificate.'''
+    from OpenSSL import crypto
+
+    key = crypto.PKey()
+    key.generate_key(crypto.TYPE_RSA, 2048)
+    cert = crypto.X509()
+    cert.get_subject().CN = 'localhost'
+    cert.set_serial_number(1)
+    cert.gmtime_adj_notBefore(0)
+    cert.gmtime_adj_notAfter(3600)
+    cert.set_issuer(cert.get_subject())
+    cert.set_pubkey(key)
+    cert.sign(key, 'sha256')
+    keyfile, certfile = tmpdir.join('key.pem'), tmpdir.join('cert.pem')
+    keyfile.write(crypto.dump_privatekey(crypto.FILETYPE_PEM, key))
+    certfile.write(crypto.dump_certificate(crypto.FILETYPE_PEM, cert))
+
+    httpd = Server(('localhost', 0), Handler)
+    httpd.socket = ssl.wrap_socket(
+        httpd.socket, str(keyfile), str(certfile), server_side=True,
+    )
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def closed_port():
+    '''Port nothing listens on.'''
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def make_sensor(**config):
+    '''Makes sensor with `config`.'''
+    config.update(sampling_period=10, timeout=2)
+    return Sensor(config, Mock(), None)
+
+
+class TestCheckHttp(object):
+    ''' Test check_http sensor. '''
+
+    def test_phases(self, server):
+        ''' Each phase of request is timed. '''
+        sensor = make_sensor(address='localhost', port=server.server_address[1])
+
+        result = dict(sensor.do_run())
+        assert result['status_code'] == 200.0
+        assert result['status_text'] == 'OK'
+        assert result['bytes'] == 1000.0
+        assert set(result) == set([
+            'status_code', 'status_text', 'response_time', 'dns_time', 'connect_time', 'ttfb',
+            'total_time', 'bytes',
+        ])
+        assert result['total_time'] >= result['ttfb']
+
+    def test_https_phases(self, https_server):
+        ''' Connecting and TLS handshake of HTTPS request are timed. '''
+        session = timing.timing_session()
+        # Self-signed, CA bundle from environment would be used otherwise.
+        session.verify = session.trust_env = False
+        url = 'https://localhost:{}/'.format(https_server.server_address[1])
+
+        result = timing.measure(session, 'get', url, 2)
+        assert result.error is None
+        assert result.status_code == 200
+        assert set(result.timings) == set(['dns', 'connect', 'tls', 'ttfb'])
+
+        # Kept alive.
+        assert set(timing.measure(session, 'get', url, 2).timings) == set(['ttfb'])
+
+    def test_address_fallback(self, server, monkeypatch):
+        ''' Next address of host is tried when connecting to one fails. '''
+        getaddrinfo = socket.getaddrinfo
+
+        def two_addresses(host, *args):
+            '''Resolves `twoaddresses` to refusing address and then to localhost.'''
+            if host != 'twoaddresses':
+                return getaddrinfo(host, *args)
+            # Server listens on 127.0.0.1 only.
+            return getaddrinfo('127.0.0.2', *args) + getaddrinfo('127.0.0.1', *args)
+        monkeypatch.setattr(socket, 'getaddrinfo', two_addresses)
+
+        result = dict(make_sensor(address='twoaddresses', port=server.server_address[1]).do_run())
+        assert result['status_code'] == 200.0
+        assert 'connect_time' in result
+
+    @pytest.mark.parametrize(('keep_alive', 'connections'), [(False, 3), (True, 1)])
+    def test_keep_alive(self, server, keep_alive, connections):
+        ''' Connection is reused between runs when kept alive. '''
+        sensor = make_sensor(
+            address='localhost', port=server.server_address[1], keep_alive=keep_alive,
+        )
+
+        results = [dict(sensor.do_run()) for _ in xrange(3)]
+        assert server.connections == connections
+        assert all(result['status_code'] == 200.0 for result in results)
+        assert ('connect_time' in results[-1]) != keep_alive
+
+    def test_urls(self, server):
+        ''' Many urls are requested at once. '''
+        base = 'http://localhost:{}'.format(server.server_address[1])
+        urls = [base + '/', base + '/status', base + '/missing']
+        urls.append('http://127.0.0.1:{}/'.format(closed_port()))
+        sensor = make_sensor(urls=urls, concurrency=2)
+
+        rows = [line.split(';') for line in dict(sensor.do_run())['urls'].splitlines()]
+        assert rows[0] == [
+            'url', 'status_code', 'dns', 'connect', 'tls', 'ttfb', 'total', 'bytes', 'error',
+        ]
+        assert [(row[0], row[1], row[4], row[7]) for row in rows[1:4]] == [
+            (url, status, '', '1000') for url, status in zip(urls, ['200', '200', '404'])
+        ]
+        assert rows[4][:2] == [urls[3], '']
+        assert 'Connection refused' in rows[4][-1]
+
+    def test_connection_refused(self):
+        ''' Error is sent as status text. '''
+        result = make_sensor(address='127.0.0.1', port=closed_port()).do_run()
+
+        assert result[0][0] == 'status_text'
+        assert 'Connection refused' in result[0][1]
+
+    def test_nothing_to_request(self):
+        ''' Address has to be configured. '''
+        assert make_sensor().do_run() == (
+            ('error', 'Either address or urls has to be configured.'),
+        )
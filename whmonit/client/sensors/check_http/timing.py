@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+'''
+HTTP requests with time of each phase measured.
+
+:class:`TimingAdapter` makes :mod:`requests` use connections recording how
+long name resolution, TCP connect and TLS handshake took, and the time to
+first byte (from connection being ready to response headers received).
+Connections kept alive in the pool skip the first three phases. Like
+:func:`socket.create_connection`, all addresses of the host are tried in
+turn until one accepts the connection.
+'''
+import socket
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3 import connection, connectionpool, poolmanager
+from requests.packages.urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+
+class TimingMixin(object):
+    '''
+    For urllib3 connections, records phases of the last request in
+    :attr:`timings`.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TimingMixin, self).__init__(*args, **kwargs)
+        #: Maps phase to seconds.
+        self.timings = {}
+        self._ready_at = None
+        # Connected before request was sent (HTTPS connections are, by
+        # pool), timings of connecting belong to the request.
+        self._connected = False
+
+    def _new_conn(self):
+        '''
+        Resolves host first, then connects to its addresses in turn (as
+        :func:`socket.create_connection` does), timing both.
+        '''
+        started = time.time()
+        try:
+            addresses = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)
+        except socket.gaierror as err:
+            raise NewConnectionError(self, 'Failed to establish a new connection: {}'.format(err))
+        resolved = time.time()
+        self.timings['dns'] = resolved - started
+        # Host is still needed as it is for TLS (SNI and certificate check).
+        host = self.host
+        error = None
+        try:
+            for address in OrderedDict((info[4][0], None) for info in addresses):
+                self.host = address
+                try:
+                    conn = super(TimingMixin, self)._new_conn()
+                    break
+                except (NewConnectionError, ConnectTimeoutError) as err:
+                    error = err
+            else:
+                raise error
+        finally:
+            self.host = host
+        self._ready_at = time.time()
+        self.timings['connect'] = self._ready_at - resolved
+        return conn
+
+    def connect(self):
+        '''Connects, timing TLS handshake of HTTPS connection.'''
+        super(TimingMixin, self).connect()
+        if isinstance(self, connection.HTTPSConnection):
+            connected = self._ready_at
+            self._ready_at = time.time()
+            self.timings['tls'] = self._ready_at - connected
+        self._connected = True
+
+    def request(self, *args, **kwargs):
+        '''Sends request, connecting first if not connected.'''
+        if not self._connected:
+            # Kept alive (or not connected yet), timings of the previous
+            # request don't apply.
+            self.timings = {}
+            self._ready_at = time.time()
+        self._connected = False
+        super(TimingMixin, self).request(*args, **kwargs)
+
+    def getresponse(self, *args, **kwargs):
+        '''Reads response headers.'''
+        # Connected while sending request.
+        self._connected = False
+        response = super(TimingMixin, self).getresponse(*args, **kwargs)
+        self.timings['ttfb'] = time.time() - self._ready_at
+        return response
+
+
+class TimingHTTPConnection(TimingMixin, connection.HTTPConnection):
+    '''HTTP connection recording timings.'''
+
+
+class TimingHTTPSConnection(TimingMixin, connection.VerifiedHTTPSConnection):
+    '''HTTPS connection recording timings.'''
+
+
+class TimingHTTPConnectionPool(connectionpool.HTTPConnectionPool):
+    '''Pool of :class:`TimingHTTPConnection`.'''
+    ConnectionCls = TimingHTTPConnection
+
+
+class TimingHTTPSConnectionPool(connectionpool.HTTPSConnectionPool):
+    '''Pool of :class:`TimingHTTPSConnection`.'''
+    ConnectionCls = TimingHTTPSConnection
+
+
+class TimingPoolManager(poolmanager.PoolManager):
+    '''Pool manager making pools of timing connections.'''
+
+    pool_classes_by_scheme = {
+        'http': TimingHTTPConnectionPool,
+        'https': TimingHTTPSConnectionPool,
+    }
+
+    def _new_pool(self, scheme, host, port):
+        kwargs = self.connection_pool_kw
+        if scheme == 'http':
+            kwargs = dict(
+                (key, value) for key, value in kwargs.iteritems()
+                if key not in poolmanager.SSL_KEYWORDS
+            )
+        return self.pool_classes_by_scheme[scheme](host, port, **kwargs)
+
+
+class TimingAdapter(HTTPAdapter):
+    '''Transport adapter using :class:`TimingPoolManager`.'''
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        # W0201: Attribute defined outside __init__
+        # pylint: disable=W0201
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = TimingPoolManager(
+            num_pools=connections, maxsize=maxsize, block=block, strict=True, **pool_kwargs
+        )
+
+
+def timing_session(pool_size=10):
+    '''Returns session with :class:`TimingAdapter` for both schemes.'''
+    session = requests.Session()
+    adapter = TimingAdapter(pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class Measurement(object):
+    '''Outcome of a single request.'''
+    # R0903: Too few public methods
+    # pylint: disable=R0903
+
+    def __init__(self):
+        self.status_code = None
+        self.reason = None
+        #: Maps phase to seconds, phases skipped are missing.
+        self.timings = {}
+        #: Seconds from sending request to parsing response headers.
+        self.elapsed = None
+        #: Seconds from sending request to reading whole body.
+        self.total = None
+        #: Size of body.
+        self.bytes = None
+        self.error = None
+
+
+def measure(session, method, url, timeout=None):
+    '''
+    Requests ``url``, reading whole response.
+
+    :returns: :class:`Measurement`, with ``error`` set instead of status
+        if request failed
+    '''
+    result = Measurement()
+    started = time.time()
+    try:
+        response = session.request(method, url, timeout=timeout, stream=True)
+        conn = getattr(response.raw, '_connection', None)
+        result.bytes = len(response.content)
+    except requests.exceptions.Timeout:
+        result.error = 'Request timed out.'
+        return result
+    except requests.exceptions.RequestException as err:
+        result.error = str(err)
+        return result
+    result.total = time.time() - started
+    result.elapsed = response.elapsed.total_seconds()
+    result.status_code = response.status_code
+    result.reason = response.reason
+    if conn is not None:
+        result.timings = dict(conn.timings)
+    return result
@@ -4,14 +4,85 @@
 Check IMAP sensor.
 '''
 import re
-from timeit import timeit
-from imaplib import IMAP4_SSL, IMAP4
+import socket
+import time
+from imaplib import IMAP4_SSL, IMAP4, IMAP4_PORT, IMAP4_SSL_PORT
 
 from whmonit.client.sensors import TaskSensorBase
+from whmonit.client.sensors.phases import Timings, connect, wrap
+from whmonit.common.units import unit_reg
+
+#: Streams of phases timed, see :class:`.phases.Timings`.
+PHASE_STREAMS = (
+    ('connect', 'connect_time'),
+    ('tls', 'tls_time'),
+    ('banner', 'banner_time'),
+    ('auth', 'auth_time'),
+    ('command', 'command_time'),
+)
+
+
+class TimedIMAP4(IMAP4):
+    '''
+    IMAP connection with socket ``timeout``, timing phases of connecting.
+    '''
+
+    def __init__(self, timings, timeout, host='', port=IMAP4_PORT):
+        self.timings = timings
+        self.timeout = timeout
+        started = time.time()
+        IMAP4.__init__(self, host, port)
+        # Greeting and capabilities.
+        self.timings['banner'] = time.time() - started - sum(
+            self.timings.get(phase, 0.0) for phase in ('connect', 'tls')
+        )
+
+    def open(self, host='', port=IMAP4_PORT):
+        # W0201: Attribute defined outside __init__
+        # pylint: disable=W0201
+        self.host = host
+        self.port = port
+        self.sock = connect(host, port, self.timeout, self.timings)
+        self.file = self.sock.makefile('rb')
+
+
+class TimedIMAP4SSL(IMAP4_SSL):
+    '''IMAP over SSL counterpart of :class:`TimedIMAP4`.'''
+
+    def __init__(self, timings, timeout, host='', port=IMAP4_SSL_PORT, keyfile=None,
+                 certfile=None):
+        # R0913: Too many arguments
+        # pylint: disable=R0913
+        self.timings = timings
+        self.timeout = timeout
+        started = time.time()
+        IMAP4_SSL.__init__(self, host, port, keyfile, certfile)
+        self.timings['banner'] = time.time() - started - sum(
+            self.timings.get(phase, 0.0) for phase in ('connect', 'tls')
+        )
+
+    def open(self, host='', port=IMAP4_SSL_PORT):
+        # W0201: Attribute defined outside __init__
+        # pylint: disable=W0201
+        self.host = host
+        self.port = port
+        self.sock = connect(host, port, self.timeout, self.timings)
+        self.sslobj = wrap(self.sock, self.keyfile, self.certfile, self.timings)
+        self.file = self.sslobj.makefile('rb')
 
 
 class Sensor(TaskSensorBase):
-    '''Sensor class checking for IMAP connection.'''
+    '''
+    Sensor class checking for IMAP connection.
+
+    Time of each phase is sent: TCP connect, SSL handshake, server greeting,
+    login and commands getting values (STATUS and GETQUOTAROOT). Every
+    socket operation is limited by ``timeout``.
+
+    With ``keep_session`` the authenticated session is kept between runs,
+    each run checks it with NOOP before getting values, so frequent checks
+    don't log in every time.
+    '''
     name = 'check_imap'
     streams = {
         'all_quota': {
@@ -32,7 +103,33 @@ class Sensor(TaskSensorBase):
         },
         'connect_time': {
             'type': float,
-            'description': 'Time to connect and to get data from imap server.'
+            'description': 'Time of establishing TCP connection.',
+            'unit': str(unit_reg.second)
+        },
+        'tls_time': {
+            'type': float,
+            'description': 'Time of SSL handshake.',
+            'unit': str(unit_reg.second)
+        },
+        'banner_time': {
+            'type': float,
+            'description': 'Time of waiting for server greeting and capabilities.',
+            'unit': str(unit_reg.second)
+        },
+        'auth_time': {
+            'type': float,
+            'description': 'Time of logging in.',
+            'unit': str(unit_reg.second)
+        },
+        'command_time': {
+            'type': float,
+            'description': 'Time of commands getting message counts and quota.',
+            'unit': str(unit_reg.second)
+        },
+        'total_time': {
+            'type': float,
+            'description': 'Time to connect and to get data from imap server.',
+            'unit': str(unit_reg.second)
         },
     }
     config_schema = {
@@ -47,12 +144,21 @@ class Sensor(TaskSensorBase):
                 'minimum': 1,
                 'maximum': 65535,
             },
+            'ssl': {
+                'type': 'boolean',
+                'default': True
+            },
             'key': {'type': 'string'},
             'cert': {'type': 'string'},
             'timeout': {
                 'type': 'integer',
                 'default': 60
             },
+            'keep_session': {
+                'type': 'boolean',
+                'default': False,
+                'description': 'Keep logged in between runs'
+            },
         },
         'required': ['username', 'password', 'host'],
         'dependencies': {
@@ -62,55 +168,95 @@ class Sensor(TaskSensorBase):
         'additionalProperties': False
     }
 
-    pattern = re.compile(r'\d+')
+    status_pattern = re.compile(r'(MESSAGES|UNSEEN) (\d+)')
+    quota_pattern = re.compile(r'STORAGE (\d+) (\d+)')
 
-    def do_run(self):
-        '''
-        Connects to IMAP server to specified host, with given username and password.
-        '''
-        from interruptingcow import timeout
-        args = {
-            key: self.config[key] for key in
-            ['host', 'port', 'key', 'cert']
-            if key in self.config
-        }
+    #: Session kept between runs.
+    conn = None
 
-        try:
-            values = {}
+    def _connect(self, timings):
+        '''Returns new connection, logged in.'''
+        args = {'host': self.config['host']}
+        if 'port' in self.config:
+            args['port'] = self.config['port']
+        if self.config['ssl']:
+            conn = TimedIMAP4SSL(
+                timings, self.config['timeout'], keyfile=self.config.get('key'),
+                certfile=self.config.get('cert'), **args
+            )
+        else:
+            conn = TimedIMAP4(timings, self.config['timeout'], **args)
+        with timings.phase('auth'):
+            conn.login(self.config['username'], self.config['password'])
+        return conn
 
-            def func_to_time():
-                '''
-                Function to executed with timeit.
-                '''
-                with timeout(self.config['timeout']):
-                    conn = IMAP4_SSL(**args)
+    def _values(self, conn, timings, noop=False):
+        '''Gets message counts and quota (if supported) of INBOX.'''
+        with timings.phase('command'):
+            if noop:
+                conn.noop()
+            typ, data = conn.status('INBOX', '(MESSAGES UNSEEN)')
+            if typ != 'OK':
+                raise IMAP4.error('STATUS command error: {} {}'.format(typ, data))
+            status = dict(self.status_pattern.findall(data[0]))
+            quota = None
+            if 'QUOTA' in conn.capabilities:
+                quota = self.quota_pattern.search(str(conn.getquotaroot('INBOX')[1]))
+        values = [
+            ('msg_count', float(status['MESSAGES'])),
+            ('unseen_msg_count', float(status['UNSEEN'])),
+        ]
+        if quota is not None:
+            values.extend([
+                ('all_quota', float(quota.group(2))),
+                ('used_quota', float(quota.group(1))),
+            ])
+        return values
 
-                conn.login(
-                    self.config['username'],
-                    self.config['password']
-                )
+    def _close(self):
+        '''Drops kept session.'''
+        if self.conn is not None:
+            try:
+                self.conn.shutdown()
+            except (IMAP4.error, socket.error):
+                pass
+            self.conn = None
 
-                values['all_msg_count'] = conn.select('inbox')[1][0]
-                values['unseen_msg_count'] = Sensor.pattern.search(
-                    conn.status('inbox', "(UNSEEN)")[1][0]).group()
+    def _results(self, values, timings):
+        '''Adds timings to ``values``.'''
+        return tuple(values + [
+            (stream, timings[phase]) for phase, stream in PHASE_STREAMS if phase in timings
+        ] + [('total_time', sum(timings.itervalues()))])
 
-                quota_str = conn.getquotaroot('inbox')
-                # get quota or return unknow
-                values['quota'] = Sensor.pattern.findall(str(quota_str)) or [0, 0]
+    def do_run(self):
+        '''
+        Connects to IMAP server to specified host, with given username and password.
+        '''
+        timings = Timings()
+        try:
+            if self.conn is not None:
+                try:
+                    return self._results(self._values(self.conn, timings, noop=True), timings)
+                except socket.timeout:
+                    raise
+                except (IMAP4.abort, socket.error):
+                    # Session closed (e.g. by server), log in again.
+                    self._close()
+                    timings = Timings()
 
+            conn = self._connect(timings)
+            values = self._values(conn, timings)
+            if self.config['keep_session']:
+                self.conn = conn
+            else:
                 conn.logout()
-
-            time = timeit(func_to_time, number=1)
-            return (
-                ('all_quota', float(values['quota'][0])),
-                ('used_quota', float(values['quota'][1])),
-                ('unseen_msg_count', float(values['unseen_msg_count'])),
-                ('msg_count', float(values['all_msg_count'])),
-                ('connect_time', time)
-            )
+            return self._results(values, timings)
+        except socket.timeout:
+            self._close()
+            self.log('Request timeout ({}s).'.format(self.config['timeout']))
         except IMAP4.error as err:
+            self._close()
             self.log('IMAP error: {}'.format(str(err)))
-        except RuntimeError as err:
-            self.log('Request timeout ({}s).'.format(self.config['timeout']))
-        except Exception as err:
+        except (socket.error, KeyError, IndexError) as err:
+            self._close()
             self.log('Error occured: {}'.format(str(err)))
@@ -0,0 +1,3 @@
+'''
+Sensor check_imap test __init__.
+'''
@@ -0,0 +1,136 @@
+'''
+Tests for whmonit.client.sensors.check_imap
+'''
+import socket
+import threading
+
+import pytest
+from mock import Mock
+
+from ..linux_01 import Sensor
+
+
+class FakeImapServer(threading.Thread):
+    '''Answers IMAP commands, counts logins.'''
+
+    def __init__(self):
+        super(FakeImapServer, self).__init__()
+        self.daemon = True
+        self.socket = socket.socket()
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen(5)
+        self.port = self.socket.getsockname()[1]
+        self.commands = []
+        self.clients = []
+        self.status_error = False
+
+    def run(self):
+        while True:
+            try:
+                client, _ = self.socket.accept()
+            except socket.error:
+                return
+            self.clients.append(client)
+            handler = threading.Thread(target=self.serve, args=(client.makefile('r+b', 0),))
+            handler.daemon = True
+            handler.start()
+
+    def serve(self, conn):
+        '''Talks to client.'''
+        conn.write('* OK fake IMAP ready\r\n')
+        for line in iter(conn.readline, ''):
+            tag, command = line.split()[:2]
+            command = command.upper()
+            self.commands.append(command)
+            if command == 'CAPABILITY':
+                conn.write('* CAPABILITY IMAP4rev1 QUOTA\r\n')
+            elif command == 'LOGIN':
+                if line.split()[3] != '"secret"' and line.split()[3] != 'secret':
+                    conn.write('{} NO bad credentials\r\n'.format(tag))
+                    continue
+            elif command == 'STATUS':
+                if self.status_error:
+                    conn.write('{} NO mailbox does not exist\r\n'.format(tag))
+                    continue
+                conn.write('* STATUS INBOX (MESSAGES 12 UNSEEN 3)\r\n')
+            elif command == 'GETQUOTAROOT':
+                conn.write('* QUOTAROOT INBOX ""\r\n* QUOTA "" (STORAGE 100 1024)\r\n')
+            elif command == 'LOGOUT':
+                conn.write('* BYE\r\n{} OK bye\r\n'.format(tag))
+                return
+            conn.write('{} OK done\r\n'.format(tag))
+
+    def drop_clients(self):
+        '''Closes connections, like server timing out sessions.'''
+        for client in self.clients:
+            client.shutdown(socket.SHUT_RDWR)
+            client.close()
+        self.clients = []
+
+
+@pytest.fixture
+def server():
+    '''Fake IMAP server.'''
+    fake = FakeImapServer()
+    fake.start()
+    yield fake
+    fake.socket.close()
+
+
+def make_sensor(server, **config):
+    '''Makes sensor with `config`.'''
+    config.update(
+        sampling_period=10, host='127.0.0.1', port=server.port, ssl=False, timeout=1,
+        username='user',
+    )
+    config.setdefault('password', 'secret')
+    sensor = Sensor(config, Mock(), None)
+    sensor.log = Mock()
+    return sensor
+
+
+class TestCheckImap(object):
+    ''' Test check_imap sensor. '''
+
+    def test_phases(self, server):
+        ''' Values and time of each phase are sent. '''
+        result = dict(make_sensor(server).do_run())
+
+        assert (result['msg_count'], result['unseen_msg_count']) == (12.0, 3.0)
+        assert (result['used_quota'], result['all_quota']) == (100.0, 1024.0)
+        assert set(result) == set([
+            'msg_count', 'unseen_msg_count', 'used_quota', 'all_quota', 'connect_time',
+            'banner_time', 'auth_time', 'command_time', 'total_time',
+        ])
+        assert server.commands == ['CAPABILITY', 'LOGIN', 'STATUS', 'GETQUOTAROOT', 'LOGOUT']
+
+    def test_keep_session(self, server):
+        ''' Session is kept, checked with NOOP, logged in again when lost. '''
+        sensor = make_sensor(server, keep_session=True)
+
+        sensor.do_run()
+        result = dict(sensor.do_run())
+        assert server.commands.count('LOGIN') == 1
+        assert 'NOOP' in server.commands
+        assert 'auth_time' not in result and result['msg_count'] == 12.0
+
+        server.drop_clients()
+        result = dict(sensor.do_run())
+        assert server.commands.count('LOGIN') == 2
+        assert 'auth_time' in result and result['msg_count'] == 12.0
+        assert not sensor.log.called
+
+    def test_bad_login(self, server):
+        ''' Failed login is logged. '''
+        sensor = make_sensor(server, password='wrong')
+
+        assert sensor.do_run() is None
+        assert 'IMAP error' in sensor.log.call_args[0][0]
+
+    def test_status_error(self, server):
+        ''' Rejected STATUS command is logged. '''
+        server.status_error = True
+        sensor = make_sensor(server)
+
+        assert sensor.do_run() is None
+        assert 'mailbox does not exist' in sensor.log.call_args[0][0]
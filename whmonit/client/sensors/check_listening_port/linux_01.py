@@ -3,16 +3,22 @@
 '''
 Check listening port sensor.
 '''
-import socket
 from whmonit.client.sensors import TaskSensorBase
+from whmonit.client.sensors.filecache import FileCache
+from whmonit.client.sensors.procnet import SocketTable
 
 
 class Sensor(TaskSensorBase):
     '''
     Sensor class checking for local listening port.
 
-    It looks through the process table, so does not
-    try to open any connections.
+    It looks through the kernel socket tables, so does not
+    try to open any connections. Tables and owners of listening sockets
+    read by a check are kept in a file in ``cache_dir`` and reused by
+    checks (of other configurations, each run in its own process) run
+    within ``max_age`` seconds, so checks of a tick share a single scan
+    of file descriptors of all processes. Owners are looked for only when
+    the port is open.
     '''
 
     name = 'check_listening_port'
@@ -43,16 +49,25 @@ class Sensor(TaskSensorBase):
         'type': 'object',
         'properties': {
             'port': {'type': 'integer', 'minimum': 1, 'maximum': 65535},
-            'protocol': {'type': 'string', 'enum': ['tcp', 'udp']}
+            'protocol': {'type': 'string', 'enum': ['tcp', 'udp']},
+            'cache_dir': {
+                'type': 'string',
+                'description': 'Directory of socket tables shared by checks'
+            },
+            'max_age': {
+                'type': 'number',
+                'minimum': 0,
+                'description': 'Seconds socket tables read for other checks are reused for, '
+                               'half of sampling period by default'
+            },
         },
         'required': ['port', 'protocol'],
         'additionalProperties': False
     }
 
-    types = {
-        'tcp': socket.SOCK_STREAM,
-        'udp': socket.SOCK_DGRAM,
-    }
+    proc = '/proc'
+    #: :class:`.filecache.FileCache` of socket tables.
+    cache = None
 
     def do_run(self):
         '''
@@ -61,27 +76,32 @@ class Sensor(TaskSensorBase):
         '''
         import psutil
 
-        typ = Sensor.types.get(self.config['protocol'])
-
-        for proc in psutil.process_iter():
+        if self.cache is None:
             try:
-                connections = proc.connections()
-            except psutil.AccessDenied:
-                # TODO #1100: Log error to agent
-                continue
+                self.cache = FileCache('procnet', self.config.get('cache_dir'))
+            except OSError as err:
+                self.log('cannot use cache directory: {}'.format(err))
+                return
+        max_age = self.config.get('max_age', self.config['sampling_period'] / 2.0)
+        table = SocketTable.snapshot(self.cache, max_age, self.proc)
+        sockets = table.find(self.config['protocol'], self.config['port'])
+        if not sockets:
+            return (('is_open', False),)
 
-            for conn in connections:
-                valid = (
-                    conn.type == typ and
-                    not conn.raddr and
-                    conn.laddr[1] == self.config['port']
+        for _, inode in sockets:
+            pid = table.owner(inode)
+            if pid is None:
+                continue
+            try:
+                proc = psutil.Process(pid)
+                return (
+                    ('is_open', True),
+                    ('pid', float(pid)),
+                    ('name', str(proc.name())),
+                    ('uid', float(proc.uids().real)),
+                    ('user', str(proc.username())),
                 )
-                if valid:
-                    return (
-                        ('is_open', True),
-                        ('pid', float(proc.pid())),
-                        ('name', proc.name()),
-                        ('uid', float(proc.uids().real)),
-                        ('user', proc.username()),
-                    )
-        return (('is_open', False),)
+            except psutil.Error:
+                # Gone meanwhile or not ours to look at.
+                continue
+        return (('is_open', True),)
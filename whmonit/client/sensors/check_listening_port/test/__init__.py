@@ -0,0 +1,3 @@
+'''
+Sensor check_listening_port test __init__.
+'''
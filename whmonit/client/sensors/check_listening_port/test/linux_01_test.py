@@ -0,0 +1,70 @@
+'''
+Tests for whmonit.client.sensors.check_listening_port
+'''
+import os
+
+import psutil
+from mock import Mock
+
+from whmonit.client.sensors.test.procnet_test import (  # pylint: disable=W0611
+    open_socket, proc, socket_line, write_table,
+)
+
+from ..linux_01 import Sensor
+
+
+def run(proc, monkeypatch, port, protocol='tcp', **config):
+    '''Runs sensor against fake `/proc`, socket tables shared next to it.'''
+    monkeypatch.setattr(Sensor, 'proc', str(proc))
+    config.update({
+        'sampling_period': 3, 'port': port, 'protocol': protocol,
+        'cache_dir': str(proc.dirpath('cache')),
+    })
+    sensor = Sensor(config, Mock(), None)
+    return dict(sensor.do_run())
+
+
+class TestCheckListeningPort(object):
+    ''' Test check_listening_port sensor. '''
+
+    def test_closed(self, proc, monkeypatch):
+        ''' Port nobody listens on is reported closed. '''
+        assert run(proc, monkeypatch, 80) == {'is_open': False}
+        assert run(proc, monkeypatch, 53, 'tcp') == {'is_open': False}
+
+    def test_shared(self, proc, monkeypatch):
+        ''' Checks within half of sampling period share tables, owners found once. '''
+        clock = [1000.0]
+        monkeypatch.setattr('time.time', lambda: clock[0])
+        assert run(proc, monkeypatch, 80) == {'is_open': False}
+        write_table(proc, 'tcp', socket_line('00000000:0050', '00000000:0000', '0A', 0, 300))
+        open_socket(proc, os.getpid(), 3, 300)
+
+        clock[0] += 1
+        assert run(proc, monkeypatch, 80) == {'is_open': False}
+        assert run(proc, monkeypatch, 80, max_age=1)['pid'] == os.getpid()
+
+        proc.join(str(os.getpid())).remove()
+        assert run(proc, monkeypatch, 80, max_age=2)['pid'] == os.getpid()
+
+    def test_owner(self, tmpdir, monkeypatch):
+        ''' Owner process details are reported. '''
+        proc = tmpdir.mkdir('proc')
+        write_table(proc, 'udp', socket_line('00000000:0035', '00000000:0000', '07', 0, 200))
+        open_socket(proc, os.getpid(), 3, 200)
+        current = psutil.Process(os.getpid())
+
+        assert run(proc, monkeypatch, 53, 'udp') == {
+            'is_open': True,
+            'pid': float(os.getpid()),
+            'name': current.name(),
+            'uid': float(current.uids().real),
+            'user': current.username(),
+        }
+
+    def test_unknown_owner(self, proc, monkeypatch):
+        ''' Port is open even if its owner can not be found. '''
+        for pid in ('10', '20'):
+            proc.join(pid).remove()
+
+        assert run(proc, monkeypatch, 22) == {'is_open': True}
@@ -5,9 +5,60 @@ Check SMTP sensor.
 '''
 import smtplib
 import socket
-from timeit import timeit
+import time
 
 from whmonit.client.sensors import TaskSensorBase
+from whmonit.client.sensors.phases import Timings, connect, wrap
+from whmonit.common.units import unit_reg
+
+#: Streams of phases timed, see :class:`.phases.Timings`.
+PHASE_STREAMS = (
+    ('connect', 'connect_time'),
+    ('tls', 'tls_time'),
+    ('banner', 'banner_time'),
+    ('auth', 'auth_time'),
+)
+
+
+class TimedSMTP(smtplib.SMTP):
+    '''SMTP connection timing phases of connecting.'''
+
+    def __init__(self, timings, *args, **kwargs):
+        self.timings = timings
+        smtplib.SMTP.__init__(self, *args, **kwargs)
+
+    def _get_socket(self, host, port, timeout):
+        return connect(host, port, timeout, self.timings)
+
+    def connect(self, host='localhost', port=0):
+        '''Connects, timing server greeting as ``banner`` phase.'''
+        started = time.time()
+        reply = smtplib.SMTP.connect(self, host, port)
+        self.timings['banner'] = time.time() - started - sum(
+            self.timings.get(phase, 0.0) for phase in ('connect', 'tls')
+        )
+        return reply
+
+
+class TimedSMTPSSL(TimedSMTP):
+    '''SMTP over SSL connection timing phases of connecting.'''
+
+    default_port = smtplib.SMTP_SSL_PORT
+
+    def __init__(self, timings, *args, **kwargs):
+        self.keyfile = kwargs.pop('keyfile', None)
+        self.certfile = kwargs.pop('certfile', None)
+        TimedSMTP.__init__(self, timings, *args, **kwargs)
+
+    def _get_socket(self, host, port, timeout):
+        sock = wrap(
+            TimedSMTP._get_socket(self, host, port, timeout),
+            self.keyfile, self.certfile, self.timings,
+        )
+        # W0201: Attribute defined outside __init__
+        # pylint: disable=W0201
+        self.file = smtplib.SSLFakeFile(sock)
+        return sock
 
 
 class Sensor(TaskSensorBase):
@@ -15,6 +66,10 @@ class Sensor(TaskSensorBase):
     Check SMTP sensor class.
 
     Uses smtplib library to establish connection to given SMTP server.
+
+    Time of each phase is sent: TCP connect, TLS handshake (SSL connection
+    or STARTTLS), server greeting, HELO (EHLO) and login. Every socket
+    operation is limited by ``timeout``.
     """
 
     name = 'check_smtp'
@@ -29,7 +84,28 @@ class Sensor(TaskSensorBase):
         },
         'response_time': {
             'type': float,
-            'description': 'Response time for HELO command to given smtp server.'
+            'description': 'Response time for HELO command to given smtp server.',
+            'unit': str(unit_reg.second)
+        },
+        'connect_time': {
+            'type': float,
+            'description': 'Time of establishing TCP connection.',
+            'unit': str(unit_reg.second)
+        },
+        'tls_time': {
+            'type': float,
+            'description': 'Time of SSL/TLS handshake (with STARTTLS command).',
+            'unit': str(unit_reg.second)
+        },
+        'banner_time': {
+            'type': float,
+            'description': 'Time of waiting for server greeting.',
+            'unit': str(unit_reg.second)
+        },
+        'auth_time': {
+            'type': float,
+            'description': 'Time of logging in.',
+            'unit': str(unit_reg.second)
         }
     }
     config_schema = {
@@ -84,30 +160,42 @@ class Sensor(TaskSensorBase):
         # R0912 Too many branches
         # pylint: disable=R0912
 
+        timings = Timings()
         could_connect = False
         could_login = False
-        time_elapsed = 0
-        if self.config['encryption'] != 'ssl' and 'port' not in self.config:
-            self.config['port'] = 587
+        if 'port' not in self.config:
+            self.config['port'] = (
+                smtplib.SMTP_SSL_PORT if self.config['encryption'] == 'ssl' else 587
+            )
         smtp_args = {
             key: self.config[key]
-            for key in ['host', 'port', 'local_hostname', 'timeout']
+            for key in ['local_hostname', 'timeout']
             if key in self.config
         }
+        smtp = None
         try:
             if self.config['encryption'] == 'ssl':
-                smtp = smtplib.SMTP_SSL(**smtp_args)
+                smtp = TimedSMTPSSL(
+                    timings, keyfile=self.config.get('key'), certfile=self.config.get('cert'),
+                    **smtp_args
+                )
             else:
-                smtp = smtplib.SMTP(**smtp_args)
+                smtp = TimedSMTP(timings, **smtp_args)
+            smtp.connect(self.config['host'], int(self.config['port']))
+            with timings.phase('helo'):
+                smtp.ehlo_or_helo_if_needed()
             if self.config['encryption'] == 'tls':
-                if 'key' in self.config:
-                    smtp.starttls(self.config['key'], self.config['cert'])
-                else:
-                    smtp.starttls()
-            time_elapsed = timeit(smtp.helo, number=1)
+                with timings.phase('tls'):
+                    if 'key' in self.config:
+                        smtp.starttls(self.config['key'], self.config['cert'])
+                    else:
+                        smtp.starttls()
+                with timings.phase('helo'):
+                    smtp.ehlo_or_helo_if_needed()
             could_connect = True
             if 'login' in self.config:
-                smtp.login(self.config['login'], self.config['password'])
+                with timings.phase('auth'):
+                    smtp.login(self.config['login'], self.config['password'])
                 could_login = True
         except smtplib.SMTPConnectError:
             self.log(
@@ -125,21 +213,35 @@ class Sensor(TaskSensorBase):
             self.log(
                 'The server didn’t accept the username/password combination.'
             )
+        except smtplib.SMTPServerDisconnected as err:
+            # Also timeouts waiting for reply.
+            self.log('Connection closed: {}'.format(err))
         except smtplib.SMTPException:
             self.log(
                 'The server does not support the STARTTLS extension'
                 'or no suitable authentication method was found.'
             )
+        except socket.error as err:
+            self.log(
+                'Could not connect to `{}` on `{}`: {}'
+                .format(self.config['host'], self.config['port'], err)
+            )
         except RuntimeError:
             self.log(
                 'SSL/TLS support is not available to your Python interpreter.'
             )
             raise
         finally:
-            smtp.quit()
+            if getattr(smtp, 'sock', None) is not None:
+                try:
+                    smtp.quit()
+                except (smtplib.SMTPException, socket.error):
+                    smtp.close()
 
-        return (
+        return tuple([
             ('could_connect', could_connect),
             ('could_login', could_login),
-            ('response_time', time_elapsed)
-        )
+            ('response_time', timings.get('helo', 0.0))
+        ] + [
+            (stream, timings[phase]) for phase, stream in PHASE_STREAMS if phase in timings
+        ])
@@ -0,0 +1,3 @@
+'''
+Sensor check_smtp test __init__.
+'''
@@ -0,0 +1,124 @@
+'''
+Tests for whmonit.client.sensors.check_smtp
+'''
+import socket
+import threading
+
+import pytest
+from mock import Mock
+
+from ..linux_01 import Sensor
+
+
+class FakeSmtpServer(threading.Thread):
+    '''Answers SMTP commands of a single client at a time.'''
+
+    def __init__(self, greeting=True):
+        super(FakeSmtpServer, self).__init__()
+        self.daemon = True
+        self.greeting = greeting
+        self.socket = socket.socket()
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen(5)
+        self.port = self.socket.getsockname()[1]
+        self.commands = []
+
+    def run(self):
+        while True:
+            try:
+                client, _ = self.socket.accept()
+            except socket.error:
+                return
+            self.serve(client.makefile('r+b', 0))
+            client.close()
+
+    def serve(self, conn):
+        '''Talks to client.'''
+        if not self.greeting:
+            # Never greets, client times out.
+            conn.readline()
+            return
+        conn.write('220 fake ESMTP\r\n')
+        for line in iter(conn.readline, ''):
+            command = line.split()[0].upper()
+            self.commands.append(command)
+            if command == 'EHLO':
+                conn.write('250-fake\r\n250 AUTH PLAIN\r\n')
+            elif command == 'AUTH':
+                ok = line.split()[-1] == 'AHVzZXIAc2VjcmV0'
+                conn.write('235 ok\r\n' if ok else '535 bad credentials\r\n')
+            elif command == 'QUIT':
+                conn.write('221 bye\r\n')
+                return
+            else:
+                conn.write('502 not implemented\r\n')
+
+
+@pytest.fixture
+def server():
+    '''Fake SMTP server.'''
+    fake = FakeSmtpServer()
+    fake.start()
+    yield fake
+    fake.socket.close()
+
+
+def make_sensor(**config):
+    '''Makes sensor with `config`.'''
+    config.update(sampling_period=10, host='127.0.0.1', timeout=1)
+    sensor = Sensor(config, Mock(), None)
+    sensor.log = Mock()
+    return sensor
+
+
+class TestCheckSmtp(object):
+    ''' Test check_smtp sensor. '''
+
+    def test_phases(self, server):
+        ''' Each phase is timed, session is ended. '''
+        result = dict(make_sensor(port=server.port, login='user', password='secret').do_run())
+
+        assert result['could_connect'] and result['could_login']
+        assert set(result) == set([
+            'could_connect', 'could_login', 'response_time', 'connect_time', 'banner_time',
+            'auth_time',
+        ])
+        assert server.commands == ['EHLO', 'AUTH', 'QUIT']
+        assert all(
+            Sensor.streams[stream]['unit'] == Sensor.streams['connect_time']['unit']
+            for stream in result if stream.endswith('_time')
+        )
+
+    def test_bad_login(self, server):
+        ''' Failed login is logged. '''
+        sensor = make_sensor(port=server.port, login='user', password='wrong')
+
+        result = dict(sensor.do_run())
+        assert result['could_connect'] and not result['could_login']
+        assert 'auth_time' in result
+        assert sensor.log.called
+
+    def test_connection_refused(self):
+        ''' Failing to connect is reported, not raised. '''
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        sensor = make_sensor(port=port)
+
+        result = dict(sensor.do_run())
+        assert not result['could_connect']
+        assert 'connect_time' in result and 'banner_time' not in result
+        assert 'Could not connect' in sensor.log.call_args[0][0]
+
+    def test_timeout(self):
+        ''' Server not greeting times out. '''
+        silent = FakeSmtpServer(greeting=False)
+        silent.start()
+        sensor = make_sensor(port=silent.port, timeout=0.2)
+
+        assert not dict(sensor.do_run())['could_connect']
+        sensor.log.assert_called_once_with(
+            'Connection closed: Connection unexpectedly closed: timed out'
+        )
+        silent.socket.close()
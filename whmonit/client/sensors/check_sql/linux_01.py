@@ -8,14 +8,72 @@ import timeit
 from whmonit.client.sensors import TaskSensorBase
 
 
+def start_query(conn, *dummy):
+    ''' Save time the query starts. '''
+    conn.info['wh_time'] = timeit.default_timer()
+
+
+def end_query(conn, *dummy):
+    ''' Save time the query's finished. '''
+    conn.info['wh_time'] = timeit.default_timer() - conn.info['wh_time']
+
+
+def ping_connection(connection, branch):
+    '''
+    Checks connection taken from the pool, reconnecting if it was lost
+    (pessimistic disconnect handling).
+    '''
+    from sqlalchemy import exc, select
+
+    if branch:
+        return
+    should_close_with_result = connection.should_close_with_result
+    connection.should_close_with_result = False
+    try:
+        connection.scalar(select([1]))
+    except exc.DBAPIError as err:
+        if not err.connection_invalidated:
+            raise
+        # Pool was invalidated, this makes a new connection.
+        connection.scalar(select([1]))
+    finally:
+        connection.should_close_with_result = should_close_with_result
+
+
+def format_result(rows):
+    '''Returns (stream, value) of query result ``rows``.'''
+    if len(rows) == 1 and len(rows[0]) == 1:
+        try:
+            return 'result_num', float(rows[0][0])
+        except (TypeError, ValueError):
+            pass
+    return 'result', str(rows)[1:-1]
+
+
+def _field(value):
+    '''Query result or error as a table field.'''
+    if isinstance(value, float):
+        return repr(value)
+    return ' '.join(value.replace(';', ' ').splitlines())
+
+
 class Sensor(TaskSensorBase):
     '''
     Check SQL sensor class.
 
     Sent results:
     * result: the rows returned by executing query separated by commas
-    * timeit: time it took to execute query (it includes time spent on
-              sending and receiving data from the server)
+    * query_time: time it took to execute query (it includes time spent on
+                  sending and receiving data from the server)
+    * connect_time: time it took to get a connection, checked with a ping
+                    (it includes connecting when the previous one was lost)
+    * queries: with ``queries`` configured, ``;`` separated table of name,
+               result (text results with ``;`` and line breaks replaced by
+               spaces), query time and error message of each query
+
+    Database engine is created once, connections are kept in a pool
+    of ``pool_size`` between runs, so authentication is not repeated every
+    run. All queries of a run are executed over a single connection.
 
     As for returned error messages: there is a great number of SQL errors
     and they're never precise. What's more, different drivers may raise
@@ -55,6 +113,14 @@ class Sensor(TaskSensorBase):
             'type': float,
             'description': 'Time taken to execute the query.',
         },
+        'connect_time': {
+            'type': float,
+            'description': 'Time taken to get a working connection.',
+        },
+        'queries': {
+            'type': str,
+            'description': 'Result, time taken or error of each named query.',
+        },
     }
 
     # TODO #1671: Better way for getting raw config
@@ -95,57 +161,87 @@ class Sensor(TaskSensorBase):
             'query': {
                 'type': 'string',
                 'description': 'SQL query to send to database.'
-            }
+            },
+            'queries': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'name': {'type': 'string', 'pattern': '^[^;\\n]+$'},
+                        'query': {'type': 'string'},
+                    },
+                    'required': ['name', 'query'],
+                    'additionalProperties': False,
+                },
+                'description': 'Named SQL queries to send to database.'
+            },
+            'pool_size': {
+                'type': 'integer',
+                'minimum': 1,
+                'default': 1,
+                'description': 'Number of connections kept open between runs.'
+            },
         },
-        'required': ['dbtype', 'host', 'query'],
+        'required': ['dbtype', 'host'],
         'additionalProperties': False
     }
 
-    def do_run(self):
-        # R0914: Too many local variables.
-        # pylint: disable=R0914
+    engine = None
+    url = None
 
+    def _create_engine(self):
+        '''Creates database engine with a small pool of connections.'''
         import sqlalchemy
-        from sqlalchemy import exc
         from sqlalchemy.event import listen
         from sqlalchemy.engine.url import URL
 
-        def start_query(conn, *dummy):
-            ''' Save time the query starts. '''
-            conn.info['wh_time'] = timeit.default_timer()
-
-        def end_query(conn, *dummy):
-            ''' Save time the query's finished. '''
-            conn.info['wh_time'] = timeit.default_timer() - conn.info['wh_time']
-
         config = {
             k: v for k, v in self.config.iteritems()
             if k in self.config_raw['properties'].keys()
         }
         config['drivername'] = config.pop('dbtype')
+        for key in ('query', 'queries', 'pool_size'):
+            config.pop(key, None)
 
+        options = {}
         if config['drivername'] == 'sqlite':
             config['database'] = config.pop('host')
+        else:
+            options = {'pool_size': self.config['pool_size'], 'max_overflow': 0}
 
-        query = config.pop('query')
+        self.url = URL(**config)
+        engine = sqlalchemy.create_engine(self.url, **options)
+        listen(engine, 'engine_connect', ping_connection)
+        listen(engine, 'before_cursor_execute', start_query)
+        listen(engine, 'after_cursor_execute', end_query)
+        return engine
 
-        url = URL(**config)
+    def do_run(self):
+        from sqlalchemy import exc
 
-        try:
-            engine = sqlalchemy.create_engine(url)
-        except ImportError as err:
-            return ((
-                'error',
-                '{}. Sensor checking sql requires it. Please install it.'
-                .format(err)
-            ),)
+        if self.engine is None:
+            try:
+                self.engine = self._create_engine()
+            except ImportError as err:
+                return ((
+                    'error',
+                    '{}. Sensor checking sql requires it. Please install it.'
+                    .format(err)
+                ),)
+        if 'queries' in self.config:
+            queries = [(query['name'], query['query']) for query in self.config['queries']]
+        elif 'query' in self.config:
+            queries = [(None, self.config['query'])]
+        else:
+            return (('error', 'Either query or queries has to be configured.'),)
 
         error_msg = (
             '(database {})\nError: {{}}\n Message from database: "{{}}"'
-            .format(url.__to_string__())
+            .format(self.url.__to_string__())
         )
+        start = timeit.default_timer()
         try:
-            connection = engine.connect()
+            connection = self.engine.connect()
         except exc.TimeoutError:
             return (
                 ('error', error_msg.format('Timeout getting connection', None)),
@@ -154,33 +250,35 @@ class Sensor(TaskSensorBase):
             return (
                 ('error', error_msg.format('Could not connect to database', err)),
             )
+        connect_time = timeit.default_timer() - start
 
-        listen(connection, 'before_cursor_execute', start_query)
-        listen(connection, 'after_cursor_execute', end_query)
+        results = []
         try:
-            result = connection.execute(query).fetchall()
-            time = connection.info['wh_time']
-        except exc.StatementError as err:
-            return ((
-                'error', error_msg.format(
-                    'Error executing statement {}'.format(err.statement), err)
-            ),)
-        except exc.SQLAlchemyError as err:
-            return ((
-                'error', error_msg.format(
-                    'Error executing statement, your query: {}'.format(
-                        self.config['query']),
-                    err.message)
-            ),)
+            for name, query in queries:
+                try:
+                    rows = connection.execute(query).fetchall()
+                    results.append((name, format_result(rows), connection.info['wh_time'], None))
+                except exc.StatementError as err:
+                    results.append((name, None, None, error_msg.format(
+                        'Error executing statement {}'.format(err.statement), err)))
+                except exc.SQLAlchemyError as err:
+                    results.append((name, None, None, error_msg.format(
+                        'Error executing statement, your query: {}'.format(query),
+                        err.message)))
         finally:
             connection.close()
 
-        try:
-            if len(result) == 1 and len(result[0]) == 1:
-                result = ('result_num', float(result[0][0]))
+        if queries[0][0] is None:
+            _, result, time, error = results[0]
+            if error is not None:
+                return (('error', error), ('connect_time', connect_time))
+            return (result, ('query_time', time), ('connect_time', connect_time))
+
+        lines = [';'.join(('name', 'result', 'query_time', 'error'))]
+        for name, result, time, error in results:
+            if error is not None:
+                lines.append(';'.join((name, '', '', _field(error))))
             else:
-                raise ValueError
-        except ValueError:
-            result = ('result', str(result)[1:-1])
+                lines.append(';'.join((name, _field(result[1]), repr(time), '')))
+        return (('queries', '\n'.join(lines + [''])), ('connect_time', connect_time))
 
-        return (result, ('query_time', time))
@@ -0,0 +1,3 @@
+'''
+Sensor check_sql test __init__.
+'''
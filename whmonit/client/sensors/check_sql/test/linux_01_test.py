@@ -0,0 +1,58 @@
+'''
+Tests for whmonit.client.sensors.check_sql
+'''
+import sqlalchemy
+from mock import Mock
+
+from ..linux_01 import Sensor
+
+
+def make_sensor(tmpdir, **config):
+    '''Sensor using sqlite database in `tmpdir`.'''
+    config.update(sampling_period=10, dbtype='sqlite', host=str(tmpdir.join('test.db')))
+    return Sensor(config, Mock(), None)
+
+
+class TestCheckSql(object):
+    ''' Test check_sql sensor. '''
+
+    def test_single_query(self, tmpdir, monkeypatch):
+        ''' Engine is created once, query and connect times are separate. '''
+        create_engine = Mock(side_effect=sqlalchemy.create_engine)
+        monkeypatch.setattr(sqlalchemy, 'create_engine', create_engine)
+        sensor = make_sensor(tmpdir, query='SELECT 42')
+
+        for _ in xrange(3):
+            result = dict(sensor.do_run())
+            assert result['result_num'] == 42
+            assert result['query_time'] >= 0
+            assert result['connect_time'] >= 0
+        assert create_engine.call_count == 1
+
+    def test_text_and_error(self, tmpdir):
+        ''' Non numeric results are text, errors go to error stream. '''
+        assert dict(make_sensor(tmpdir, query="SELECT 'a', 1").do_run())['result'] == \
+            "(u'a', 1)"
+        result = dict(make_sensor(tmpdir, query='SELECT * FROM missing').do_run())
+        assert 'no such table: missing' in result['error']
+
+    def test_queries(self, tmpdir):
+        ''' Named queries are run over one connection, reported in a table. '''
+        sensor = make_sensor(tmpdir, queries=[
+            {'name': 'answer', 'query': 'SELECT 42'},
+            {'name': 'text', 'query': "SELECT 'a;b\nc'"},
+            {'name': 'broken', 'query': 'SELECT * FROM missing'},
+        ])
+
+        result = dict(sensor.do_run())
+        rows = [line.split(';') for line in result['queries'].splitlines()]
+        assert rows[0] == ['name', 'result', 'query_time', 'error']
+        assert rows[1][:2] == ['answer', '42.0']
+        assert rows[2][:2] == ['text', "(u'a b\\nc',)"]
+        assert rows[3][:3] == ['broken', '', '']
+        assert 'no such table' in rows[3][3]
+        assert result['connect_time'] >= 0
+
+    def test_no_query(self, tmpdir):
+        ''' Either query or queries is needed. '''
+        assert make_sensor(tmpdir).do_run()[0][0] == 'error'
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+'''
+Rates from cumulative kernel counters (``/proc/diskstats``,
+``/proc/net/dev`` ...) of many devices, sampled at each sensor run.
+'''
+from fnmatch import fnmatchcase
+
+
+def counter_delta(previous, current):
+    '''
+    Difference of counter samples. A 32-bit counter (ticks of
+    ``/proc/diskstats``, ``/proc/net/dev`` of 32-bit kernels and some
+    drivers) which went down to less than half of its range from the top
+    wrapped, any other counter going down was reset and counts from zero.
+
+    :returns: the difference, ``None`` if the counter was reset
+    '''
+    if current >= previous:
+        return current - previous
+    if previous < 2 ** 32:
+        wrapped = current + 2 ** 32 - previous
+        if wrapped < 2 ** 31:
+            return wrapped
+    return None
+
+
+def selected(name, include=(), exclude=()):
+    '''
+    Checks ``name`` against glob patterns: it has to match one of
+    ``include`` (if any) and none of ``exclude``.
+    '''
+    if include and not any(fnmatchcase(name, pattern) for pattern in include):
+        return False
+    return not any(fnmatchcase(name, pattern) for pattern in exclude)
+
+
+class CounterDeltas(object):
+    '''
+    Keeps previous sample of counters of each device to compute deltas.
+    Devices not seen in a sample are forgotten. Values at ``gauges``
+    positions of samples may go down.
+    '''
+
+    def __init__(self, gauges=()):
+        self._gauges = frozenset(gauges)
+        self._previous = {}
+        self._sampled = None
+        self._current = {}
+        self._now = None
+
+    def add(self, device, counters):
+        '''
+        Adds ``counters`` (tuple) of ``device`` to the sample being taken.
+
+        :returns: tuple of deltas since previous sample (see
+            :func:`counter_delta`), ``None`` if device was not in it or any
+            of its counters was reset: the device was reset (or re-created)
+            and counts from zero, ``counters`` are the new baseline
+        '''
+        self._current[device] = counters
+        previous = self._previous.get(device)
+        if previous is None:
+            return None
+        deltas = []
+        for i, (before, current) in enumerate(zip(previous, counters)):
+            delta = current - before if i in self._gauges else counter_delta(before, current)
+            if delta is None:
+                return None
+            deltas.append(delta)
+        return tuple(deltas)
+
+    def start(self, now):
+        '''
+        Starts new sample taken at ``now``.
+
+        :returns: seconds since previous sample, ``None`` for the first one
+        '''
+        if self._now is not None:
+            self._previous, self._sampled = self._current, self._now
+        self._current = {}
+        self._now = now
+        if self._sampled is None:
+            return None
+        return now - self._sampled
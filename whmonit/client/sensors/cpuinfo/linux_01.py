@@ -3,10 +3,26 @@
 import platform
 
 from whmonit.client.sensors.base import TaskSensorBase
+from whmonit.client.sensors.procfs import ProcMixin
+from whmonit.client.sensors.procstat import (
+    CLOCK_TICKS, CPU_MODES, CpuUsage, parse_cpu_times, usage_table,
+)
 
+#: Streams of percentage of time spent in each mode, names of streams are
+#: limited to 16 characters.
+PERCENT_STREAMS = dict(
+    (mode, 'pct_guest_nice' if mode == 'guest_nice' else 'percent_{}'.format(mode))
+    for mode in CPU_MODES
+)
 
-class Sensor(TaskSensorBase):
-    '''Read processor information from /proc/cpuinfo.'''
+
+class Sensor(TaskSensorBase, ProcMixin):
+    '''
+    Read processor information.
+
+    Time counters come from /proc/stat. Usage percentages cover the time
+    since previous run, so they are not reported by the first one.
+    '''
     name = 'cpuinfo'
     streams = {
         'name': {
@@ -21,6 +37,10 @@ class Sensor(TaskSensorBase):
             'type': float,
             'description': 'Percent of CPU usage.',
         },
+        'cpu_cores': {
+            'type': str,
+            'description': 'Usage and time spent in each mode (percentage) of each CPU.'
+        },
         'time_user': {
             'type': float,
             'description': 'CPU Time User.'
@@ -62,24 +82,35 @@ class Sensor(TaskSensorBase):
             'description': 'CPU Time Guest Nice.'
         },
     }
+    streams.update(
+        (PERCENT_STREAMS[mode], {
+            'type': float,
+            'description': 'Percent of CPU time spent in {} mode.'.format(mode),
+            'unit': '%'
+        })
+        for mode in CPU_MODES
+    )
+
+    cpu_usage = None
 
     def do_run(self):
-        '''Returns 'cpuinfo' contents as a string.'''
-        import psutil
+        '''Returns processor information and usage.'''
+        if self.cpu_usage is None:
+            self.cpu_usage = CpuUsage(self.proc)
+        times = parse_cpu_times(self.read_proc('stat'))
+        usages = self.cpu_usage.update(times)
 
-        times = psutil.cpu_times()
-        return (
+        result = [
             ('name', str(platform.processor())),
-            ('cpu_count', float(psutil.cpu_count())),
-            ('cpu_percent', float(psutil.cpu_percent())),
-            ('time_user', float(times.user)),
-            ('time_nice', float(times.nice)),
-            ('time_system', float(times.system)),
-            ('time_idle', float(times.idle)),
-            ('time_iowait', float(times.iowait)),
-            ('time_irq', float(times.irq)),
-            ('time_softirq', float(times.softirq)),
-            ('time_steal', float(times.steal)),
-            ('time_guest', float(times.guest)),
-            ('time_guest_nice', float(times.guest_nice)),
+            ('cpu_count', float(len(times) - 1)),
+        ]
+        result.extend(
+            ('time_{}'.format(mode), float(counter) / CLOCK_TICKS)
+            for mode, counter in zip(CPU_MODES, times[0][1])
         )
+        if usages and usages[0][0] == 'cpu':
+            total = usages[0][1]
+            result.append(('cpu_percent', total['busy']))
+            result.extend((PERCENT_STREAMS[mode], total[mode]) for mode in CPU_MODES)
+            result.append(('cpu_cores', usage_table(usages)))
+        return tuple(result)
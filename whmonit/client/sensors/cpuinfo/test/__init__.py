@@ -0,0 +1,3 @@
+'''
+Sensor cpuinfo test __init__.
+'''
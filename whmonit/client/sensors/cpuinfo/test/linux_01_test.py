@@ -0,0 +1,27 @@
+'''
+Tests for whmonit.client.sensors.cpuinfo
+'''
+from mock import Mock
+
+from whmonit.client.sensors.procstat import CLOCK_TICKS
+from whmonit.client.sensors.test.procstat_test import write_stat
+
+from ..linux_01 import Sensor
+
+
+def test_cpu_usage(tmpdir, monkeypatch):
+    ''' Times are reported each run, usage starting with the second one. '''
+    monkeypatch.setattr(Sensor, 'proc', str(tmpdir))
+    write_stat(tmpdir, 100, 100, 1000, 10)
+    sensor = Sensor({'sampling_period': 1}, Mock(), None)
+
+    result = dict(sensor.do_run())
+    assert result['cpu_count'] == 1
+    assert result['time_user'] == 100.0 / CLOCK_TICKS
+    assert 'cpu_percent' not in result
+
+    write_stat(tmpdir, 100, 125, 1075, 10)
+    result = dict(sensor.do_run())
+    assert (result['cpu_percent'], result['percent_system']) == (25, 25)
+    assert result['pct_guest_nice'] == 0
+    assert len(result['cpu_cores'].splitlines()) == 2
@@ -1,15 +1,40 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+'''
+Disk I/O statistics sensor.
+'''
+import os
+import time
+
 from whmonit.client.sensors import TaskSensorBase
+from whmonit.client.sensors.counters import CounterDeltas, selected
+from whmonit.client.sensors.procfs import ProcMixin
 from whmonit.common.units import unit_reg
 
+#: /proc/diskstats counts sectors of 512 bytes, whatever the device uses.
+SECTOR_SIZE = 512
+
+# Columns of /proc/diskstats after major, minor and device name.
+READS, _, READ_SECTORS, READ_TICKS, WRITES, _, WRITE_SECTORS, WRITE_TICKS, \
+    IN_FLIGHT, IO_TICKS, WEIGHTED_TICKS = range(11)
+
+
+class Sensor(TaskSensorBase, ProcMixin):
+    '''
+    Disk I/O sensor class.
 
-class Sensor(TaskSensorBase):
-    '''netstat sensor class.'''
-    # W0232: Class has no __init__ method
-    # R0201: Method could be a function
+    Reads /proc/diskstats of all devices matching ``include`` and not
+    matching ``exclude`` glob patterns; partitions are skipped unless
+    ``partitions`` is set (or selected by ``device``). Counters are summed
+    over selected devices.
+
+    Rates, average I/O time, utilisation and queue depth (``iostat -x``
+    style) are computed from counters of the previous run, so they are not
+    reported by the first one. They go to separate streams for all devices
+    together and to a ``;`` separated table, one row per device.
+    '''
     # R0903: Too few public methods
-    # pylint: disable=W0232,R0201,R0903
+    # pylint: disable=R0903
 
     name = 'diskstat'
     streams = {
@@ -40,29 +65,161 @@ class Sensor(TaskSensorBase):
             'type': float,
             'description': 'Time spent writing to disk (in milliseconds).',
             'unit': str(unit_reg.millisec)
-        }
+        },
+        'read_iops': {
+            'type': float,
+            'description': 'Reads per second.',
+            'unit': str(unit_reg.second ** -1)
+        },
+        'write_iops': {
+            'type': float,
+            'description': 'Writes per second.',
+            'unit': str(unit_reg.second ** -1)
+        },
+        'read_rate': {
+            'type': float,
+            'description': 'Bytes read per second.',
+            'unit': str(unit_reg.byte / unit_reg.second)
+        },
+        'write_rate': {
+            'type': float,
+            'description': 'Bytes written per second.',
+            'unit': str(unit_reg.byte / unit_reg.second)
+        },
+        'await': {
+            'type': float,
+            'description': 'Average time of completed reads and writes, including queueing.',
+            'unit': str(unit_reg.millisec)
+        },
+        'util': {
+            'type': float,
+            'description': 'Percentage of time the busiest device had I/O in progress.',
+            'unit': '%'
+        },
+        'queue_depth': {
+            'type': float,
+            'description': 'Average number of I/O requests queued or in progress.'
+        },
+        'in_flight': {
+            'type': float,
+            'description': 'Number of I/O requests in progress at the time of reading.'
+        },
+        'devices': {
+            'type': str,
+            'description': 'Rates, average I/O time, utilisation and queue depth of each device.'
+        },
     }
     config_schema = {
         '$schema': 'http://json-schema.org/schema#',
         'type': 'object',
-        'properties': {'device': {'type': 'string'}},
+        'properties': {
+            'device': {'type': 'string'},
+            'include': {'type': 'array', 'items': {'type': 'string'}, 'default': []},
+            'exclude': {
+                'type': 'array', 'items': {'type': 'string'}, 'default': ['loop*', 'ram*'],
+            },
+            'partitions': {'type': 'boolean', 'default': False},
+        },
         'additionalProperties': False
     }
 
+    columns = (
+        'device', 'read_iops', 'write_iops', 'read_rate', 'write_rate', 'await', 'util',
+        'queue_depth', 'in_flight',
+    )
+
+    sys = '/sys'
+    deltas = None
+
+    def _disks(self):
+        '''Names of whole disks (not partitions) as in /proc/diskstats.'''
+        try:
+            # Slashes in names are replaced with `!` in sysfs.
+            return set(
+                name.replace('!', '/') for name in os.listdir(os.path.join(self.sys, 'block'))
+            )
+        except OSError:
+            return None
+
     def do_run(self):
         '''Executes itself.'''
-        import psutil
-
-        # if there is no device provided, count all data
+        if self.deltas is None:
+            # Queue length is current, not cumulative: it goes down without
+            # the device being reset.
+            self.deltas = CounterDeltas(gauges=(IN_FLIGHT,))
         if 'device' in self.config:
-            data = psutil.disk_io_counters(perdisk=True)[self.config['device']]
+            include, exclude, disks = [self.config['device']], (), None
         else:
-            data = psutil.disk_io_counters()
+            include, exclude = self.config['include'], self.config['exclude']
+            disks = None if self.config['partitions'] else self._disks()
+
+        data = self.read_proc('diskstats')
+        elapsed = self.deltas.start(time.time())
+        if elapsed is not None and elapsed <= 0:
+            # Clock went back, no rates this time.
+            elapsed = None
+
+        totals = [0] * 11
+        rows = []
+        # Completed I/Os and time they took, of devices with rates.
+        ios = ticks = 0
+        found = False
+        for line in data.splitlines():
+            fields = line.split()
+            name = fields[2]
+            if disks is not None and name not in disks:
+                continue
+            if not selected(name, include, exclude):
+                continue
+            found = True
+            counters = tuple(int(value) for value in fields[3:14])
+            for i, value in enumerate(counters):
+                totals[i] += value
+            delta = self.deltas.add(name, counters)
+            if delta is None or elapsed is None:
+                continue
+            device_ios = delta[READS] + delta[WRITES]
+            device_ticks = delta[READ_TICKS] + delta[WRITE_TICKS]
+            ios += device_ios
+            ticks += device_ticks
+            rows.append((name, (
+                delta[READS] / elapsed,
+                delta[WRITES] / elapsed,
+                delta[READ_SECTORS] * SECTOR_SIZE / elapsed,
+                delta[WRITE_SECTORS] * SECTOR_SIZE / elapsed,
+                float(device_ticks) / device_ios if device_ios else 0.0,
+                # Ticks are milliseconds.
+                min(100.0, delta[IO_TICKS] / (elapsed * 10)),
+                delta[WEIGHTED_TICKS] / (elapsed * 1000),
+                float(counters[IN_FLIGHT]),
+            )))
 
-        return (('read_bytes', float(data.read_bytes)),
-                ('write_bytes', float(data.write_bytes)),
-                ('read_count', float(data.read_count)),
-                ('write_count', float(data.write_count)),
-                ('read_time', float(data.read_time)),
-                ('write_time', float(data.write_time)))
+        if not found:
+            if 'device' in self.config:
+                self.log('Device {} not found'.format(self.config['device']))
+            return ()
 
+        result = [
+            ('read_bytes', float(totals[READ_SECTORS] * SECTOR_SIZE)),
+            ('write_bytes', float(totals[WRITE_SECTORS] * SECTOR_SIZE)),
+            ('read_count', float(totals[READS])),
+            ('write_count', float(totals[WRITES])),
+            ('read_time', float(totals[READ_TICKS])),
+            ('write_time', float(totals[WRITE_TICKS])),
+            ('in_flight', float(totals[IN_FLIGHT])),
+        ]
+        if rows:
+            columns = zip(*(row for _, row in rows))
+            result.extend((
+                ('read_iops', sum(columns[0])),
+                ('write_iops', sum(columns[1])),
+                ('read_rate', sum(columns[2])),
+                ('write_rate', sum(columns[3])),
+                ('await', float(ticks) / ios if ios else 0.0),
+                ('util', max(columns[5])),
+                ('queue_depth', sum(columns[6])),
+                ('devices', '\n'.join([';'.join(self.columns)] + [
+                    ';'.join([name] + [repr(value) for value in row]) for name, row in rows
+                ] + [''])),
+            ))
+        return tuple(result)
@@ -0,0 +1,3 @@
+'''
+Sensor diskstat test __init__.
+'''
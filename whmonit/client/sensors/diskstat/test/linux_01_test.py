@@ -0,0 +1,99 @@
+'''
+Tests for whmonit.client.sensors.diskstat
+'''
+import time
+
+import pytest
+from mock import Mock
+
+from ..linux_01 import Sensor
+
+
+def write_diskstats(proc, reads, sectors, ticks, io_ticks, in_flight=2):
+    '''Writes fake `/proc/diskstats` with sda, its partition and loop0.'''
+    line = '{:4d} {:7d} {} {} 0 {} {} {} 0 {} {} {} {} {} 0 0 0 0\n'
+    proc.join('diskstats').write(
+        line.format(8, 0, 'sda', reads, sectors, ticks, reads, sectors, ticks, in_flight,
+                    io_ticks, 2 * io_ticks) +
+        line.format(8, 1, 'sda1', reads, sectors, ticks, reads, sectors, ticks, in_flight,
+                    io_ticks, 2 * io_ticks) +
+        line.format(7, 0, 'loop0', 1, 1, 1, 1, 1, 1, 2, 1, 1)
+    )
+
+
+@pytest.fixture
+def sensor(tmpdir, monkeypatch):
+    '''Sensor reading fake `/proc` and `/sys`, clock in `sensor.clock`.'''
+    monkeypatch.setattr(Sensor, 'proc', str(tmpdir))
+    monkeypatch.setattr(Sensor, 'sys', str(tmpdir))
+    tmpdir.mkdir('block').mkdir('sda')
+    tmpdir.join('block').mkdir('loop0')
+    clock = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+
+    def make(**config):
+        '''Makes sensor with `config`.'''
+        config['sampling_period'] = 10
+        sensor = Sensor(config, Mock(), None)
+        sensor.clock = clock
+        return sensor
+    return make
+
+
+class TestDiskstat(object):
+    ''' Test diskstat sensor. '''
+
+    def test_rates(self, tmpdir, sensor):
+        ''' Rates are computed since previous run, partitions and loops skipped. '''
+        sensor = sensor()
+        write_diskstats(tmpdir, 100, 1000, 50, 100)
+        result = dict(sensor.do_run())
+        assert result['read_count'] == 100
+        assert result['read_bytes'] == 1000 * 512
+        assert 'read_iops' not in result
+
+        write_diskstats(tmpdir, 300, 3000, 250, 2100)
+        sensor.clock[0] += 10
+        result = dict(sensor.do_run())
+        assert result['read_iops'] == result['write_iops'] == 20
+        assert result['read_rate'] == 200 * 512
+        assert result['await'] == 1
+        assert result['util'] == 20
+        assert result['queue_depth'] == 0.4
+        assert result['in_flight'] == 2
+        rows = [line.split(';') for line in result['devices'].splitlines()]
+        assert rows[0] == list(Sensor.columns)
+        assert [row[0] for row in rows[1:]] == ['sda']
+
+    def test_queue_drained(self, tmpdir, sensor):
+        ''' Queue getting shorter doesn't stop rates, it is not a counter. '''
+        sensor = sensor()
+        write_diskstats(tmpdir, 100, 1000, 50, 100, in_flight=8)
+        sensor.do_run()
+
+        write_diskstats(tmpdir, 300, 3000, 250, 2100, in_flight=1)
+        sensor.clock[0] += 10
+        result = dict(sensor.do_run())
+        assert result['read_iops'] == 20
+        assert result['in_flight'] == 1
+
+    def test_ticks_wrap(self, tmpdir, sensor):
+        ''' 32-bit tick counters wrapping (every 49.7 days) don't drop the sample. '''
+        sensor = sensor()
+        write_diskstats(tmpdir, 100, 1000, 2 ** 32 - 50, 100)
+        sensor.do_run()
+
+        write_diskstats(tmpdir, 300, 3000, 150, 2100)
+        sensor.clock[0] += 10
+        result = dict(sensor.do_run())
+        assert result['read_iops'] == 20
+        assert result['await'] == 1
+
+    def test_select(self, tmpdir, sensor):
+        ''' Devices are selected by patterns or name. '''
+        write_diskstats(tmpdir, 100, 1000, 50, 100)
+
+        assert dict(sensor(partitions=True).do_run())['read_count'] == 200
+        assert dict(sensor(exclude=[]).do_run())['read_count'] == 101
+        assert dict(sensor(device='sda1').do_run())['read_count'] == 100
+        assert sensor(device='sdx').do_run() == ()
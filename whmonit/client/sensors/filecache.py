@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+'''
+Results shared by sensors run in separate processes, kept in files.
+
+Each sensor configuration runs in its own process, so sensors reading the
+same expensive source (a disk woken up by ``smartctl``, file descriptors of
+all processes ...) share what they read through a :class:`FileCache`:
+the first one locks the entry, reads the source and saves the result,
+others find it there.
+'''
+import errno
+import fcntl
+import json
+import os
+import stat
+import tempfile
+from contextlib import contextmanager
+
+
+class FileCache(object):
+    '''
+    Entries (JSON) kept in files in ``directory``, one per key, by default
+    in a ``whmonit-<name>-<uid>`` directory in system temporary directory.
+    The directory has to be owned by the user and not writable by others.
+    '''
+
+    def __init__(self, name, directory=None):
+        if directory is None:
+            directory = os.path.join(
+                tempfile.gettempdir(), 'whmonit-{}-{}'.format(name, os.geteuid())
+            )
+        self.directory = directory
+        try:
+            os.mkdir(directory, 0o700)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        info = os.lstat(directory)
+        if (not stat.S_ISDIR(info.st_mode) or info.st_uid != os.geteuid() or
+                info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)):
+            raise OSError(errno.EPERM, 'Not a private directory', directory)
+
+    def _path(self, key, suffix):
+        '''Path of file of ``key``.'''
+        return os.path.join(self.directory, key.replace(os.sep, '_') + suffix)
+
+    @contextmanager
+    def locked(self, key):
+        '''Holds exclusive lock of ``key`` entry.'''
+        lockfd = os.open(
+            self._path(key, '.lock'), os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600
+        )
+        try:
+            fcntl.flock(lockfd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(lockfd)
+
+    def load(self, key):
+        '''Returns entry of ``key``, empty if missing or unreadable.'''
+        try:
+            with open(self._path(key, '.json'), 'rb') as cachef:
+                return json.load(cachef)
+        except (IOError, ValueError):
+            return {}
+
+    def save(self, key, entry):
+        '''Replaces entry of ``key``.'''
+        path = self._path(key, '.json')
+        tmpfd, tmppath = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(tmpfd, 'wb') as cachef:
+            json.dump(entry, cachef)
+        os.rename(tmppath, path)
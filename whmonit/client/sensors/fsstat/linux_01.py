@@ -1,15 +1,113 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+'''
+Filesystem usage sensor.
+'''
+import os
+import re
+import select
+import threading
+import time
+
 from whmonit.client.sensors import TaskSensorBase
+from whmonit.client.sensors.counters import selected
+from whmonit.client.sensors.procfs import ProcMixin
 from whmonit.common.units import unit_reg
 
+#: Filesystem types without storage of their own, skipped by default.
+PSEUDO_FSTYPES = [
+    'autofs', 'binfmt_misc', 'bpf', 'cgroup', 'cgroup2', 'configfs', 'debugfs', 'devpts',
+    'devtmpfs', 'efivarfs', 'fusectl', 'hugetlbfs', 'mqueue', 'nsfs', 'proc', 'pstore',
+    'ramfs', 'rpc_pipefs', 'securityfs', 'selinuxfs', 'squashfs', 'sysfs', 'tracefs',
+]
+
+#: Octal escapes of whitespace and backslash in mountinfo paths.
+ESCAPE = re.compile(r'\\([0-7]{3})')
+
+
+def parse_mountinfo(data):
+    '''
+    Parses ``/proc/<pid>/mountinfo`` contents.
+
+    :returns: list of (mount point, filesystem type, source), a mount
+        point covered by a later mount only once (as the later one)
+    '''
+    mounts = {}
+    order = []
+    for line in data.splitlines():
+        fields = line.split()
+        try:
+            # Optional fields end with a separator.
+            separator = fields.index('-', 6)
+        except ValueError:
+            continue
+        mountpoint = ESCAPE.sub(lambda match: chr(int(match.group(1), 8)), fields[4])
+        source = fields[separator + 2] if len(fields) > separator + 2 else ''
+        if mountpoint not in mounts:
+            order.append(mountpoint)
+        mounts[mountpoint] = fields[separator + 1], source
+    return [(mountpoint,) + mounts[mountpoint] for mountpoint in order]
+
+
+def usage(path):
+    '''
+    Returns usage of filesystem mounted at ``path``: bytes total, used,
+    free (for unprivileged users) and percent used, inodes total, used,
+    free and percent used, as :mod:`psutil` and ``df -i`` compute them.
+    '''
+    stat = os.statvfs(path)
+    used = (stat.f_blocks - stat.f_bfree) * stat.f_frsize
+    free = stat.f_bavail * stat.f_frsize
+    inodes_used = stat.f_files - stat.f_ffree
+    return (
+        float(stat.f_blocks * stat.f_frsize), float(used), float(free),
+        100.0 * used / (used + free) if used + free else 0.0,
+        float(stat.f_files), float(inodes_used), float(stat.f_ffree),
+        100.0 * inodes_used / stat.f_files if stat.f_files else 0.0,
+    )
+
+
+class Statvfs(threading.Thread):
+    '''
+    Gets :func:`usage` of a mount point in a thread, as it may never
+    return (e.g. on hung NFS mount).
+    '''
 
-class Sensor(TaskSensorBase):
-    '''netstat sensor class.'''
-    # W0232: Class has no __init__ method
-    # R0201: Method could be a function
+    def __init__(self, path):
+        super(Statvfs, self).__init__(name='statvfs {}'.format(path))
+        self.daemon = True
+        self.path = path
+        self.usage = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.usage = usage(self.path)
+        except OSError as err:
+            self.error = err.strerror or str(err)
+
+
+class Sensor(TaskSensorBase, ProcMixin):
+    '''
+    Filesystem usage sensor class.
+
+    Reports usage of filesystem mounted at ``mountpoint``.
+
+    With ``discover`` all mounted filesystems are found in
+    ``/proc/self/mountinfo`` instead, selected by mount point (``include``
+    and ``exclude`` glob patterns) and type (``fstypes`` and
+    ``exclude_fstypes``, which skips pseudo filesystems by default). Usage
+    of bytes and inodes of each goes to a ``;`` separated table, one row
+    per mount point. The mount table is parsed again only when the kernel
+    reports a change of it.
+
+    Filesystems are checked in parallel, each for ``timeout`` milliseconds
+    at most, so a hung (e.g. NFS) mount doesn't hold up others. Its row
+    tells about the timeout, the mount point is not checked again until
+    the hung check returns.
+    '''
     # R0903: Too few public methods
-    # pylint: disable=W0232,R0201,R0903
+    # pylint: disable=R0903
 
     name = 'fsstat'
     streams = {
@@ -32,17 +130,127 @@ class Sensor(TaskSensorBase):
             'type': float,
             'description': 'Percentage usage of the disk.',
             'unit': '%'
-        }
+        },
+        'max_percent': {
+            'type': float,
+            'description': 'Highest percentage usage of space of discovered filesystems.',
+            'unit': '%'
+        },
+        'max_inodes_pct': {
+            'type': float,
+            'description': 'Highest percentage usage of inodes of discovered filesystems.',
+            'unit': '%'
+        },
+        'mounts': {
+            'type': str,
+            'description': 'Usage of space and inodes of each discovered filesystem.'
+        },
     }
     config_schema = {
         '$schema': 'http://json-schema.org/schema#',
         'type': 'object',
-        'properties': {'mountpoint': {'type': 'string', 'default': '/'}},
+        'properties': {
+            'mountpoint': {'type': 'string', 'default': '/'},
+            'discover': {'type': 'boolean', 'default': False},
+            'include': {'type': 'array', 'items': {'type': 'string'}, 'default': []},
+            'exclude': {'type': 'array', 'items': {'type': 'string'}, 'default': []},
+            'fstypes': {'type': 'array', 'items': {'type': 'string'}, 'default': []},
+            'exclude_fstypes': {
+                'type': 'array', 'items': {'type': 'string'}, 'default': PSEUDO_FSTYPES,
+            },
+            'timeout': {'type': 'integer', 'minimum': 1, 'default': 2000},
+        },
         'additionalProperties': False
     }
 
+    columns = (
+        'mountpoint', 'fstype', 'source', 'total', 'used', 'free', 'percent', 'inodes_total',
+        'inodes_used', 'inodes_free', 'inodes_percent', 'error',
+    )
+
+    #: ``/proc/self/mountinfo`` kept open, polled for mount table changes.
+    mountinfo = None
+    poller = None
+    #: Mount table, see :func:`parse_mountinfo`.
+    mounts = None
+    #: Maps mount point to :class:`Statvfs` which timed out.
+    hung = None
+
+    def _mounts(self):
+        '''Returns mount table, parsed again if it changed.'''
+        if self.mountinfo is None:
+            self.mountinfo = open(os.path.join(self.proc, 'self', 'mountinfo'), 'rb')
+            self.poller = select.poll()
+            # Mount or unmount is signalled as exceptional condition.
+            self.poller.register(self.mountinfo, select.POLLPRI)
+        elif not self.poller.poll(0):
+            return self.mounts
+        self.mountinfo.seek(0)
+        self.mounts = parse_mountinfo(self.mountinfo.read())
+        return self.mounts
+
+    def _usage_all(self, mountpoints):
+        '''
+        Gets :func:`usage` of all ``mountpoints`` in parallel.
+
+        :returns: list of (usage, error), one of them ``None``
+        '''
+        if self.hung is None:
+            self.hung = {}
+        deadline = time.time() + self.config['timeout'] / 1000.0
+        threads = []
+        for mountpoint in mountpoints:
+            thread = self.hung.get(mountpoint)
+            if thread is not None and thread.is_alive():
+                threads.append(None)
+                continue
+            self.hung.pop(mountpoint, None)
+            thread = Statvfs(mountpoint)
+            thread.start()
+            threads.append(thread)
+
+        results = []
+        for mountpoint, thread in zip(mountpoints, threads):
+            if thread is None:
+                results.append((None, 'still not responding'))
+                continue
+            thread.join(max(0.0, deadline - time.time()))
+            if thread.is_alive():
+                self.hung[mountpoint] = thread
+                results.append((None, 'timed out'))
+            else:
+                results.append((thread.usage, thread.error))
+        return results
+
+    def _discover(self):
+        '''Returns usage of all selected filesystems.'''
+        mounts = [
+            mount for mount in self._mounts()
+            if selected(mount[0], self.config['include'], self.config['exclude']) and
+            selected(mount[1], self.config['fstypes'], self.config['exclude_fstypes'])
+        ]
+        results = self._usage_all([mountpoint for mountpoint, _, _ in mounts])
+
+        lines = [';'.join(self.columns)]
+        for mount, (values, error) in zip(mounts, results):
+            cells = [''] * 8 if values is None else [repr(value) for value in values]
+            lines.append(';'.join(
+                [field.replace(';', ',') for field in mount] + cells + [error or '']
+            ))
+        result = [('mounts', '\n'.join(lines + ['']))]
+        usages = [values for values, _ in results if values is not None]
+        if usages:
+            result.extend((
+                ('max_percent', max(values[3] for values in usages)),
+                ('max_inodes_pct', max(values[7] for values in usages)),
+            ))
+        return tuple(result)
+
     def do_run(self):
         '''Executes itself.'''
+        if self.config['discover']:
+            return self._discover()
+
         import psutil
 
         data = psutil.disk_usage(self.config['mountpoint'])
@@ -51,4 +259,3 @@ class Sensor(TaskSensorBase):
                 ('used', float(data.used)),
                 ('free', float(data.free)),
                 ('percent', float(data.percent)))
-
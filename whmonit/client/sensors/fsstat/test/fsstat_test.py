@@ -1,9 +1,72 @@
 '''
 Tests for whmonit.client.sensors.fsstat
 '''
+import threading
+
+import pytest
 from mock import Mock
 
-from ..linux_01 import Sensor
+from .. import linux_01
+from ..linux_01 import Sensor, parse_mountinfo
+
+
+class FakePoll(object):
+    '''Poll object reporting mount table change when ``changed`` is set.'''
+    changed = False
+
+    def register(self, *args):
+        '''Ignores registration.'''
+
+    def poll(self, timeout):
+        '''Returns change event once after ``changed`` was set.'''
+        assert timeout == 0
+        if not FakePoll.changed:
+            return []
+        FakePoll.changed = False
+        return [(3, linux_01.select.POLLPRI)]
+
+
+def write_mountinfo(proc, mountpoints):
+    '''Writes fake `/proc/self/mountinfo` with ``mountpoints`` and pseudo filesystems.'''
+    lines = [
+        '23 28 0:22 / /proc rw,relatime - proc proc rw',
+        '25 28 0:6 / /dev rw,relatime - devtmpfs devtmpfs rw,mode=755',
+    ] + [
+        '{} 28 8:1 / {} rw,relatime shared:1 - ext4 /dev/sda{} rw'.format(
+            30 + i, mountpoint.replace(' ', '\\040'), i
+        ) for i, mountpoint in enumerate(mountpoints)
+    ]
+    proc.ensure('self', 'mountinfo').write('\n'.join(lines) + '\n')
+
+
+@pytest.fixture
+def sensor(tmpdir, monkeypatch):
+    '''Sensor discovering fake mounts, directories in ``tmpdir``.'''
+    monkeypatch.setattr(Sensor, 'proc', str(tmpdir.join('proc')))
+    monkeypatch.setattr(linux_01.select, 'poll', FakePoll)
+    FakePoll.changed = False
+
+    def make(**config):
+        '''Makes sensor with `config`.'''
+        config.update(sampling_period=10, discover=True)
+        return Sensor(config, Mock(), None)
+    return make
+
+
+def rows(result):
+    '''Table of ``mounts`` stream as dict of rows by mount point.'''
+    lines = [line.split(';') for line in result['mounts'].splitlines()]
+    assert lines[0] == list(Sensor.columns)
+    return dict((row[0], dict(zip(Sensor.columns, row))) for row in lines[1:])
+
+
+def test_parse_mountinfo():
+    ''' Escaped paths are decoded, overmounted mount point listed once. '''
+    assert parse_mountinfo(
+        '36 35 98:0 /mnt1 /mnt/with\\040space rw,noatime master:1 - ext3 /dev/root rw\n'
+        '37 35 0:40 / /srv rw - nfs server:/export rw\n'
+        '38 37 0:41 / /srv rw - tmpfs tmpfs rw\n'
+    ) == [('/mnt/with space', 'ext3', '/dev/root'), ('/srv', 'tmpfs', 'tmpfs')]
 
 
 class TestFsstat(object):
@@ -14,3 +77,68 @@ class TestFsstat(object):
 
         result = Sensor({'sampling_period': 3}, Mock(), None).do_run()
         assert len(result) == 4
+
+    def test_discover(self, tmpdir, sensor):
+        ''' Usage of bytes and inodes of selected filesystems is sent. '''
+        mountpoints = [str(tmpdir.mkdir('data')), str(tmpdir.mkdir('with space'))]
+        write_mountinfo(tmpdir.join('proc'), mountpoints)
+        result = dict(sensor().do_run())
+        table = rows(result)
+        assert sorted(table) == sorted(mountpoints)
+        row = table[mountpoints[1]]
+        assert row['fstype'] == 'ext4'
+        assert row['source'] == '/dev/sda1'
+        assert float(row['total']) > 0
+        assert float(row['inodes_total']) >= float(row['inodes_used'])
+        assert row['error'] == ''
+        assert result['max_percent'] == max(float(row['percent']) for row in table.values())
+
+        assert sorted(rows(dict(sensor(exclude_fstypes=[]).do_run()))) == sorted(
+            mountpoints + ['/proc', '/dev']
+        )
+        assert list(rows(dict(sensor(include=['*/data']).do_run()))) == mountpoints[:1]
+        assert list(rows(dict(sensor(fstypes=['nfs*']).do_run()))) == []
+
+    def test_mount_table_cache(self, tmpdir, sensor):
+        ''' Mount table is parsed again only when it changed. '''
+        mountpoints = [str(tmpdir.mkdir('data')), str(tmpdir.mkdir('new'))]
+        write_mountinfo(tmpdir.join('proc'), mountpoints[:1])
+        sensor = sensor()
+        assert list(rows(dict(sensor.do_run()))) == mountpoints[:1]
+
+        write_mountinfo(tmpdir.join('proc'), mountpoints)
+        assert list(rows(dict(sensor.do_run()))) == mountpoints[:1]
+        FakePoll.changed = True
+        assert sorted(rows(dict(sensor.do_run()))) == mountpoints
+
+    def test_timeout(self, tmpdir, sensor, monkeypatch):
+        ''' Hung mount times out without holding up others, is skipped until it returns. '''
+        mountpoints = [str(tmpdir.mkdir('hung')), str(tmpdir.mkdir('data'))]
+        write_mountinfo(tmpdir.join('proc'), mountpoints)
+        release = threading.Event()
+        calls = []
+        usage = linux_01.usage
+
+        def hanging_usage(path):
+            '''Hangs for `hung` mount point until released.'''
+            calls.append(path)
+            if path == mountpoints[0]:
+                release.wait()
+            return usage(path)
+        monkeypatch.setattr(linux_01, 'usage', hanging_usage)
+
+        sensor = sensor(timeout=50)
+        table = rows(dict(sensor.do_run()))
+        assert table[mountpoints[0]]['error'] == 'timed out'
+        assert table[mountpoints[0]]['total'] == ''
+        assert table[mountpoints[1]]['error'] == ''
+
+        table = rows(dict(sensor.do_run()))
+        assert table[mountpoints[0]]['error'] == 'still not responding'
+        assert calls.count(mountpoints[0]) == 1
+
+        release.set()
+        sensor.hung[mountpoints[0]].join()
+        table = rows(dict(sensor.do_run()))
+        assert table[mountpoints[0]]['error'] == ''
+        assert calls.count(mountpoints[0]) == 2
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Host metrics sensor.
+'''
+from whmonit.client.sensors import TaskSensorBase
+from whmonit.client.sensors.cpuinfo.linux_01 import Sensor as CpuinfoSensor
+from whmonit.client.sensors.diskstat.linux_01 import Sensor as DiskstatSensor
+from whmonit.client.sensors.fsstat.linux_01 import Sensor as FsstatSensor
+from whmonit.client.sensors.loadavg.linux_01 import Sensor as LoadavgSensor
+from whmonit.client.sensors.netstat.linux_01 import Sensor as NetstatSensor
+from whmonit.client.sensors.procfs import ProcMixin, Snapshot
+from whmonit.client.sensors.sysstat.linux_01 import Sensor as SysstatSensor
+from whmonit.client.sensors.uptime.linux_01 import Sensor as UptimeSensor
+
+#: Sensors which can be run together, by name.
+SENSORS = dict((sensor.name, sensor) for sensor in (
+    LoadavgSensor, UptimeSensor, SysstatSensor, CpuinfoSensor, FsstatSensor,
+    NetstatSensor, DiskstatSensor,
+))
+
+
+def stream_name(sensor, stream):
+    '''
+    Name of ``sensor`` ``stream`` in host metrics: the same as in the
+    sensor, ``default`` streams named after their sensors.
+    '''
+    return sensor if stream == 'default' else stream
+
+
+def _streams():
+    '''Streams of all sensors, see :func:`stream_name`.'''
+    return dict(
+        (stream_name(name, stream), dict(info))
+        for name, sensor in SENSORS.iteritems()
+        for stream, info in sensor.streams.iteritems() if stream != 'error'
+    )
+
+
+class Sensor(TaskSensorBase, ProcMixin):
+    '''
+    Runs host metrics sensors (``loadavg``, ``uptime``, ``sysstat``,
+    ``cpuinfo``, ``fsstat``, ``netstat``, ``diskstat``) together: one wakeup
+    per run and each ``/proc`` file read once, shared by all of them.
+
+    ``sensors`` maps names of sensors to run to their configuration.
+    Streams keep their names, as sent by the sensors run alone (they don't
+    collide), except ``default`` streams named after their sensors.
+    '''
+
+    name = 'hostmetrics'
+    streams = _streams()
+    config_schema = {
+        '$schema': 'http://json-schema.org/schema#',
+        'type': 'object',
+        'properties': {
+            'sensors': {
+                'type': 'object',
+                'properties': dict((name, {'type': 'object'}) for name in SENSORS),
+                'additionalProperties': False,
+                'default': dict((name, {}) for name in SENSORS),
+            },
+        },
+        'additionalProperties': False
+    }
+
+    sensors = None
+
+    def _make_sensors(self):
+        '''Returns list of (name, sensor instance) to run.'''
+        sensors = []
+        for name, config in sorted(self.config['sensors'].iteritems()):
+            config = dict(config, sampling_period=self.config['sampling_period'])
+            sensor = SENSORS[name](config, self.send_results, self.storage)
+            if isinstance(sensor, ProcMixin):
+                sensor.proc = self.proc
+            sensors.append((name, sensor))
+        return sensors
+
+    def do_run(self):
+        '''Runs all sensors, returns their results.'''
+        if self.sensors is None:
+            self.sensors = self._make_sensors()
+        snapshot = Snapshot(self.proc)
+        result = []
+        for name, sensor in self.sensors:
+            if isinstance(sensor, ProcMixin):
+                sensor.snapshot = snapshot
+            try:
+                data = sensor.do_run()
+            except EnvironmentError as err:
+                self.log('Sensor {} failed: {}'.format(name, err))
+                continue
+            result.extend((stream_name(name, stream), value) for stream, value in data)
+        return tuple(result)
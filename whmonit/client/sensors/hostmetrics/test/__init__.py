@@ -0,0 +1,3 @@
+'''
+Sensor hostmetrics test __init__.
+'''
@@ -0,0 +1,55 @@
+'''
+Tests for whmonit.client.sensors.hostmetrics
+'''
+from mock import Mock
+
+from whmonit.client.sensors import procfs
+from whmonit.client.sensors.test.procstat_test import write_stat
+
+from ..linux_01 import SENSORS, Sensor
+
+
+def test_shared_snapshot(tmpdir, monkeypatch):
+    ''' Each /proc file is read once per run, streams keep their names. '''
+    write_stat(tmpdir, 100, 100, 1000, 10)
+    tmpdir.join('meminfo').write('MemTotal: 100 kB\nMemFree: 50 kB\n')
+    tmpdir.join('loadavg').write('0.50 0.40 0.30 1/100 1234\n')
+    tmpdir.join('uptime').write('1000.50 900.00\n')
+    monkeypatch.setattr(Sensor, 'proc', str(tmpdir))
+    opened = []
+
+    def counting_open(path, mode):
+        '''Records opened files.'''
+        opened.append(path)
+        return open(path, mode)
+
+    monkeypatch.setattr(procfs, 'open', counting_open, raising=False)
+    sensor = Sensor(
+        {'sampling_period': 1, 'sensors': {'loadavg': {}, 'uptime': {}, 'sysstat': {},
+                                           'cpuinfo': {}}},
+        Mock(), None,
+    )
+
+    result = dict(sensor.do_run())
+    assert sorted(opened) == sorted(
+        str(tmpdir.join(name)) for name in ('stat', 'meminfo', 'loadavg', 'uptime')
+    )
+    assert (result['loadavg'], result['uptime']) == (0.5, 1000.5)
+    assert result['vmem_perc'] == 50
+    assert result['cpu_count'] == 1
+    assert 'proc_avg' not in result
+
+    write_stat(tmpdir, 150, 100, 1050, 10)
+    result = dict(sensor.do_run())
+    assert result['proc_avg'] == result['cpu_percent'] == 50
+    assert set(name for name, _ in sensor.sensors) == set(['loadavg', 'uptime', 'sysstat',
+                                                           'cpuinfo'])
+
+
+def test_streams():
+    ''' Streams of all sensors are declared, names don't collide. '''
+    assert 'loadavg' in Sensor.streams
+    assert 'read_iops' in Sensor.streams
+    assert sum(
+        len(sensor.streams) - 1 for sensor in SENSORS.itervalues()
+    ) == len(Sensor.streams) - 1
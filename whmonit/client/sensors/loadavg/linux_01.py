@@ -3,11 +3,11 @@
 '''
 system load sensor.
 '''
-import os
 from whmonit.client.sensors import TaskSensorBase
+from whmonit.client.sensors.procfs import ProcMixin
 
 
-class Sensor(TaskSensorBase):
+class Sensor(TaskSensorBase, ProcMixin):
     '''Generic system load sensor.'''
     # W0232: Class has no __init__ method
     # R0201: Method could be a function
@@ -15,6 +15,7 @@ class Sensor(TaskSensorBase):
     # pylint: disable=W0232,R0201,R0903
 
     name = 'loadavg'
+    millisecond_timestamps = True
     streams = {
         'default': {
             'type': float,
@@ -24,4 +25,5 @@ class Sensor(TaskSensorBase):
     }
 
     def do_run(self):
-        return (("default", float(os.getloadavg()[0])),)
+        '''Returns one minute load average.'''
+        return (("default", float(self.read_proc('loadavg').split()[0])),)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+'''
+Minimal inotify(7) binding using ctypes.
+
+Only what file tailing needs: watches and waiting for events with timeout.
+'''
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+#: struct inotify_event: wd, mask, cookie, len, followed by name.
+_EVENT = struct.Struct('iIII')
+
+
+class Inotify(object):
+    '''
+    Inotify instance. Raises :class:`OSError` when inotify is not available.
+    '''
+
+    def __init__(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            self._init1 = libc.inotify_init1
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+        except (OSError, AttributeError) as err:
+            raise OSError(errno.ENOSYS, 'inotify is not available: {}'.format(err))
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+
+        self.fd = self._init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            self._raise()
+
+    @staticmethod
+    def _raise(path=None):
+        '''Raises :class:`OSError` for current errno.'''
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err), path)
+
+    def add_watch(self, path, mask):
+        '''Watches ``path`` for ``mask`` events, returns watch descriptor.'''
+        wd = self._add_watch(self.fd, path, mask)
+        if wd < 0:
+            self._raise(path)
+        return wd
+
+    def rm_watch(self, wd):
+        '''Removes watch, watches of deleted files are already gone.'''
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self, timeout):
+        '''
+        Waits up to ``timeout`` seconds for events.
+
+        :returns: list of (wd, mask, name) tuples, empty on timeout
+        '''
+        try:
+            ready = select.select((self.fd,), (), (), timeout)[0]
+        except select.error as err:
+            if err.args[0] == errno.EINTR:
+                return []
+            raise
+        if not ready:
+            return []
+
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except OSError as err:
+                if err.errno in (errno.EAGAIN, errno.EINTR):
+                    break
+                raise
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, pos)
+                pos += _EVENT.size
+                events.append((wd, mask, data[pos:pos + length].rstrip('\0')))
+                pos += length
+        return events
+
+    def close(self):
+        '''Closes inotify instance, removing all watches.'''
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
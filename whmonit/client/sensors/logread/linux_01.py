@@ -3,22 +3,71 @@
 '''
 Logread sensor.
 '''
-import subprocess
-from nanotime import nanotime
+import time
 
 from whmonit.client.sensors.base import AdvancedSensorBase
 
+from .inotify import Inotify
+from .pipeline import Pipeline
+from .tailer import GlobTailer
+
 
 class Sensor(AdvancedSensorBase):
     '''
     Long-running logread sensor.
+
+    ``filename`` may be a glob pattern, all matching files are followed
+    (new matches are picked up within ``rescan_interval`` seconds).
+
+    Lines are sent in batches (a single ``str`` result with many lines) of
+    at most ``batch_lines`` lines, collected for at most ``batch_interval``
+    milliseconds. Positions (device, inode and byte offset of each file)
+    are saved in storage at most every ``save_interval`` seconds.
+
+    With ``pipeline`` set, lines are parsed and filtered before sending
+    (see :mod:`.pipeline`). Aggregates of matching lines are sent at the end
+    of each window: number of lines as ``matched`` and a ``;`` separated
+    table, one row per key, as ``aggregates``.
     '''
 
     name = 'logread'
+    millisecond_timestamps = True
     config_schema = {
         '$schema': 'http://json-schema.org/schema#',
         'type': 'object',
-        'properties': {'filename': {'type': 'string'}},
+        'properties': {
+            'filename': {'type': 'string'},
+            'batch_lines': {'type': 'integer', 'minimum': 1, 'default': 1000},
+            'batch_interval': {'type': 'integer', 'minimum': 0, 'default': 1000},
+            'save_interval': {'type': 'integer', 'minimum': 1, 'default': 5},
+            'rescan_interval': {'type': 'integer', 'minimum': 1, 'default': 10},
+            'pipeline': {
+                'type': 'object',
+                'properties': {
+                    'pattern': {'type': 'string'},
+                    'filters': {
+                        'type': 'object',
+                        'additionalProperties': {'type': 'string'},
+                    },
+                    'send_matches': {'type': 'boolean'},
+                    'aggregate': {
+                        'type': 'object',
+                        'properties': {
+                            'interval': {'type': 'integer', 'minimum': 1, 'default': 60},
+                            'keys': {'type': 'array', 'items': {'type': 'string'}},
+                            'sum': {'type': 'array', 'items': {'type': 'string'}},
+                            'percentile': {'type': 'array', 'items': {'type': 'string'}},
+                            'percentiles': {
+                                'type': 'array',
+                                'items': {'type': 'number', 'minimum': 0, 'maximum': 100},
+                            },
+                        },
+                        'additionalProperties': False,
+                    },
+                },
+                'additionalProperties': False,
+            },
+        },
         'required': ['filename'],
         'additionalProperties': False
     }
@@ -26,21 +75,124 @@ class Sensor(AdvancedSensorBase):
         'default': {
             'type': str,
             'description': 'Logs from the file.'
-        }
+        },
+        'matched': {
+            'type': float,
+            'description': 'Number of matching lines in aggregation window.'
+        },
+        'aggregates': {
+            'type': str,
+            'description': 'Counts, sums and percentiles of matching lines per key.'
+        },
     }
 
+    #: How long to wait for new data when there is nothing to send (seconds).
+    idle_timeout = 1.0
+    #: Wait time limit when inotify is not available (seconds).
+    poll_interval = 0.25
+
+    tailer = None
+    inotify = None
+    pipeline = None
+
+    def start(self):
+        '''Starts following the file.'''
+        try:
+            self.inotify = Inotify()
+        except OSError as err:
+            self.log('Cannot use inotify, falling back to polling: {}'.format(err))
+        # Line number is the position saved by older versions.
+        self._legacy_line_no = self.storage.get('line_no')
+        self.tailer = GlobTailer(
+            self.config['filename'],
+            self.storage.get('positions') or (),
+            self.inotify,
+            self.config['rescan_interval'],
+            skip_lines=self._legacy_line_no or 0,
+        )
+        if 'pipeline' in self.config:
+            self.pipeline = Pipeline(self.config['pipeline'])
+        self._pending = []
+        self._pending_since = None
+        self._saved_at = time.time()
+
+    def step(self):
+        '''
+        Reads new lines, sends full or old enough batch and saves position.
+
+        :returns: seconds to wait for more data, 0 if there may be more to read
+        '''
+        lines = self.tailer.read_lines()
+        now = time.time()
+        aggregator = self.pipeline and self.pipeline.aggregator
+        if aggregator is not None:
+            # Lines just read belong to the new window.
+            self._send_aggregates(aggregator.flush(now))
+        read = bool(lines)
+        if self.pipeline is not None:
+            lines = self.pipeline.feed(lines, now)
+        if lines and not self._pending:
+            self._pending_since = now
+        self._pending.extend(lines)
+
+        batch_lines = self.config['batch_lines']
+        while len(self._pending) >= batch_lines:
+            self._send(self._pending[:batch_lines])
+            del self._pending[:batch_lines]
+            self._pending_since = now
+
+        interval = self.config['batch_interval'] / 1000.0
+        if self._pending and now - self._pending_since >= interval:
+            self._send(self._pending)
+            self._pending = []
+
+        # Position is known for lines read so far, only save it when all of
+        # them were sent.
+        if not self._pending and now - self._saved_at >= self.config['save_interval']:
+            self.storage['positions'] = self.tailer.positions()
+            self._saved_at = now
+            if self._legacy_line_no is not None:
+                del self.storage['line_no']
+                self._legacy_line_no = None
+
+        if read:
+            return 0
+        timeout = self.idle_timeout
+        if self._pending:
+            timeout = max(interval - (now - self._pending_since), 0)
+        if aggregator is not None:
+            timeout = min(timeout, max(aggregator.window_end - now, 0))
+        return timeout
+
+    def _send(self, lines):
+        '''Sends lines as a single result.'''
+        self.send_results(self.timestamp(), (('default', ''.join(lines)),))
+
+    def _send_aggregates(self, result):
+        '''Sends closed aggregation window, if any.'''
+        if result is None:
+            return
+        window_end, total, rows = result
+        table = '\n'.join(
+            [';'.join(self.pipeline.aggregator.header())] + [';'.join(row) for row in rows] + ['']
+        )
+        self.send_results(
+            int(window_end * 1000), (('matched', float(total)), ('aggregates', table)),
+        )
+
+    def wait(self, timeout):
+        '''Waits up to ``timeout`` seconds for the file to change.'''
+        if self.inotify is not None:
+            self.tailer.handle_events(self.inotify.read_events(timeout))
+        else:
+            time.sleep(min(timeout, self.poll_interval))
+
     def do_run(self):
         '''
         Run sensor.
         '''
-        self.storage['line_no'] = self.storage.get('line_no') or 0
-        filename = self.config['filename']
-        f = subprocess.Popen(
-            ('tail', '-F', '-n', '+{}'.format(self.storage['line_no']), filename),
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-        )
+        self.start()
         while True:
-            self.send_results(
-                nanotime.now().datetime(), (("default", f.stdout.readline()),)
-            )
-            self.storage['line_no'] += 1
+            timeout = self.step()
+            if timeout:
+                self.wait(timeout)
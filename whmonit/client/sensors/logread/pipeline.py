@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+'''
+Log lines parsing, filtering and aggregation done on the agent.
+
+Each line is matched against ``pattern``; its named groups (and ``line``,
+the whole line) are fields. Lines not matching the pattern or any of
+``filters`` (field name to regular expression) are dropped.
+
+With ``aggregate`` set, matching lines are counted in windows of
+``interval`` seconds, grouped by values of ``keys`` fields. For each group
+``sum`` fields are summed up and ``percentiles`` of ``percentile`` fields
+are computed. Windows are aligned to multiples of ``interval`` since epoch.
+'''
+import math
+import re
+from array import array
+
+
+class Aggregator(object):
+    '''
+    Windowed counts, sums and percentiles per key.
+    '''
+
+    def __init__(self, interval, keys=(), sums=(), percentile_fields=(),
+                 percentiles=(50, 90, 99)):
+        self.interval = interval
+        # Field names are regular expression group names, so plain ASCII.
+        self.keys = tuple(str(name) for name in keys)
+        self.sums = tuple(str(name) for name in sums)
+        self.percentile_fields = tuple(str(name) for name in percentile_fields)
+        self.percentiles = tuple(percentiles)
+        #: End of current window (seconds since epoch).
+        self.window_end = None
+        self._groups = {}
+
+    def header(self):
+        '''Column names of :meth:`flush` table.'''
+        return self.keys + ('count',) + tuple(
+            'sum_{}'.format(field) for field in self.sums
+        ) + tuple(
+            'p{:g}_{}'.format(percentile, field)
+            for field in self.percentile_fields for percentile in self.percentiles
+        )
+
+    def _next_window_end(self, now):
+        '''End of the window ``now`` belongs to.'''
+        return (math.floor(now / self.interval) + 1) * self.interval
+
+    def add(self, fields, now):
+        '''Accounts line with ``fields`` seen at ``now``.'''
+        if self.window_end is None:
+            self.window_end = self._next_window_end(now)
+        key = tuple(fields.get(name) or '' for name in self.keys)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = [
+                0, [0.0] * len(self.sums), [array('d') for _ in self.percentile_fields],
+            ]
+        group[0] += 1
+        sums = group[1]
+        for i, name in enumerate(self.sums):
+            value = _number(fields.get(name))
+            if value is not None:
+                sums[i] += value
+        for values, name in zip(group[2], self.percentile_fields):
+            value = _number(fields.get(name))
+            if value is not None:
+                values.append(value)
+
+    def flush(self, now):
+        '''
+        Closes current window if it ended before ``now``. Windows are
+        closed also when empty, so that zero counts are reported.
+
+        :returns: (window end, total count, table rows) or ``None``
+        '''
+        if self.window_end is None:
+            self.window_end = self._next_window_end(now)
+        if now < self.window_end:
+            return None
+        window_end = self.window_end
+        groups, self._groups = self._groups, {}
+        self.window_end = self._next_window_end(now)
+
+        rows = []
+        total = 0
+        for key in sorted(groups):
+            count, sums, values = groups[key]
+            total += count
+            row = list(key) + [str(count)] + [repr(value) for value in sums]
+            for field_values in values:
+                field_values = sorted(field_values)
+                row.extend(
+                    repr(_percentile(field_values, percentile)) if field_values else ''
+                    for percentile in self.percentiles
+                )
+            rows.append(row)
+        return window_end, total, rows
+
+
+def _number(value):
+    '''Field value as float, ``None`` when missing or not a number.'''
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _percentile(values, percentile):
+    '''Nearest-rank percentile of sorted ``values``.'''
+    rank = int(math.ceil(percentile / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class Pipeline(object):
+    '''
+    Built from logread ``pipeline`` config.
+
+    :meth:`feed` returns lines to be sent as they are: matching lines
+    unless aggregating (or ``send_matches`` says otherwise).
+    '''
+
+    def __init__(self, config):
+        self.pattern = re.compile(config['pattern']) if 'pattern' in config else None
+        self.filters = [
+            (field, re.compile(regex))
+            for field, regex in sorted(config.get('filters', {}).items())
+        ]
+        aggregate = config.get('aggregate')
+        self.aggregator = None
+        if aggregate is not None:
+            self.aggregator = Aggregator(
+                aggregate.get('interval', 60),
+                aggregate.get('keys', ()),
+                aggregate.get('sum', ()),
+                aggregate.get('percentile', ()),
+                aggregate.get('percentiles', (50, 90, 99)),
+            )
+        self.send_matches = config.get('send_matches', aggregate is None)
+
+    def _fields(self, line):
+        '''Fields of matching line, ``None`` if line does not match.'''
+        if self.pattern is not None:
+            match = self.pattern.search(line)
+            if match is None:
+                return None
+            fields = match.groupdict()
+        else:
+            fields = {}
+        fields['line'] = line.rstrip('\r\n')
+        for name, regex in self.filters:
+            value = fields.get(name)
+            if value is None or not regex.search(value):
+                return None
+        return fields
+
+    def feed(self, lines, now):
+        '''Processes ``lines`` read at ``now``, returns lines to send.'''
+        matches = []
+        for line in lines:
+            fields = self._fields(line)
+            if fields is None:
+                continue
+            if self.aggregator is not None:
+                self.aggregator.add(fields, now)
+            if self.send_matches:
+                matches.append(line)
+        return matches
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+'''
+In-process ``tail -F``: follows files by name across rotation and
+truncation, reading them in big chunks.
+
+Read positions are byte offsets kept per file identity (device, inode) in
+a dict shared by all tailers, so a file is never read twice - also when it
+shows up under another name after rotation - and reading resumes with a
+single seek after restart.
+'''
+import errno
+import glob
+import io
+import os
+import time
+
+from .inotify import (
+    IN_ATTRIB, IN_CREATE, IN_DELETE_SELF, IN_MODIFY, IN_MOVE_SELF, IN_MOVED_TO,
+)
+
+#: Bytes read at once.
+READ_SIZE = 64 * 1024
+#: Bytes read by single :meth:`FileTailer.read_lines` call, so that a long
+#: backlog is returned in parts.
+READ_LIMIT = 16 * READ_SIZE
+
+FILE_EVENTS = IN_MODIFY | IN_ATTRIB | IN_MOVE_SELF | IN_DELETE_SELF
+DIRECTORY_EVENTS = IN_CREATE | IN_MOVED_TO
+
+
+class FileTailer(object):
+    '''
+    Follows ``path``, returning complete lines appended to it.
+
+    ``offsets`` maps (device, inode) to byte offset of the first unread
+    byte; it is updated as lines are read. Files not in ``offsets`` are read
+    from the beginning, ``skip_lines`` lines are skipped when the first one
+    is opened. ``active`` holds (device, inode) of files open by any tailer;
+    a file open elsewhere is not opened until released.
+
+    When the file is rotated (replaced or removed), the old one is read to
+    the end first, then the new one is opened. Truncated file is read again
+    from its beginning.
+
+    Without ``inotify`` the caller has to poll :meth:`read_lines`.
+    '''
+
+    def __init__(self, path, offsets=None, active=None, inotify=None, skip_lines=0):
+        self.path = path
+        self.offsets = {} if offsets is None else offsets
+        self.active = set() if active is None else active
+        self.inotify = inotify
+        #: (device, inode) of the file being read.
+        self.inode = None
+        self._skip_lines = skip_lines
+        self._file = None
+        self._position = 0
+        self._partial = ''
+        self._file_wd = None
+        self._open()
+
+    @property
+    def is_open(self):
+        '''Whether a file is being read.'''
+        return self._file is not None
+
+    def _open(self):
+        '''Opens the file if it exists and is not read by another tailer.'''
+        try:
+            # Unbuffered, so reads after EOF always reach the file.
+            self._file = io.open(self.path, 'rb', buffering=0)
+        except IOError as err:
+            if err.errno != errno.ENOENT:
+                raise
+            return
+        stat = os.fstat(self._file.fileno())
+        inode = stat.st_dev, stat.st_ino
+        if inode in self.active:
+            self._file.close()
+            self._file = None
+            return
+
+        self.inode = inode
+        self.active.add(inode)
+        self._partial = ''
+        self._position = self.offsets.get(inode, 0)
+        if self._position > stat.st_size:
+            # Truncated while we were not looking.
+            self._position = 0
+        self._file.seek(self._position)
+        if self.inotify is not None:
+            self._file_wd = self.inotify.add_watch(self.path, FILE_EVENTS)
+        if self._skip_lines and inode not in self.offsets:
+            self._skip(self._skip_lines)
+        self._skip_lines = 0
+        self.offsets[inode] = self._position
+
+    def _skip(self, count):
+        '''Skips ``count`` lines, scanning the file in big chunks.'''
+        while count:
+            data = self._file.read(READ_SIZE)
+            if not data:
+                break
+            pos = 0
+            while count:
+                end = data.find('\n', pos)
+                if end < 0:
+                    break
+                pos = end + 1
+                count -= 1
+            # Rest of the chunk belongs to a line still being skipped.
+            self._position += pos if not count else len(data)
+        self._file.seek(self._position)
+
+    def _close(self):
+        '''Closes current file.'''
+        if self._file_wd is not None:
+            self.inotify.rm_watch(self._file_wd)
+            self._file_wd = None
+        self._file.close()
+        self._file = None
+        self.active.discard(self.inode)
+
+    def _read(self):
+        '''
+        Reads up to :data:`READ_LIMIT` bytes of appended data.
+
+        :returns: (complete lines, whether end of file was reached)
+        '''
+        chunks = [self._partial]
+        size = 0
+        eof = False
+        while size < READ_LIMIT:
+            data = self._file.read(READ_SIZE)
+            if not data:
+                eof = True
+                break
+            chunks.append(data)
+            size += len(data)
+        self._position += size
+        data = ''.join(chunks)
+        end = data.rfind('\n') + 1
+        self._partial = data[end:]
+        self.offsets[self.inode] = self._position - len(self._partial)
+        return data[:end].splitlines(True), eof
+
+    def _rotated(self):
+        '''Checks whether file under ``path`` is not the one being read.'''
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return True
+        return (stat.st_dev, stat.st_ino) != self.inode
+
+    def read_lines(self):
+        '''
+        Returns list of complete lines (with line endings) appended since
+        previous call. Empty list means there is nothing more to read for now.
+        '''
+        if self._file is None:
+            self._open()
+            if self._file is None:
+                return []
+
+        if os.fstat(self._file.fileno()).st_size < self._position:
+            # Truncated in place, start over.
+            self._file.seek(0)
+            self._position = 0
+            self._partial = ''
+
+        lines, eof = self._read()
+        if eof and self._rotated():
+            # Finish rotated file (anything written just before rotation
+            # included), then switch to the new one.
+            eof = False
+            while not eof:
+                more, eof = self._read()
+                lines.extend(more)
+            if self._partial:
+                lines.append(self._partial)
+                self.offsets[self.inode] = self._position
+                self._partial = ''
+            self._close()
+            self._open()
+            if self._file is not None:
+                lines.extend(self._read()[0])
+        return lines
+
+    def close(self):
+        '''Stops following the file.'''
+        if self._file is not None:
+            self._close()
+
+
+class GlobTailer(object):
+    '''
+    Follows all files matching ``pattern`` (path without wildcards is
+    followed even if it does not exist yet).
+
+    Pattern is matched again every ``rescan_interval`` seconds and when
+    a watched directory gets a new file. Files found are read from the
+    beginning, unless they were read already, maybe under another name.
+
+    :meth:`positions` returns the state to pass as ``positions`` after
+    restart.
+    '''
+
+    def __init__(self, pattern, positions=(), inotify=None, rescan_interval=10,
+                 skip_lines=0):
+        self.pattern = pattern
+        self.inotify = inotify
+        self.rescan_interval = rescan_interval
+        self.offsets = dict(((dev, ino), offset) for _, dev, ino, offset in positions)
+        self.active = set()
+        self.tailers = {}
+        self._directory_wds = set()
+        self._rescan_at = 0
+        self._skip_lines = skip_lines
+        self.rescan()
+
+    def rescan(self):
+        '''Starts following new matches of ``pattern``.'''
+        self._rescan_at = time.time() + self.rescan_interval
+        if glob.has_magic(self.pattern):
+            paths = set(glob.glob(self.pattern))
+        else:
+            paths = set([self.pattern])
+
+        for path in paths:
+            if path not in self.tailers:
+                self._watch_directory(path)
+                self.tailers[path] = FileTailer(
+                    path, self.offsets, self.active, self.inotify,
+                    # Legacy line number resume only applies to a single file.
+                    self._skip_lines if len(paths) == 1 else 0,
+                )
+        self._skip_lines = 0
+
+        # Files no longer matching are followed only until read to the end.
+        for path, tailer in self.tailers.items():
+            if path not in paths and not tailer.is_open:
+                del self.tailers[path]
+
+        # Forget files which are gone.
+        existing = set(self.active)
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            existing.add((stat.st_dev, stat.st_ino))
+        for inode in set(self.offsets) - existing:
+            del self.offsets[inode]
+
+    def _watch_directory(self, path):
+        '''Watches directory of ``path`` for (re)created files.'''
+        if self.inotify is None:
+            return
+        directory = os.path.dirname(os.path.abspath(path))
+        try:
+            self._directory_wds.add(self.inotify.add_watch(directory, DIRECTORY_EVENTS))
+        except OSError:
+            # Directory may not exist yet, rescan will find the file.
+            pass
+
+    def handle_events(self, events):
+        '''Schedules rescan when a watched directory got a new file.'''
+        if any(wd in self._directory_wds for wd, _, _ in events):
+            self._rescan_at = 0
+
+    def read_lines(self):
+        '''Returns lines appended to any of the files since previous call.'''
+        if time.time() >= self._rescan_at:
+            self.rescan()
+        lines = []
+        for tailer in self.tailers.itervalues():
+            lines.extend(tailer.read_lines())
+        return lines
+
+    def positions(self):
+        '''
+        Returns list of [path, device, inode, offset] of files being read,
+        JSON serializable for sensor storage.
+        '''
+        return [
+            [tailer.path, tailer.inode[0], tailer.inode[1], self.offsets[tailer.inode]]
+            for tailer in self.tailers.itervalues() if tailer.is_open
+        ]
+
+    def close(self):
+        '''Stops following all files.'''
+        for tailer in self.tailers.itervalues():
+            tailer.close()
@@ -0,0 +1,322 @@
+'''
+Tests for whmonit.client.sensors.logread
+'''
+import os
+import time
+
+from mock import Mock
+
+from ..inotify import Inotify
+from ..linux_01 import Sensor
+from ..pipeline import Pipeline, _percentile
+from ..tailer import FileTailer, GlobTailer
+
+
+def append(path, data):
+    '''Appends ``data`` to file.'''
+    with open(str(path), 'ab') as logfile:
+        logfile.write(data)
+
+
+class TestFileTailer(object):
+    ''' Test in-process tail. '''
+
+    def test_follow(self, tmpdir):
+        ''' Only complete lines are returned. '''
+        path = tmpdir.join('app.log')
+        append(path, 'one\ntw')
+        tailer = FileTailer(str(path))
+
+        assert tailer.read_lines() == ['one\n']
+        assert tailer.read_lines() == []
+        append(path, 'o\nthree\n')
+        assert tailer.read_lines() == ['two\n', 'three\n']
+        assert tailer.offsets == {tailer.inode: len('one\ntwo\nthree\n')}
+
+    def test_skip_lines(self, tmpdir):
+        ''' Already read lines are skipped on restart. '''
+        path = tmpdir.join('app.log')
+        append(path, ''.join('line {}\n'.format(i) for i in xrange(100000)))
+
+        tailer = FileTailer(str(path), skip_lines=99998)
+
+        assert tailer.read_lines() == ['line 99998\n', 'line 99999\n']
+
+    def test_missing_file(self, tmpdir):
+        ''' File is picked up once created. '''
+        path = tmpdir.join('app.log')
+        tailer = FileTailer(str(path))
+
+        assert tailer.read_lines() == []
+        append(path, 'one\n')
+        assert tailer.read_lines() == ['one\n']
+
+    def test_rotation(self, tmpdir):
+        ''' Rotated file is finished before switching to the new one. '''
+        path = tmpdir.join('app.log')
+        append(path, 'one\n')
+        tailer = FileTailer(str(path))
+        assert tailer.read_lines() == ['one\n']
+
+        append(path, 'two\nunfinished')
+        path.rename(tmpdir.join('app.log.1'))
+        append(path, 'three\n')
+
+        assert tailer.read_lines() == ['two\n', 'unfinished', 'three\n']
+        assert tailer.inode[1] == path.stat().ino
+
+    def test_truncation(self, tmpdir):
+        ''' Truncated file is read from the beginning. '''
+        path = tmpdir.join('app.log')
+        append(path, 'one\ntwo\n')
+        tailer = FileTailer(str(path))
+        assert len(tailer.read_lines()) == 2
+
+        path.write('new\n')
+        assert tailer.read_lines() == ['new\n']
+
+    def test_inotify(self, tmpdir):
+        ''' Inotify wakes up on appended data and new files. '''
+        inotify = Inotify()
+        path = tmpdir.join('app.log')
+        tailer = GlobTailer(str(path), inotify=inotify)
+
+        assert inotify.read_events(0) == []
+        append(path, 'one\n')
+        events = inotify.read_events(1)
+        assert events
+        tailer.handle_events(events)
+        assert tailer.read_lines() == ['one\n']
+        append(path, 'two\n')
+        assert inotify.read_events(1)
+        assert tailer.read_lines() == ['two\n']
+        inotify.close()
+
+
+class TestGlobTailer(object):
+    ''' Test following many files and resuming. '''
+
+    def test_resume_offset(self, tmpdir):
+        ''' Reading continues from saved byte offset. '''
+        path = tmpdir.join('app.log')
+        append(path, 'one\ntwo\n')
+        tailer = GlobTailer(str(path))
+        assert tailer.read_lines() == ['one\n', 'two\n']
+        append(path, 'three\n')
+        positions = tailer.positions()
+        assert positions == [[str(path), path.stat().dev, path.stat().ino, 8]]
+        tailer.close()
+
+        assert GlobTailer(str(path), positions).read_lines() == ['three\n']
+
+    def test_resume_truncated(self, tmpdir):
+        ''' File shorter than saved offset is read from the beginning. '''
+        path = tmpdir.join('app.log')
+        path.write('new\n')
+
+        positions = [[str(path), path.stat().dev, path.stat().ino, 100]]
+        assert GlobTailer(str(path), positions).read_lines() == ['new\n']
+
+    def test_resume_rotated(self, tmpdir):
+        ''' Rotated while stopped: old file is finished, new one read. '''
+        path = tmpdir.join('app.log')
+        append(path, 'one\n')
+        tailer = GlobTailer(str(tmpdir.join('app.log*')))
+        assert tailer.read_lines() == ['one\n']
+        positions = tailer.positions()
+        tailer.close()
+
+        append(path, 'two\n')
+        path.rename(tmpdir.join('app.log.1'))
+        append(path, 'three\n')
+
+        lines = GlobTailer(str(tmpdir.join('app.log*')), positions).read_lines()
+        assert sorted(lines) == ['three\n', 'two\n']
+
+    def test_glob_rotation(self, tmpdir):
+        ''' Rotated file matching the pattern is not read again. '''
+        path = tmpdir.join('app.log')
+        append(path, 'one\n')
+        tailer = GlobTailer(str(tmpdir.join('app.log*')))
+        assert tailer.read_lines() == ['one\n']
+
+        append(path, 'two\n')
+        path.rename(tmpdir.join('app.log.1'))
+        append(path, 'three\n')
+        tailer.rescan()
+        assert sorted(tailer.read_lines()) == ['three\n', 'two\n']
+        tailer.rescan()
+        assert tailer.read_lines() == []
+        assert sorted(tailer.tailers) == [str(path), str(tmpdir.join('app.log.1'))]
+
+    def test_glob_new_files(self, tmpdir):
+        ''' Files matching pattern are picked up on rescan. '''
+        append(tmpdir.join('a.log'), 'a\n')
+        tailer = GlobTailer(str(tmpdir.join('*.log')))
+        assert tailer.read_lines() == ['a\n']
+
+        append(tmpdir.join('b.log'), 'b\n')
+        append(tmpdir.join('b.txt'), 'x\n')
+        assert tailer.read_lines() == []
+        tailer.rescan()
+        assert tailer.read_lines() == ['b\n']
+
+        tmpdir.join('a.log').remove()
+        tailer.read_lines()
+        tailer.rescan()
+        assert list(tailer.tailers) == [str(tmpdir.join('b.log'))]
+
+
+class TestLogread(object):
+    ''' Test logread sensor batching. '''
+
+    def make_sensor(self, tmpdir, **config):
+        '''Sensor following `app.log` in `tmpdir`, with results mock.'''
+        config['filename'] = str(tmpdir.join('app.log'))
+        send_results = Mock()
+        sensor = Sensor(config, send_results, {})
+        sensor.start()
+        return sensor, send_results
+
+    @staticmethod
+    def sent(send_results):
+        '''Lines sent in each batch.'''
+        return [call[0][1][0][1] for call in send_results.call_args_list]
+
+    def test_batch_lines(self, tmpdir):
+        ''' Full batches are sent immediately. '''
+        sensor, send_results = self.make_sensor(tmpdir, batch_lines=2, batch_interval=60000)
+        append(tmpdir.join('app.log'), 'a\nb\nc\nd\ne\n')
+
+        assert sensor.step() == 0
+        assert self.sent(send_results) == ['a\nb\n', 'c\nd\n']
+        assert 0 < sensor.step() <= 60
+
+    def test_batch_interval(self, tmpdir, monkeypatch):
+        ''' Incomplete batch is sent after `batch_interval`. '''
+        clock = [1000.0]
+        monkeypatch.setattr(time, 'time', lambda: clock[0])
+        sensor, send_results = self.make_sensor(tmpdir, batch_interval=500, save_interval=5)
+        append(tmpdir.join('app.log'), 'a\nb\n')
+
+        assert sensor.step() == 0
+        assert sensor.step() == 0.5
+        assert not send_results.called
+        clock[0] += 0.5
+        sensor.step()
+        assert self.sent(send_results) == ['a\nb\n']
+        assert 'positions' not in sensor.storage
+
+        clock[0] += 5
+        assert sensor.step() == Sensor.idle_timeout
+        assert [position[3] for position in sensor.storage['positions']] == [4]
+
+    def test_resume_line_no(self, tmpdir, monkeypatch):
+        ''' Line number saved by older versions is used once. '''
+        clock = [1000.0]
+        monkeypatch.setattr(time, 'time', lambda: clock[0])
+        append(tmpdir.join('app.log'), 'a\nb\nc\n')
+        config = {'filename': str(tmpdir.join('app.log')), 'batch_interval': 0}
+        send_results = Mock()
+        sensor = Sensor(config, send_results, {'line_no': 2})
+        sensor.start()
+
+        sensor.step()
+        assert self.sent(send_results) == ['c\n']
+        clock[0] += 5
+        sensor.step()
+        assert 'line_no' not in sensor.storage
+        assert sensor.storage['positions'][0][3] == os.path.getsize(config['filename'])
+
+
+ACCESS_LOG = (
+    'GET /a 200 0.010\n'
+    'GET /a 200 0.030\n'
+    'GET /b 500 0.200\n'
+    'POST /a 200 0.020\n'
+    'garbage\n'
+)
+ACCESS_PATTERN = r'^(?P<method>\S+) (?P<path>\S+) (?P<status>\d+) (?P<time>[\d.]+)$'
+
+
+class TestPipeline(object):
+    ''' Test parsing, filtering and aggregation of lines. '''
+
+    def test_filters(self):
+        ''' Only lines matching the pattern and all filters are kept. '''
+        pipeline = Pipeline({'pattern': ACCESS_PATTERN, 'filters': {'method': '^GET$'}})
+        lines = ACCESS_LOG.splitlines(True)
+
+        assert pipeline.feed(lines, 0) == lines[:3]
+        assert Pipeline({'filters': {'line': 'garbage'}}).feed(lines, 0) == ['garbage\n']
+
+    def test_aggregate(self):
+        ''' Counts, sums and percentiles are computed per key and window. '''
+        pipeline = Pipeline({
+            'pattern': ACCESS_PATTERN,
+            'aggregate': {
+                'interval': 60, 'keys': ['status'], 'sum': ['time'],
+                'percentile': ['time'], 'percentiles': [50, 100],
+            },
+        })
+        aggregator = pipeline.aggregator
+
+        assert pipeline.feed(ACCESS_LOG.splitlines(True), 130) == []
+        assert aggregator.header() == (
+            'status', 'count', 'sum_time', 'p50_time', 'p100_time',
+        )
+        assert aggregator.flush(179.9) is None
+        window_end, total, rows = aggregator.flush(180)
+        assert (window_end, total) == (180, 4)
+        assert [row[:2] + [float(value) for value in row[2:]] for row in rows] == [
+            ['200', '3', 0.06, 0.02, 0.03],
+            ['500', '1', 0.2, 0.2, 0.2],
+        ]
+        # Empty window is reported too.
+        assert aggregator.flush(245) == (240, 0, [])
+
+    def test_percentile(self):
+        ''' Nearest-rank percentiles. '''
+        values = [float(i) for i in xrange(1, 101)]
+        assert [_percentile(values, p) for p in (0, 50, 90, 99, 100)] == [1, 50, 90, 99, 100]
+        assert _percentile([5.0], 99) == 5
+
+
+class TestLogreadPipeline(TestLogread):
+    ''' Test logread sensor with pipeline. '''
+
+    def test_aggregates(self, tmpdir, monkeypatch):
+        ''' Aggregates are sent at the window end, stamped with it. '''
+        clock = [1010.0]
+        monkeypatch.setattr(time, 'time', lambda: clock[0])
+        sensor, send_results = self.make_sensor(tmpdir, pipeline={
+            'pattern': ACCESS_PATTERN,
+            'filters': {'method': 'GET'},
+            'aggregate': {'interval': 60, 'keys': ['path']},
+        })
+        append(tmpdir.join('app.log'), ACCESS_LOG)
+
+        assert sensor.step() == 0
+        assert sensor.step() == Sensor.idle_timeout
+        clock[0] = 1019.75
+        assert sensor.step() == 0.25
+        assert not send_results.called
+
+        clock[0] = 1020.5
+        sensor.step()
+        send_results.assert_called_once_with(1020000, (
+            ('matched', 3.0),
+            ('aggregates', 'path;count\n/a;2\n/b;1\n'),
+        ))
+
+    def test_send_matches(self, tmpdir):
+        ''' Matching lines are sent when asked to, besides aggregates. '''
+        sensor, send_results = self.make_sensor(tmpdir, batch_interval=0, pipeline={
+            'filters': {'line': '500'},
+            'send_matches': True,
+            'aggregate': {},
+        })
+        append(tmpdir.join('app.log'), ACCESS_LOG)
+
+        sensor.step()
+        assert self.sent(send_results) == ['GET /b 500 0.200\n']
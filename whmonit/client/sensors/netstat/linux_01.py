@@ -1,15 +1,64 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+'''
+Network interfaces statistics sensor.
+'''
+import os
+import time
+
 from whmonit.client.sensors import TaskSensorBase
+from whmonit.client.sensors.counters import CounterDeltas, selected
+from whmonit.client.sensors.procfs import ProcMixin
 from whmonit.common.units import unit_reg
 
+# Columns of /proc/net/dev kept, in the order of `Sensor.counters`.
+_COLUMNS = (0, 8, 1, 9, 3, 11, 2, 10)
+
+# Counters with their rate streams (names of streams are limited to 16
+# characters).
+_RATES = (
+    ('bytes_recv', 'bytes_recv_rate', 'Bytes received per second.'),
+    ('bytes_sent', 'bytes_sent_rate', 'Bytes sent per second.'),
+    ('packets_recv', 'pkts_recv_rate', 'Packets received per second.'),
+    ('packets_sent', 'pkts_sent_rate', 'Packets sent per second.'),
+    ('dropin', 'dropin_rate', 'Incoming packets dropped per second.'),
+    ('dropout', 'dropout_rate', 'Outgoing packets dropped per second.'),
+    ('errin', 'errin_rate', 'Errors while receiving per second.'),
+    ('errout', 'errout_rate', 'Errors while sending per second.'),
+)
+
+
+def _rate_streams():
+    '''Streams of per second rates of counters.'''
+    return dict(
+        (stream, {
+            'type': float,
+            'description': description,
+            'unit': str(unit_reg.byte / unit_reg.second)
+                    if counter.startswith('bytes') else str(unit_reg.second ** -1)
+        })
+        for counter, stream, description in _RATES
+    )
+
+
+class Sensor(TaskSensorBase, ProcMixin):
+    '''
+    netstat sensor class.
+
+    Reads /proc/net/dev, counters are summed over interfaces matching
+    ``include`` and not matching ``exclude`` glob patterns. Virtual
+    interfaces (loopback, bridges, veth pairs ... anything without a device
+    in /sys/class/net) are skipped unless ``virtual`` is set or
+    ``interface`` names one.
 
-class Sensor(TaskSensorBase):
-    '''netstat sensor class.'''
-    # W0232: Class has no __init__ method
-    # R0201: Method could be a function
+    Per second rates are computed from counters of the previous run, so
+    they are not reported by the first one, nor for an interface whose
+    counters went down (reset or re-created) since, unless a 32-bit
+    counter wrapped. They go to separate streams for all interfaces
+    together and to a ``;`` separated table, one row per interface.
+    '''
     # R0903: Too few public methods
-    # pylint: disable=W0232,R0201,R0903
+    # pylint: disable=R0903
 
     name = 'netstat'
     streams = {
@@ -46,31 +95,88 @@ class Sensor(TaskSensorBase):
         'errout': {
             'type': float,
             'description': 'Total number of errors while sending.'
-        }
+        },
+        'interfaces': {
+            'type': str,
+            'description': 'Per second rates of each interface.'
+        },
     }
+
+    streams.update(_rate_streams())
+
+    #: Counters, in the order of table columns.
+    counters = tuple(counter for counter, _, _ in _RATES)
+
     config_schema = {
         '$schema': 'http://json-schema.org/schema#',
         'type': 'object',
-        'properties': {'interface': {'type': 'string'}},
+        'properties': {
+            'interface': {'type': 'string'},
+            'include': {'type': 'array', 'items': {'type': 'string'}, 'default': []},
+            'exclude': {'type': 'array', 'items': {'type': 'string'}, 'default': []},
+            'virtual': {'type': 'boolean', 'default': False},
+        },
         'additionalProperties': False
     }
 
+    sys = '/sys'
+    deltas = None
+
+    def _virtual(self, name):
+        '''Checks whether interface has no underlying device.'''
+        return not os.path.exists(os.path.join(self.sys, 'class', 'net', name, 'device'))
+
     def do_run(self):
         '''Executes itself.'''
-        import psutil
-
-        # if there is no interface provided, count all data
-        if self.config.get('interface', None):
-            data = psutil.net_io_counters(pernic=True)[self.config['interface']]
+        if self.deltas is None:
+            self.deltas = CounterDeltas()
+        interface = self.config.get('interface')
+        if interface:
+            include, exclude, virtual = [interface], (), True
         else:
-            data = psutil.net_io_counters()
+            include, exclude = self.config['include'], self.config['exclude']
+            virtual = self.config['virtual']
+
+        data = self.read_proc('net/dev')
+        elapsed = self.deltas.start(time.time())
+        if elapsed is not None and elapsed <= 0:
+            # Clock went back, no rates this time.
+            elapsed = None
+
+        totals = [0] * len(self.counters)
+        rows = []
+        found = False
+        # Two header lines first.
+        for line in data.splitlines()[2:]:
+            name, _, values = line.partition(':')
+            name = name.strip()
+            if not selected(name, include, exclude):
+                continue
+            if not virtual and self._virtual(name):
+                continue
+            found = True
+            values = values.split()
+            counters = tuple(int(values[column]) for column in _COLUMNS)
+            for i, value in enumerate(counters):
+                totals[i] += value
+            delta = self.deltas.add(name, counters)
+            if delta is not None and elapsed is not None:
+                rows.append((name, [value / elapsed for value in delta]))
 
-        return (('bytes_sent', float(data.bytes_sent)),
-                ('bytes_recv', float(data.bytes_recv)),
-                ('dropin', float(data.dropin)),
-                ('dropout', float(data.dropout)),
-                ('packets_recv', float(data.packets_recv)),
-                ('packets_sent', float(data.packets_sent)),
-                ('errin', float(data.errin)),
-                ('errout', float(data.errout)))
+        if not found:
+            if interface:
+                self.log('Interface {} not found'.format(interface))
+            return ()
 
+        result = [(counter, float(total)) for counter, total in zip(self.counters, totals)]
+        if rows:
+            result.extend(
+                (stream, sum(rates))
+                for (_, stream, _), rates in zip(_RATES, zip(*(row for _, row in rows)))
+            )
+            lines = [';'.join(('interface',) + self.counters)]
+            lines.extend(
+                ';'.join([name] + [repr(rate) for rate in row]) for name, row in rows
+            )
+            result.append(('interfaces', '\n'.join(lines + [''])))
+        return tuple(result)
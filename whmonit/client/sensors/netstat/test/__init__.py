@@ -0,0 +1,3 @@
+'''
+Sensor netstat test __init__.
+'''
@@ -0,0 +1,99 @@
+'''
+Tests for whmonit.client.sensors.netstat
+'''
+import time
+
+import pytest
+from mock import Mock
+
+from ..linux_01 import Sensor
+
+HEADER = '''Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+'''
+
+
+def write_dev(proc, rx_bytes, tx_bytes):
+    '''Writes fake `/proc/net/dev` with eth0, lo and a veth.'''
+    line = '{:>6}:{} 10 1 2 0 0 0 0 {} 20 3 4 0 0 0 0\n'
+    proc.ensure('net', dir=True).join('dev').write(
+        HEADER + line.format('lo', 5, 5) + line.format('eth0', rx_bytes, tx_bytes) +
+        line.format('veth1a', 7, 7)
+    )
+
+
+@pytest.fixture
+def sensor(tmpdir, monkeypatch):
+    '''Sensor reading fake `/proc` and `/sys`, clock in `sensor.clock`.'''
+    monkeypatch.setattr(Sensor, 'proc', str(tmpdir))
+    monkeypatch.setattr(Sensor, 'sys', str(tmpdir))
+    tmpdir.ensure('class', 'net', 'eth0', 'device', dir=True)
+    clock = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+
+    def make(**config):
+        '''Makes sensor with `config`.'''
+        config['sampling_period'] = 10
+        sensor = Sensor(config, Mock(), None)
+        sensor.clock = clock
+        return sensor
+    return make
+
+
+class TestNetstat(object):
+    ''' Test netstat sensor. '''
+
+    def test_rates(self, tmpdir, sensor):
+        ''' Rates of physical interfaces are computed since previous run. '''
+        sensor = sensor()
+        write_dev(tmpdir, 1000, 2 ** 32 - 100)
+        result = dict(sensor.do_run())
+        assert result['bytes_recv'] == 1000
+        assert (result['packets_recv'], result['dropin'], result['errout']) == (10, 2, 3)
+        assert 'bytes_recv_rate' not in result
+
+        write_dev(tmpdir, 3000, 2 ** 32 + 900)
+        sensor.clock[0] += 10
+        result = dict(sensor.do_run())
+        assert result['bytes_recv_rate'] == 200
+        assert result['bytes_sent_rate'] == 100
+        assert result['pkts_sent_rate'] == 0
+        rows = [line.split(';') for line in result['interfaces'].splitlines()]
+        assert rows[0] == ['interface'] + list(Sensor.counters)
+        assert rows[1][:3] == ['eth0', '200.0', '100.0']
+        assert len(rows) == 2
+
+    def test_reset(self, tmpdir, sensor):
+        ''' Interface counting from zero again has no rates until next run. '''
+        sensor = sensor()
+        write_dev(tmpdir, 1000, 5000000)
+        sensor.do_run()
+
+        write_dev(tmpdir, 3000, 900)
+        sensor.clock[0] += 10
+        result = dict(sensor.do_run())
+        assert result['bytes_sent'] == 900
+        assert 'bytes_sent_rate' not in result
+
+        write_dev(tmpdir, 4000, 1900)
+        sensor.clock[0] += 10
+        assert dict(sensor.do_run())['bytes_sent_rate'] == 100
+
+    def test_wrap(self, tmpdir, sensor):
+        ''' 32-bit counter wrapped since previous run gives right rate. '''
+        sensor = sensor()
+        write_dev(tmpdir, 1000, 2 ** 32 - 100)
+        sensor.do_run()
+
+        write_dev(tmpdir, 3000, 900)
+        sensor.clock[0] += 10
+        assert dict(sensor.do_run())['bytes_sent_rate'] == 100
+
+    def test_select(self, tmpdir, sensor):
+        ''' Interfaces are selected by patterns or name. '''
+        write_dev(tmpdir, 1000, 1000)
+
+        assert dict(sensor(virtual=True).do_run())['bytes_recv'] == 1012
+        assert dict(sensor(virtual=True, exclude=['veth*']).do_run())['bytes_recv'] == 1005
+        assert dict(sensor(interface='lo').do_run())['bytes_recv'] == 5
+        assert sensor(interface='eth1').do_run() == ()
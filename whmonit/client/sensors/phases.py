@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+'''
+Timing phases (connect, TLS handshake, commands ...) of service checks.
+
+Sockets are made with timeout, so every blocking operation of a check is
+limited, not the check as a whole.
+'''
+import socket
+import ssl
+import time
+from contextlib import contextmanager
+
+
+class Timings(dict):
+    '''Maps phase to seconds spent in it.'''
+
+    @contextmanager
+    def phase(self, name):
+        '''Adds time spent in the block to phase ``name``.'''
+        started = time.time()
+        try:
+            yield
+        finally:
+            self[name] = self.get(name, 0.0) + time.time() - started
+
+
+def connect(host, port, timeout, timings):
+    '''Returns TCP socket connected to ``host``, timing ``connect`` phase.'''
+    with timings.phase('connect'):
+        return socket.create_connection((host, port), timeout)
+
+
+def wrap(sock, keyfile, certfile, timings):
+    '''Returns ``sock`` wrapped in SSL, timing ``tls`` phase.'''
+    with timings.phase('tls'):
+        return ssl.wrap_socket(sock, keyfile, certfile)
@@ -3,19 +3,29 @@
 '''
 network ping sensor.
 '''
-
-from ping import do_one as ping
+import socket
 
 from whmonit.client.sensors import TaskSensorBase
 from whmonit.common.units import unit_reg
 
+from .ping import Pinger
+
 
 class Sensor(TaskSensorBase):
-    '''Generic 'ping' sensor.'''
-    # W0232: Class has no __init__ method
-    # R0201: Method could be a function
+    '''
+    Generic 'ping' sensor.
+
+    ``host`` is a host name or a list of them; all hosts are pinged at once
+    over a single socket kept between runs. Each host gets ``count``
+    requests, sent every ``interval`` milliseconds, replies to the last ones
+    are awaited for ``timeout`` milliseconds.
+
+    For a single host round trip statistics go to separate streams, for
+    a list of hosts they are sent as a ``;`` separated table, one row per
+    host, in ``hosts`` stream.
+    '''
     # R0903: Too few public methods
-    # pylint: disable=W0232,R0201,R0903
+    # pylint: disable=R0903
 
     name = 'ping'
     streams = {
@@ -23,24 +33,101 @@ class Sensor(TaskSensorBase):
             'type': float,
             'description':
                 'Time from sending message to destination host '
-                'to receiving acknowledgment.',
+                'to receiving acknowledgment (average).',
+            'unit': str(unit_reg.second)
+        },
+        'min': {
+            'type': float,
+            'description': 'Shortest round trip time.',
+            'unit': str(unit_reg.second)
+        },
+        'max': {
+            'type': float,
+            'description': 'Longest round trip time.',
+            'unit': str(unit_reg.second)
+        },
+        'jitter': {
+            'type': float,
+            'description': 'Average difference between consecutive round trip times.',
             'unit': str(unit_reg.second)
-        }
+        },
+        'loss': {
+            'type': float,
+            'description': 'Percentage of requests without reply.',
+            'unit': '%'
+        },
+        'hosts': {
+            'type': str,
+            'description': 'Loss and round trip times (seconds) of each host.'
+        },
     }
     config_schema = {
         '$schema': 'http://json-schema.org/schema#',
         'type': 'object',
-        'properties': {'host': {'type': 'string'}},
+        'properties': {
+            'host': {
+                'type': ['string', 'array'],
+                'items': {'type': 'string'},
+                'minItems': 1,
+            },
+            'count': {'type': 'integer', 'minimum': 1, 'default': 3},
+            'interval': {'type': 'integer', 'minimum': 0, 'default': 200},
+            'timeout': {'type': 'integer', 'minimum': 1, 'default': 2000},
+        },
         'required': ['host'],
         'additionalProperties': False
     }
 
+    columns = ('host', 'loss', 'min', 'avg', 'max', 'jitter')
+
+    pinger = None
+
     def do_run(self):
-        '''Returns time to ping a host.'''
+        '''Returns round trip statistics of pinged host(s).'''
+        if self.pinger is None:
+            self.pinger = Pinger()
+        hosts = self.config['host']
+        single = isinstance(hosts, basestring)
+        if single:
+            hosts = [hosts]
 
         try:
-            delay = float(ping(self.config['host'], 5))
-        except:  # TODO: should be time TimeOut and some other errors
+            stats = self.pinger.ping(
+                hosts,
+                self.config['count'],
+                self.config['interval'] / 1000.0,
+                self.config['timeout'] / 1000.0,
+            )
+        except socket.error as err:
+            self.log('Ping failed: {}'.format(err))
+            self.pinger.close()
             return ()
 
-        return (("default", delay), )
+        if single:
+            host_stats = stats.get(hosts[0])
+            if host_stats is None:
+                self.log('Cannot resolve {}'.format(hosts[0]))
+                return ()
+            if not host_stats.rtts:
+                return (('loss', host_stats.loss),)
+            return (
+                ('default', host_stats.avg),
+                ('min', host_stats.min),
+                ('max', host_stats.max),
+                ('jitter', host_stats.jitter),
+                ('loss', host_stats.loss),
+            )
+
+        lines = [';'.join(self.columns)]
+        for host in hosts:
+            host_stats = stats.get(host)
+            if host_stats is None:
+                # Not resolved.
+                lines.append(';'.join([str(host), '', '', '', '', '']))
+            elif not host_stats.rtts:
+                lines.append(';'.join([str(host), repr(host_stats.loss), '', '', '', '']))
+            else:
+                lines.append(';'.join([str(host)] + [
+                    repr(getattr(host_stats, column)) for column in self.columns[1:]
+                ]))
+        return (('hosts', '\n'.join(lines + [''])),)
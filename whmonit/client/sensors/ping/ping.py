@@ -1,199 +1,218 @@
-#!/usr/bin/env python
-
+# -*- coding: utf-8 -*-
 '''
-    A pure python ping implementation using raw socket.
-
-
-    Note that ICMP messages can only be sent from processes running as root.
-
-
-    Derived from ping.c distributed in Linux's netkit. That code is
-    copyright (c) 1989 by The Regents of the University of California.
-    That code is in turn derived from code written by Mike Muuss of the
-    US Army Ballistic Research Laboratory in December, 1983 and
-    placed in the public domain. They have my thanks.
-
-    Bugs are naturally mine. I'd be glad to hear about them. There are
-    certainly word - size dependenceies here.
-
-    Copyright (c) Matthew Dixon Cowles, <http://www.visi.com/~mdc/>.
-    Distributable under the terms of the GNU General Public License
-    version 2. Provided with no warranties of any sort.
-
-    Original Version from Matthew Dixon Cowles:
-      -> ftp://ftp.visi.com/users/mdc/ping.py
-
-    Rewrite by Jens Diemer:
-      -> http://www.python-forum.de/post-69122.html#69122
-
-    Rewrite by George Notaras:
-      -> http://www.g-loaded.eu/2009/10/30/python-ping/
-
-    Revision history
-    ~~~~~~~~~~~~~~~~
+ICMP echo (ping) of many hosts over a single raw socket.
 
-    November 8, 2009
-    ----------------
-    Improved compatibility with GNU/Linux systems.
-
-    Fixes by:
-     * George Notaras -- http://www.g-loaded.eu
-    Reported by:
-     * Chris Hallman -- http://cdhallman.blogspot.com
-
-    Changes in this release:
-     - Re-use time.time() instead of time.clock(). The 2007 implementation
-       worked only under Microsoft Windows. Failed on GNU/Linux.
-       time.clock() behaves differently under the two OSes[1].
-
-    [1] http://docs.python.org/library/time.html#time.clock
-
-    May 30, 2007
-    ------------
-    little rewrite by Jens Diemer:
-     -  change socket asterisk import to a normal import
-     -  replace time.time() with time.clock()
-     -  delete "return None" (or change to "return" only)
-     -  in checksum() rename "str" to "source_string"
-
-    November 22, 1997
-    -----------------
-    Initial hack. Doesn't do much, but rather than try to guess
-    what features I (or others) will want in the future, I've only
-    put in what I need now.
-
-    December 16, 1997
-    -----------------
-    For some reason, the checksum bytes are in the wrong order when
-    this is run under Solaris 2.X for SPARC but it works right under
-    Linux x86. Since I don't know just what's wrong, I'll swap the
-    bytes always and then do an htons().
-
-    December 4, 2000
-    ----------------
-    Changed the struct.pack() calls to pack the checksum and ID as
-    unsigned. My thanks to Jerome Poincheval for the fix.
+Note that ICMP messages can only be sent from processes running as root or
+having CAP_NET_RAW capability set.
 
+Requests carry identifier of the :class:`Pinger` and a sequence number
+unique among requests in flight, replies are matched by both and by the
+source address, so replies to other processes and late replies to earlier
+runs are ignored.
 '''
-
-
+import errno
 import os
+import select
 import socket
 import struct
-import select
 import time
+from array import array
 
-# From /usr/include/linux/icmp.h; your milage may vary.
-ICMP_ECHO_REQUEST = 8  # Seems to be the same on Solaris.
-
-
-def checksum(source_string):
-    '''
-    I'm not too confident that this is right but testing seems
-    to suggest that it gives the same answers as in_cksum in ping.c
-    '''
-    sum = 0
-    countTo = (len(source_string) / 2) * 2
-    count = 0
-    while count < countTo:
-        thisVal = ord(source_string[count + 1]) * 256 + ord(source_string[count])
-        sum = sum + thisVal
-        sum = sum & 0xffffffff  # Necessary?
-        count = count + 2
-
-    if countTo < len(source_string):
-        sum = sum + ord(source_string[len(source_string) - 1])
-        sum = sum & 0xffffffff  # Necessary?
-
-    sum = (sum >> 16) + (sum & 0xffff)
-    sum = sum + (sum >> 16)
-    answer = ~sum
-    answer = answer & 0xffff
-
-    # Swap bytes. Bugger me if I know why.
-    answer = answer >> 8 | (answer << 8 & 0xff00)
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
 
-    return answer
+#: ICMP header: type, code, checksum, identifier, sequence number.
+_HEADER = struct.Struct('!BBHHH')
+#: Payload size, same as ping(8) default.
+PAYLOAD_SIZE = 56
 
 
-def receive_one_ping(my_socket, ID, timeout):
-    '''
-    receive the ping from the socket.
-    '''
-    timeLeft = timeout
-    while True:
-        startedSelect = time.time()
-        whatReady = select.select([my_socket], [], [], timeLeft)
-        howLongInSelect = (time.time() - startedSelect)
-        if whatReady[0] == []:  # Timeout
-            return
-
-        timeReceived = time.time()
-        recPacket, addr = my_socket.recvfrom(1024)
-        icmpHeader = recPacket[20:28]
-        type, code, checksum, packetID, sequence = struct.unpack(
-            "bbHHh", icmpHeader
-        )
-        if packetID == ID:
-            bytesInDouble = struct.calcsize("d")
-            timeSent = struct.unpack("d", recPacket[28:28 + bytesInDouble])[0]
-            return timeReceived - timeSent
-
-        timeLeft = timeLeft - howLongInSelect
-        if timeLeft <= 0:
-            return
-
-
-def send_one_ping(my_socket, dest_addr, ID):
+def checksum(data):
     '''
-    Send one ping to the given >dest_addr<.
+    Internet checksum (RFC 1071) of ``data``, in native byte order:
+    16-bit words are summed as read from memory, so the result is to be
+    packed back the same way.
     '''
-    dest_addr = socket.gethostbyname(dest_addr)
-
-    # Header is type (8), code (8), checksum (16), id (16), sequence (16)
-    my_checksum = 0
-
-    # Make a dummy heder with a 0 checksum.
-    header = struct.pack("bbHHh", ICMP_ECHO_REQUEST, 0, my_checksum, ID, 1)
-    bytesInDouble = struct.calcsize("d")
-    data = (192 - bytesInDouble) * "Q"
-    data = struct.pack("d", time.time()) + data
-
-    # Calculate the checksum on the data and the dummy header.
-    my_checksum = checksum(header + data)
-
-    # Now that we have the right checksum, we put that in. It's just easier
-    # to make up a new header than to stuff it into the dummy.
-    header = struct.pack(
-        "bbHHh", ICMP_ECHO_REQUEST, 0, socket.htons(my_checksum), ID, 1
-    )
-    packet = header + data
-    my_socket.sendto(packet, (dest_addr, 1))  # Don't know about the 1
-
-
-def do_one(dest_addr, timeout):
+    if len(data) % 2:
+        data += '\0'
+    total = sum(array('H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def echo_request(ident, sequence, payload):
+    '''Builds ICMP echo request packet.'''
+    header = _HEADER.pack(ICMP_ECHO_REQUEST, 0, 0, ident, sequence)
+    return header[:2] + struct.pack('=H', checksum(header + payload)) + header[4:] + payload
+
+
+class Stats(object):
+    '''Round trip times of replies to ``sent`` requests to a host.'''
+
+    def __init__(self, sent=0, rtts=()):
+        self.sent = sent
+        #: Round trip times in order of requests (seconds).
+        self.rtts = list(rtts)
+
+    @property
+    def loss(self):
+        '''Percentage of requests not replied.'''
+        if not self.sent:
+            return 100.0
+        return 100.0 * (self.sent - len(self.rtts)) / self.sent
+
+    @property
+    def min(self):
+        '''Shortest round trip time.'''
+        return min(self.rtts)
+
+    @property
+    def max(self):
+        '''Longest round trip time.'''
+        return max(self.rtts)
+
+    @property
+    def avg(self):
+        '''Average round trip time.'''
+        return sum(self.rtts) / len(self.rtts)
+
+    @property
+    def jitter(self):
+        '''Average difference between consecutive round trip times.'''
+        if len(self.rtts) < 2:
+            return 0.0
+        return sum(
+            abs(rtt - previous) for previous, rtt in zip(self.rtts, self.rtts[1:])
+        ) / (len(self.rtts) - 1)
+
+
+class Pinger(object):
     '''
-    Returns either the delay (in seconds) or none on timeout.
+    Pings many hosts at once. Socket and resolved addresses are kept between
+    :meth:`ping` calls, addresses are resolved again after ``resolve_ttl``
+    seconds.
     '''
-    icmp = socket.getprotobyname("icmp")
-    try:
-        my_socket = socket.socket(socket.AF_INET, socket.SOCK_RAW, icmp)
-    except socket.error, (errno, msg):
-        if errno == 1:
-            # Operation not permitted
-            msg = msg + (
-                " - Note that ICMP messages can only be sent from processes"
-                " running as root or having CAP_NET_RAW capability set."
-            )
-            raise socket.error(msg)
-        raise  # raise the original error
-
-    my_ID = os.getpid() & 0xFFFF
-
-    send_one_ping(my_socket, dest_addr, my_ID)
-    delay = receive_one_ping(my_socket, my_ID, timeout)
-
-    my_socket.close()
-    return delay
-
 
+    def __init__(self, ident=None, resolve_ttl=300):
+        self.ident = (os.getpid() if ident is None else ident) & 0xffff
+        self.resolve_ttl = resolve_ttl
+        self._payload = 'Q' * PAYLOAD_SIZE
+        self._socket = None
+        self._sequence = 0
+        #: Maps host to (address, time resolved).
+        self._addresses = {}
+
+    def _open(self):
+        '''Returns raw ICMP socket.'''
+        try:
+            return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        except socket.error as err:
+            if err.errno == errno.EPERM:
+                raise socket.error(err.errno, err.strerror + (
+                    ' - Note that ICMP messages can only be sent from processes'
+                    ' running as root or having CAP_NET_RAW capability set.'
+                ))
+            raise
+
+    def resolve(self, host):
+        '''
+        Returns IPv4 address of ``host``. Address resolved before is used if
+        resolving fails.
+        '''
+        address, resolved = self._addresses.get(host, (None, None))
+        now = time.time()
+        if address is None or now - resolved >= self.resolve_ttl:
+            try:
+                address = socket.gethostbyname(host)
+            except socket.error:
+                if address is None:
+                    raise
+            self._addresses[host] = address, now
+        return address
+
+    def ping(self, hosts, count=3, interval=0.2, timeout=2.0):
+        '''
+        Sends ``count`` requests to each of ``hosts``, every ``interval``
+        seconds, and waits up to ``timeout`` seconds for replies to the last
+        ones.
+
+        :returns: dict mapping host to :class:`Stats`, hosts which can not be
+            resolved are left out
+        '''
+        if self._socket is None:
+            self._socket = self._open()
+        # Maps address to its hosts, a request to it counts as sent to each.
+        targets = {}
+        for host in hosts:
+            try:
+                address = self.resolve(host)
+            except socket.error:
+                continue
+            # Host listed twice would count each request twice.
+            if host not in targets.setdefault(address, []):
+                targets[address].append(host)
+        stats = dict((host, Stats()) for addresses in targets.itervalues() for host in addresses)
+        replies = dict((address, {}) for address in targets)
+
+        # Maps sequence number to (address, probe number, time sent).
+        pending = {}
+        deadline = None
+        for probe in xrange(count):
+            for address in targets:
+                self._sequence = (self._sequence + 1) & 0xffff
+                pending[self._sequence] = address, probe, time.time()
+                try:
+                    self._socket.sendto(
+                        echo_request(self.ident, self._sequence, self._payload), (address, 0),
+                    )
+                except socket.error:
+                    # E.g. network unreachable, counts as lost.
+                    pass
+                for host in targets[address]:
+                    stats[host].sent += 1
+            deadline = time.time() + (interval if probe + 1 < count else timeout)
+            self._receive(pending, replies, deadline)
+
+        for address, rtts in replies.iteritems():
+            for host in targets[address]:
+                stats[host].rtts = [rtts[probe] for probe in sorted(rtts)]
+        return stats
+
+    def _receive(self, pending, replies, deadline):
+        '''
+        Collects replies to ``pending`` requests until ``deadline`` or until
+        none is pending.
+        '''
+        while pending:
+            wait = deadline - time.time()
+            if wait <= 0:
+                return
+            try:
+                ready = select.select((self._socket,), (), (), wait)[0]
+            except select.error as err:
+                if err.args[0] == errno.EINTR:
+                    continue
+                raise
+            if not ready:
+                return
+            packet = self._socket.recv(4096)
+            received = time.time()
+            # IPv4 header with options, then ICMP.
+            offset = (ord(packet[0]) & 0x0f) * 4
+            if len(packet) < offset + _HEADER.size:
+                continue
+            typ, _, _, ident, sequence = _HEADER.unpack_from(packet, offset)
+            if typ != ICMP_ECHO_REPLY or ident != self.ident or sequence not in pending:
+                continue
+            address, probe, sent = pending[sequence]
+            if socket.inet_ntoa(packet[12:16]) != address:
+                continue
+            del pending[sequence]
+            replies[address][probe] = received - sent
+
+    def close(self):
+        '''Closes the socket.'''
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
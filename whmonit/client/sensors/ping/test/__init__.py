@@ -0,0 +1,3 @@
+'''
+Sensor ping test __init__.
+'''
@@ -0,0 +1,40 @@
+'''
+Tests for whmonit.client.sensors.ping
+'''
+from mock import Mock
+
+from ..linux_01 import Sensor
+from .ping_test import pinger  # pylint: disable=W0611
+
+
+def make_sensor(pinger, host):
+    '''Sensor using fake pinger.'''
+    sensor = Sensor(
+        {'sampling_period': 10, 'host': host, 'interval': 0, 'timeout': 50}, Mock(), None,
+    )
+    sensor.pinger = pinger
+    return sensor
+
+
+class TestPing(object):
+    ''' Test ping sensor. '''
+
+    def test_single(self, pinger):
+        ''' Statistics of single host go to separate streams. '''
+        result = dict(make_sensor(pinger, 'two').do_run())
+
+        assert sorted(result) == ['default', 'jitter', 'loss', 'max', 'min']
+        assert result['loss'] == 100 / 3.0
+        assert result['min'] <= result['default'] <= result['max']
+        assert dict(make_sensor(pinger, 'down').do_run()) == {'loss': 100.0}
+
+    def test_many(self, pinger):
+        ''' Statistics of many hosts go to a table. '''
+        result = dict(make_sensor(pinger, ['one', 'down', 'unknown']).do_run())
+
+        lines = [line.split(';') for line in result['hosts'].splitlines()]
+        assert lines[0] == list(Sensor.columns)
+        assert [line[:2] for line in lines[1:]] == [
+            ['one', '0.0'], ['down', '100.0'], ['unknown', ''],
+        ]
+        assert all(lines[1][2:])
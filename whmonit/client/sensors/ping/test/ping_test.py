@@ -0,0 +1,136 @@
+'''
+Tests for whmonit.client.sensors.ping.ping
+'''
+import socket
+import struct
+
+import pytest
+
+from ..ping import ICMP_ECHO_REPLY, Pinger, Stats, checksum, echo_request
+
+
+def ip_header(source):
+    '''Minimal IPv4 header of packet from ``source``.'''
+    return struct.pack('!BBHHHBBH4s4s', 0x45, 0, 0, 0, 0, 64, 1, 0,
+                       socket.inet_aton(source), socket.inet_aton('127.0.0.1'))
+
+
+class FakeSocket(object):
+    '''
+    Raw socket replying to requests sent to ``hosts`` (address to number of
+    requests to drop before replying), selectable through a socket pair.
+    '''
+
+    def __init__(self, hosts):
+        self.hosts = hosts
+        self.sent = []
+        self._reader, self._writer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    def sendto(self, packet, address):
+        '''Replies unless the request is to be dropped.'''
+        self.sent.append((address[0], packet))
+        assert checksum(packet) == 0
+        drop = self.hosts.get(address[0])
+        if drop is None:
+            return
+        if drop:
+            self.hosts[address[0]] -= 1
+            return
+        reply = struct.pack('!BB', ICMP_ECHO_REPLY, 0) + packet[2:]
+        # Reply to someone else, then the real one.
+        self._writer.send(ip_header(address[0]) + reply[:4] + '\0\0' + reply[6:])
+        self._writer.send(ip_header(address[0]) + reply)
+
+    def recv(self, size):
+        '''Receives reply.'''
+        return self._reader.recv(size)
+
+    def fileno(self):
+        '''For select.'''
+        return self._reader.fileno()
+
+    def close(self):
+        '''Closes socket pair.'''
+        self._reader.close()
+        self._writer.close()
+
+
+@pytest.fixture
+def pinger(monkeypatch):
+    '''Pinger using fake socket, resolving host names to addresses.'''
+    pinger = Pinger(ident=1234)
+    pinger.socket = FakeSocket({'10.0.0.1': 0, '10.0.0.2': 1})
+    monkeypatch.setattr(pinger, '_open', lambda: pinger.socket)
+    names = {'one': '10.0.0.1', 'two': '10.0.0.2', 'down': '10.0.0.3'}
+
+    def gethostbyname(host):
+        '''Resolves fake names.'''
+        if host not in names:
+            raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+        return names[host]
+
+    monkeypatch.setattr(socket, 'gethostbyname', gethostbyname)
+    pinger.names = names
+    return pinger
+
+
+def test_checksum():
+    ''' Checksum of packet including its checksum is zero. '''
+    packet = echo_request(0x1234, 1, 'Q' * 55)
+    assert checksum(packet) == 0
+    assert packet[4:8] == '\x12\x34\x00\x01'
+    # RFC 1071 example.
+    data = '\x00\x01\xf2\x03\xf4\xf5\xf6\xf7'
+    assert struct.pack('=H', checksum(data)) == '\x22\x0d'
+
+
+def test_stats():
+    ''' Loss and round trip statistics. '''
+    stats = Stats(4, [0.010, 0.030, 0.020])
+    assert stats.loss == 25
+    assert (stats.min, stats.max) == (0.010, 0.030)
+    assert stats.avg == pytest.approx(0.020)
+    assert stats.jitter == pytest.approx(0.015)
+    assert Stats(2).loss == 100
+    assert Stats(1, [0.01]).jitter == 0
+
+
+class TestPinger(object):
+    ''' Test pinging many hosts. '''
+
+    def test_ping(self, pinger):
+        ''' Replies are matched to requests, lost ones counted. '''
+        stats = pinger.ping(
+            ['one', 'two', 'down', 'unknown'], count=3, interval=0, timeout=0.05,
+        )
+
+        assert sorted(stats) == ['down', 'one', 'two']
+        assert [stats['one'].sent, len(stats['one'].rtts)] == [3, 3]
+        assert stats['two'].loss == pytest.approx(100 / 3.0)
+        assert stats['down'].loss == 100
+        assert len(pinger.socket.sent) == 9
+        assert len(set(packet[6:8] for _, packet in pinger.socket.sent)) == 9
+
+    def test_same_address(self, pinger):
+        ''' Hosts of one address (or listed twice) share its requests and replies. '''
+        pinger.names['alias'] = '10.0.0.1'
+        stats = pinger.ping(['one', 'alias', 'one'], count=3, interval=0, timeout=0.05)
+
+        assert sorted(stats) == ['alias', 'one']
+        for host in ('one', 'alias'):
+            assert [stats[host].sent, stats[host].loss] == [3, 0]
+        assert len(pinger.socket.sent) == 3
+
+    def test_resolve_cache(self, pinger):
+        ''' Addresses are reused until too old, kept if resolving fails. '''
+        pinger.resolve_ttl = 0
+        assert pinger.resolve('one') == '10.0.0.1'
+        del pinger.names['one']
+        assert pinger.resolve('one') == '10.0.0.1'
+        with pytest.raises(socket.error):
+            pinger.resolve('unknown')
+
+        pinger.resolve_ttl = 300
+        assert pinger.resolve('two') == '10.0.0.2'
+        pinger.names['two'] = '10.0.0.5'
+        assert pinger.resolve('two') == '10.0.0.2'
@@ -2,8 +2,19 @@
 # -*- coding: utf-8 -*-
 '''
 Processes sensor.
+
+Two modes are available:
+
+* ``full`` (default) - whole ``/proc/<pid>/stat`` table every run,
+* ``top`` - previous run's snapshot is kept in the sensor and compared with
+  the current one. Only ``top`` processes by each of ``sort_by`` keys are
+  sent (CPU usage since previous run, RSS, RSS change), together with
+  processes started and exited in between.
 '''
+import heapq
 import os
+from operator import itemgetter
+
 from whmonit.client.sensors import TaskSensorBase
 
 #http://linux.die.net/man/5/proc
@@ -21,7 +32,38 @@ class Sensor(TaskSensorBase):
         'default': {
             'type': str,
             'description': 'List of running processes.'
-        }
+        },
+        'top': {
+            'type': str,
+            'description': 'Top processes by CPU usage and memory.'
+        },
+        'started': {
+            'type': str,
+            'description': 'Processes started since previous run.'
+        },
+        'exited': {
+            'type': str,
+            'description': 'Processes exited since previous run.'
+        },
+        'count': {
+            'type': float,
+            'description': 'Number of running processes.'
+        },
+    }
+    config_schema = {
+        '$schema': 'http://json-schema.org/schema#',
+        'type': 'object',
+        'properties': {
+            'mode': {'type': 'string', 'enum': ['full', 'top'], 'default': 'full'},
+            'top': {'type': 'integer', 'minimum': 1, 'default': 10},
+            'sort_by': {
+                'type': 'array',
+                'items': {'type': 'string', 'enum': ['cpu', 'rss', 'rss_delta']},
+                'minItems': 1,
+                'default': ['cpu', 'rss'],
+            },
+        },
+        'additionalProperties': False
     }
     fields = ('pid', 'comm', 'state', 'ppid', 'pgrp', 'session', 'tty_nr',
               'tpgid', 'flags', 'minflt', 'cminflt', 'majflt', 'cmajflt',
@@ -32,20 +74,115 @@ class Sensor(TaskSensorBase):
               'wchan', 'nswap', 'cnswap', 'exit_signal', 'processor',
               'rt_priority', 'policy', 'delayacct_blkio_ticks', 'guest_time',
               'cguest_time')
+    top_fields = ('pid', 'comm', 'cpu', 'rss', 'rss_delta')
+    pid_fields = ('pid', 'comm')
+
+    proc = '/proc'
+
+    #: Previous `top` mode snapshot: {pid: (starttime, comm, cpu ticks, rss)}
+    #: and time it was taken.
+    _snapshot = None
+    _snapshot_time = None
 
     def do_run(self):
         '''Return list of running processes.'''
-        pids = [pid for pid in os.listdir('/proc') if pid.isdigit()]
-        output = ';'.join(self.fields)
-        output += '\n'
+        if self.config['mode'] == 'top':
+            return self.do_run_top()
 
-        for pid in pids:
+        lines = [';'.join(self.fields)]
+        for pid in self._pids():
             try:
-                with open(os.path.join('/proc', pid, 'stat'), 'rb') as pidf:
-                    vals = pidf.read().split()
-                    output += ';'.join(vals)
-                    output += '\n'
+                with open(os.path.join(self.proc, pid, 'stat'), 'rb') as pidf:
+                    lines.append(';'.join(pidf.read().split()))
             except IOError:
                 self.log("Cannot open stat file: /proc/%s/stat" % pid)
+        lines.append('')
+
+        return (("default", '\n'.join(lines)),)
+
+    def _pids(self):
+        '''Pids of running processes.'''
+        return [pid for pid in os.listdir(self.proc) if pid.isdigit()]
+
+    def _read_snapshot(self):
+        '''
+        Returns {pid: (starttime, comm, cpu ticks, rss bytes)} of running
+        processes.
+        '''
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        snapshot = {}
+        for pid in self._pids():
+            try:
+                with open(os.path.join(self.proc, pid, 'stat'), 'rb') as pidf:
+                    stat = pidf.read()
+            except IOError:
+                # Process exited in the meantime.
+                continue
+            # `comm` is in parentheses and can contain spaces.
+            comm_start = stat.find('(')
+            comm_end = stat.rfind(')')
+            vals = stat[comm_end + 2:].split()
+            # `vals` start with `state`, see `fields` for indices.
+            snapshot[int(pid)] = (
+                vals[21 - 2],
+                stat[comm_start + 1:comm_end],
+                int(vals[13 - 2]) + int(vals[14 - 2]),
+                int(vals[23 - 2]) * page_size,
+            )
+        return snapshot
+
+    def do_run_top(self):
+        '''
+        Compare with previous snapshot and return top processes, started
+        and exited ones. First run only takes the snapshot.
+        '''
+        now = os.times()[4]
+        snapshot = self._read_snapshot()
+        previous, previous_time = self._snapshot, self._snapshot_time
+        self._snapshot, self._snapshot_time = snapshot, now
+
+        result = [('count', float(len(snapshot)))]
+        if previous is None:
+            return result
+
+        # Ticks to percent of a single CPU.
+        scale = 100.0 / os.sysconf('SC_CLK_TCK') / max(now - previous_time, 1e-3)
+        rows = []
+        started = []
+        for pid, (starttime, comm, ticks, rss) in snapshot.iteritems():
+            old = previous.get(pid)
+            # Same pid with different start time is a new process.
+            if old is None or old[0] != starttime:
+                started.append((pid, comm))
+                rows.append((pid, comm, ticks * scale, rss, rss))
+            else:
+                rows.append((pid, comm, (ticks - old[2]) * scale, rss, rss - old[3]))
+        exited = [
+            (pid, old[1]) for pid, old in previous.iteritems()
+            if pid not in snapshot or snapshot[pid][0] != old[0]
+        ]
+
+        top = {}
+        for key in self.config['sort_by']:
+            column = itemgetter(self.top_fields.index(key))
+            for row in heapq.nlargest(self.config['top'], rows, key=column):
+                top[row[0]] = row
+
+        result.append(('top', self._table(
+            self.top_fields,
+            ('{};{};{:.2f};{};{}'.format(*row) for row in sorted(top.itervalues())),
+        )))
+        if started:
+            result.append(('started', self._table(
+                self.pid_fields, ('{};{}'.format(*row) for row in sorted(started)),
+            )))
+        if exited:
+            result.append(('exited', self._table(
+                self.pid_fields, ('{};{}'.format(*row) for row in sorted(exited)),
+            )))
+        return tuple(result)
 
-        return (("default", output),)
+    @staticmethod
+    def _table(header, lines):
+        '''Same layout as in `full` mode: `;` separated columns, header first.'''
+        return '\n'.join([';'.join(header)] + list(lines) + [''])
@@ -0,0 +1,3 @@
+'''
+Sensor processes test __init__.
+'''
@@ -0,0 +1,87 @@
+'''
+Tests for whmonit.client.sensors.processes
+'''
+import os
+
+import pytest
+from mock import Mock
+
+from ..linux_01 import Sensor
+
+
+def write_stat(proc, pid, comm, starttime, ticks, rss_pages):
+    '''Writes fake `/proc/<pid>/stat` file.'''
+    vals = [str(pid), '({})'.format(comm), 'S'] + ['0'] * 41
+    vals[13] = str(ticks)
+    vals[21] = str(starttime)
+    vals[23] = str(rss_pages)
+    piddir = proc.join(str(pid))
+    piddir.ensure(dir=True)
+    piddir.join('stat').write(' '.join(vals) + '\n')
+
+
+def table(output):
+    '''Parses `;` separated table into list of rows without header.'''
+    return [line.split(';') for line in output.splitlines()[1:]]
+
+
+@pytest.fixture
+def proc(tmpdir, monkeypatch):
+    '''Fake `/proc` directory.'''
+    proc = tmpdir.mkdir('proc')
+    proc.mkdir('self')
+    monkeypatch.setattr(Sensor, 'proc', str(proc))
+    return proc
+
+
+class TestProcesses(object):
+    ''' Test processes sensor. '''
+
+    def test_full(self, proc):
+        ''' Full table mode lists every process. '''
+        write_stat(proc, 1, 'init', 5, 100, 10)
+        write_stat(proc, 20, 'sshd', 50, 10, 20)
+
+        result = dict(Sensor({'sampling_period': 3}, Mock(), None).do_run())
+
+        lines = result['default'].splitlines()
+        assert lines[0].split(';') == list(Sensor.fields)
+        assert sorted(line.split(';')[1] for line in lines[1:]) == ['(init)', '(sshd)']
+
+    def test_top(self, proc, monkeypatch):
+        ''' Top mode reports deltas, started and exited processes. '''
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        clock = [1000.0]
+        monkeypatch.setattr(os, 'times', lambda: (0, 0, 0, 0, clock[0]))
+        sensor = Sensor(
+            {'sampling_period': 3, 'mode': 'top', 'top': 1, 'sort_by': ['cpu', 'rss']},
+            Mock(), None,
+        )
+
+        write_stat(proc, 1, 'init', 5, 100, 10)
+        write_stat(proc, 20, 'web server', 50, 10, 1000)
+        write_stat(proc, 30, 'cron', 60, 0, 5)
+        assert dict(sensor.do_run()) == {'count': 3.}
+
+        clock[0] += 10
+        ticks = os.sysconf('SC_CLK_TCK')
+        write_stat(proc, 1, 'init', 5, 100 + 5 * ticks, 12)
+        write_stat(proc, 20, 'web server', 50, 10, 900)
+        # Pid reused by another process.
+        write_stat(proc, 30, 'backup', 70, 0, 5)
+        proc.join('40').ensure(dir=True)
+        result = dict(sensor.do_run())
+
+        assert result['count'] == 3.
+        assert table(result['top']) == [
+            ['1', 'init', '50.00', str(12 * page_size), str(2 * page_size)],
+            ['20', 'web server', '0.00', str(900 * page_size), str(-100 * page_size)],
+        ]
+        assert table(result['started']) == [['30', 'backup']]
+        assert table(result['exited']) == [['30', 'cron']]
+
+        clock[0] += 10
+        proc.join('30').remove()
+        result = dict(sensor.do_run())
+        assert 'started' not in result
+        assert table(result['exited']) == [['30', 'backup']]
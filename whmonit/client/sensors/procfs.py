@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+'''
+Reading ``/proc`` files, shared by sensors run together.
+
+Host metrics sensors read overlapping kernel sources (``/proc/stat``,
+``/proc/meminfo`` ...). When run together by the ``hostmetrics`` sensor they
+get a common :class:`Snapshot`, so each file is read once per run.
+'''
+import os
+
+
+class Snapshot(object):
+    '''Contents of files under ``proc``, each read at most once.'''
+
+    def __init__(self, proc='/proc'):
+        self.proc = proc
+        self._files = {}
+
+    def read(self, name):
+        '''Returns contents of file ``name`` (relative to ``proc``).'''
+        data = self._files.get(name)
+        if data is None:
+            with open(os.path.join(self.proc, name), 'rb') as procf:
+                data = self._files[name] = procf.read()
+        return data
+
+
+class ProcMixin(object):
+    '''
+    For sensors reading ``/proc``: reads files from :attr:`snapshot` when
+    set, from :attr:`proc` otherwise.
+    '''
+    # R0903: Too few public methods
+    # pylint: disable=R0903
+
+    proc = '/proc'
+    #: :class:`Snapshot` shared with other sensors.
+    snapshot = None
+
+    def read_proc(self, name):
+        '''Returns contents of ``/proc`` file ``name``.'''
+        if self.snapshot is not None:
+            return self.snapshot.read(name)
+        with open(os.path.join(self.proc, name), 'rb') as procf:
+            return procf.read()
+
+
+def parse_meminfo(data):
+    '''Parses ``/proc/meminfo`` contents into dict of values in bytes.'''
+    meminfo = {}
+    for line in data.splitlines():
+        name, _, value = line.partition(':')
+        fields = value.split()
+        if not fields:
+            continue
+        meminfo[name] = int(fields[0]) * (1024 if len(fields) > 1 else 1)
+    return meminfo
+
+
+def memory_percent(meminfo):
+    '''
+    Percentage of memory and swap in use from :func:`parse_meminfo` result,
+    computed the way :mod:`psutil` (3.4) does.
+    '''
+    total = meminfo['MemTotal']
+    available = meminfo['MemFree'] + meminfo.get('Buffers', 0) + meminfo.get('Cached', 0)
+    swap_total = meminfo.get('SwapTotal', 0)
+    swap_used = swap_total - meminfo.get('SwapFree', 0)
+    return (
+        100.0 * (total - available) / total if total else 0.0,
+        100.0 * swap_used / swap_total if swap_total else 0.0,
+    )
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+'''
+Listening sockets read from ``/proc/net/{tcp,tcp6,udp,udp6}``.
+
+Reading the socket tables is cheap compared to asking every process for its
+connections. Owners of sockets are found only when asked for, by looking
+at ``/proc/<pid>/fd`` links of all processes. Checks run in separate
+processes close to each other share a single :meth:`SocketTable.snapshot`
+through a :class:`.filecache.FileCache`: the first one reads the tables,
+the first one asking for an owner finds owners of all listening sockets,
+others load them.
+'''
+import errno
+import os
+import time
+
+#: TCP socket state of listening sockets.
+TCP_LISTEN = '0A'
+#: State of unconnected UDP sockets (TCP_CLOSE).
+UDP_UNCONNECTED = '07'
+
+#: Files with socket tables of each protocol.
+TABLES = {
+    'tcp': ('tcp', 'tcp6'),
+    'udp': ('udp', 'udp6'),
+}
+
+
+def _port(address):
+    '''Port of hex ``address:port`` from socket table.'''
+    return int(address[address.rindex(':') + 1:], 16)
+
+
+def parse_table(data, state):
+    '''
+    Parses contents of socket table.
+
+    :returns: list of (port, uid, inode) of sockets in ``state`` with no
+        remote address
+    '''
+    sockets = []
+    for line in data.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 10 or fields[3] != state or _port(fields[2]):
+            continue
+        sockets.append((_port(fields[1]), int(fields[7]), int(fields[9])))
+    return sockets
+
+
+def _cache_key(proc):
+    '''Key of tables of the host in cache, shared by its checks.'''
+    return 'sockets' + proc
+
+
+class SocketTable(object):
+    '''
+    Listening TCP and unconnected (bound) UDP sockets of the host, read
+    from ``proc`` at construction unless ``listening`` is given (see
+    :meth:`entry`). Owners found are shared through ``cache``, if any.
+    '''
+
+    def __init__(self, proc='/proc', listening=None, owners=None, created=None, cache=None):
+        # R0913: Too many arguments
+        # pylint: disable=R0913
+        self.proc = proc
+        self.created = time.time() if created is None else created
+        #: Maps (protocol, port) to list of (uid, inode).
+        self.listening = self._read() if listening is None else listening
+        self._inodes = set(
+            inode for sockets in self.listening.itervalues() for _, inode in sockets
+        )
+        #: Maps socket inode to pid of a process having it open, ``None``
+        #: until an owner is asked for.
+        self._owners = owners
+        self._cache = cache
+
+    def _read(self):
+        '''Reads socket tables, see :attr:`listening`.'''
+        listening = {}
+        for protocol, tables in TABLES.iteritems():
+            state = TCP_LISTEN if protocol == 'tcp' else UDP_UNCONNECTED
+            for table in tables:
+                try:
+                    with open(os.path.join(self.proc, 'net', table), 'rb') as tablef:
+                        data = tablef.read()
+                except IOError as err:
+                    # No IPv6 on this host.
+                    if err.errno != errno.ENOENT:
+                        raise
+                    continue
+                for port, uid, inode in parse_table(data, state):
+                    listening.setdefault((protocol, port), []).append((uid, inode))
+        return listening
+
+    def find(self, protocol, port):
+        '''
+        Returns list of (uid, inode) of sockets listening on ``port``,
+        empty if none.
+        '''
+        return self.listening.get((protocol, port), [])
+
+    def _scan_fds(self):
+        '''
+        Goes through file descriptors of all processes, yields pid and inode
+        for each of the listening sockets found.
+        '''
+        for pid in os.listdir(self.proc):
+            if not pid.isdigit():
+                continue
+            fddir = os.path.join(self.proc, pid, 'fd')
+            try:
+                fds = os.listdir(fddir)
+            except OSError:
+                # Gone or not ours to look at.
+                continue
+            for fd in fds:
+                try:
+                    link = os.readlink(os.path.join(fddir, fd))
+                except OSError:
+                    continue
+                if not link.startswith('socket:['):
+                    continue
+                inode = int(link[8:-1])
+                if inode in self._inodes:
+                    yield int(pid), inode
+
+    def _find_owners(self):
+        '''Returns owners of listening sockets, see :attr:`_owners`.'''
+        owners = {}
+        for pid, inode in self._scan_fds():
+            owners.setdefault(inode, pid)
+        return owners
+
+    def _shared_owners(self):
+        '''
+        Returns owners found by a process sharing the table, finds (and
+        shares) them if none did yet.
+        '''
+        key = _cache_key(self.proc)
+        with self._cache.locked(key):
+            entry = self._cache.load(key)
+            shared = entry is not None and entry['created'] == self.created
+            if shared and entry['owners'] is not None:
+                return dict((inode, pid) for inode, pid in entry['owners'])
+            self._owners = self._find_owners()
+            if shared:
+                self._cache.save(key, self.entry())
+        return self._owners
+
+    def owner(self, inode):
+        '''
+        Returns pid of a process having socket ``inode`` open, ``None`` if
+        not found (e.g. no permission to look at the owner).
+
+        Processes are scanned on the first lookup only.
+        '''
+        if self._owners is None:
+            self._owners = self._find_owners() if self._cache is None else self._shared_owners()
+        return self._owners.get(inode)
+
+    def entry(self):
+        '''
+        Returns table and owners (if found) as JSON serializable dict (for
+        :meth:`from_entry`).
+        '''
+        return {
+            'created': self.created,
+            'listening': [
+                [protocol, port, sockets]
+                for (protocol, port), sockets in self.listening.iteritems()
+            ],
+            'owners': None if self._owners is None else [
+                [inode, pid] for inode, pid in self._owners.iteritems()
+            ],
+        }
+
+    @classmethod
+    def from_entry(cls, proc, entry, cache=None):
+        '''Returns table of :meth:`entry` result.'''
+        return cls(
+            proc,
+            dict(
+                ((protocol, port), [tuple(socket) for socket in sockets])
+                for protocol, port, sockets in entry['listening']
+            ),
+            None if entry['owners'] is None else dict(
+                (inode, pid) for inode, pid in entry['owners']
+            ),
+            entry['created'],
+            cache,
+        )
+
+    @classmethod
+    def snapshot(cls, cache, max_age, proc='/proc'):
+        '''
+        Returns table read at most ``max_age`` seconds ago, by this or
+        another process, from ``cache`` (:class:`.filecache.FileCache`).
+        Reads it again and saves it there if older.
+        '''
+        # Checks of the host share the entry.
+        key = _cache_key(proc)
+        with cache.locked(key):
+            entry = cache.load(key)
+            if entry and 0 <= time.time() - entry['created'] < max_age:
+                return cls.from_entry(proc, entry, cache)
+            table = cls(proc, cache=cache)
+            cache.save(key, table.entry())
+        return table
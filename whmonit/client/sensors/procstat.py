@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+'''
+CPU utilisation from ``/proc/stat`` time counters.
+
+Counters only grow, so utilisation over any period is the difference of two
+samples - no need to sleep between them. :class:`CpuUsage` keeps the
+previous sample, so a sensor holding it gets utilisation since its last run.
+'''
+import os
+
+#: Columns of ``cpu`` lines of ``/proc/stat``, in order.
+CPU_MODES = (
+    'user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal',
+    'guest', 'guest_nice',
+)
+#: Guest time is accounted in user (and nice) time as well.
+_ACCOUNTED = CPU_MODES.index('guest')
+#: Clock ticks per second, unit of ``/proc/stat`` times.
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+def parse_cpu_times(data):
+    '''
+    Parses ``cpu`` lines of ``/proc/stat`` contents.
+
+    :returns: list of (cpu name, tuple of counters in :data:`CPU_MODES`
+        order), the total (``cpu``) first
+    '''
+    times = []
+    for line in data.splitlines():
+        if not line.startswith('cpu'):
+            # CPU lines come first.
+            break
+        fields = line.split()
+        counters = [int(value) for value in fields[1:len(CPU_MODES) + 1]]
+        # Older kernels have fewer columns.
+        counters.extend([0] * (len(CPU_MODES) - len(counters)))
+        times.append((fields[0], tuple(counters)))
+    return times
+
+
+def read_cpu_times(proc='/proc'):
+    '''Reads and parses ``/proc/stat``, see :func:`parse_cpu_times`.'''
+    with open(os.path.join(proc, 'stat'), 'rb') as statf:
+        return parse_cpu_times(statf.read())
+
+
+def utilisation(previous, current):
+    '''
+    Percentage of time spent in each mode between two samples of counters.
+
+    :returns: dict mapping mode to percentage, with ``busy`` (neither idle
+        nor waiting for I/O) added; ``None`` if no time passed
+    '''
+    # Iowait of idle CPUs may go slightly backwards.
+    deltas = [max(now - before, 0) for before, now in zip(previous, current)]
+    total = sum(deltas[:_ACCOUNTED])
+    if not total:
+        return None
+    usage = dict((mode, 100.0 * delta / total) for mode, delta in zip(CPU_MODES, deltas))
+    usage['busy'] = 100.0 - usage['idle'] - usage['iowait']
+    return usage
+
+
+class CpuUsage(object):
+    '''
+    Utilisation of each CPU (and all of them, as ``cpu``) since previous
+    :meth:`update`.
+    '''
+
+    def __init__(self, proc='/proc'):
+        self.proc = proc
+        self._previous = {}
+
+    def update(self, times=None):
+        '''
+        Takes new sample (``times`` as from :func:`read_cpu_times`, read if
+        not given).
+
+        :returns: list of (cpu name, :func:`utilisation`) of CPUs with
+            previous sample and some time passed since it, in ``times`` order
+        '''
+        if times is None:
+            times = read_cpu_times(self.proc)
+        usages = []
+        for name, counters in times:
+            previous = self._previous.get(name)
+            if previous is not None:
+                usage = utilisation(previous, counters)
+                if usage is not None:
+                    usages.append((name, usage))
+        # CPUs going offline are dropped.
+        self._previous = dict(times)
+        return usages
+
+
+#: Columns of :func:`usage_table`.
+TABLE_COLUMNS = ('cpu', 'busy') + CPU_MODES
+
+
+def usage_table(usages):
+    '''
+    Formats :meth:`CpuUsage.update` result of single CPUs as ``;``
+    separated table, header first.
+    '''
+    lines = [';'.join(TABLE_COLUMNS)]
+    for name, usage in usages:
+        if name != 'cpu':
+            lines.append(';'.join([name] + [repr(usage[mode]) for mode in TABLE_COLUMNS[1:]]))
+    return '\n'.join(lines + [''])
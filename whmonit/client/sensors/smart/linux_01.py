@@ -4,8 +4,7 @@
 S.M.A.R.T. sensor for monitoring hard disks
 '''
 
-import re
-from subprocess import check_output, CalledProcessError
+import time
 
 from whmonit.client.sensors import TaskSensorBase
 
@@ -13,6 +12,14 @@ from whmonit.client.sensors import TaskSensorBase
 class Sensor(TaskSensorBase):
     '''
     S.M.A.R.T. sensor class
+
+    Reads all attributes of the disk with a single ``smartctl`` run (JSON
+    output if supported), results are shared with other sensors of the disk
+    (run within ``max_age`` seconds). Disk health is checked every
+    ``health_interval`` seconds only, flags of the last check are sent.
+
+    Values of attribute ``id`` are sent as separate streams, of many
+    ``ids`` as ``attributes`` table.
     '''
 
     name = 'smart'
@@ -44,7 +51,7 @@ class Sensor(TaskSensorBase):
             'type': bool,
             'description': "Some attributes are below threshold (that is are failing)."
         },
-        'below_thresh_past': {
+        'below_thr_past': {
             'type': bool,
             'description': "Status check returned 'DISK OK' but some attributes "
                            "were below threshold in the past (that is were failing but aren't now)."
@@ -57,6 +64,10 @@ class Sensor(TaskSensorBase):
             'type': bool,
             'description': "Self-test log contains errors "
                            "(new results from self-test override previous)."
+        },
+        'attributes': {
+            'type': str,
+            'description': "Table of attributes: id;name;value;worst;threshold;raw_value."
         }
     }
 
@@ -68,6 +79,13 @@ class Sensor(TaskSensorBase):
                 'type': 'string',
                 'description': 'the Id of attribute to be read from S.M.A.R.T'
             },
+            'ids': {
+                'type': 'array',
+                'items': {'type': 'string'},
+                'minItems': 1,
+                'uniqueItems': True,
+                'description': 'Ids of attributes to be read, sent as table'
+            },
             'disk_name': {
                 'type': 'string',
                 'description': 'eg. /dev/sda'
@@ -75,64 +93,54 @@ class Sensor(TaskSensorBase):
             'disk_type': {
                 'type': 'string',
                 'description': 'eg. ata, scsi (all options in smartctl manual)'
+            },
+            'max_age': {
+                'type': 'integer',
+                'minimum': 0,
+                'description': 'Seconds attributes read for other sensors of the disk are '
+                               'reused for, half of sampling period by default'
+            },
+            'health_interval': {
+                'type': 'integer',
+                'minimum': 1,
+                'default': 3600,
+                'description': 'Seconds between disk health checks'
+            },
+            'cache_dir': {
+                'type': 'string',
+                'description': 'Directory of results shared by sensors of the disk'
             }
         },
-        'required': ['id', 'disk_name'],
+        'required': ['disk_name'],
         'additionalProperties': False
     }
 
-    # a regex to find the beginning of table with values sensor looks for
-    beg_attr = re.compile(
-        'ID#\\s*'
-        'ATTRIBUTE_NAME\\s*'
-        'FLAG\\s*'
-        'VALUE\\s*'
-        'WORST\\s*'
-        'THRESH\\s*'
-        'TYPE\\s*'
-        'UPDATED\\s*'
-        'WHEN_FAILED\\s*'
-        'RAW_VALUE'
-    )
+    #: Whether ``smartctl`` supports ``--json``, until it turns out it doesn't.
+    use_json = True
+    cache = None
 
-    def do_run(self):
-        #get output and returncode from smartctl command
-        output = ''
-        returncode = 0
+    def _query(self, health):
+        '''
+        Runs smartctl once, preferably with JSON output.
+
+        :returns: (exit status, attributes), ``None`` on failure
+        '''
+        from .smartctl import FAILED, parse_attributes, parse_json_attributes, run
+
+        disk_name = self.config['disk_name']
         try:
-            if 'disk_type' in self.config:
-                output = check_output([
-                    'smartctl',
-                    '-s',
-                    'on',
-                    '-d',
-                    self.config['disk_type'],
-                    '-AH',
-                    self.config['disk_name']
-                ])
-            else:
-                output = check_output(['smartctl', '-s', 'on', '-AH', self.config['disk_name']])
-        except CalledProcessError as cpe:
-            if cpe.returncode & (1 << 0):
-                self.log(
-                    'command \"{}\" did not parse\n'
-                    'maybe some of the parameters are wrong?'.format(' '.join(cpe.cmd))
-                )
-                return
-            if cpe.returncode & (1 << 1):
-                self.log('failed to open device {}'.format(self.config['disk_name']))
-                return
-            if cpe.returncode & (1 << 2):
-                self.log(
-                    'some SMART or other ATA command to the disk failed'
-                    'or there was a checksum error in a SMART data structure\n'
-                    'the command that caused error: \"{}\"'.format(' '.join(cpe.cmd))
+            command, returncode, output = run(
+                disk_name, self.config.get('disk_type'), health, self.use_json
+            )
+            if self.use_json and returncode & (1 << 0):
+                # Older smartctl has no --json option.
+                command, returncode, output = run(
+                    disk_name, self.config.get('disk_type'), health
                 )
-                return
-            returncode = cpe.returncode
-            output = cpe.output
+                if not returncode & (1 << 0):
+                    Sensor.use_json = False
         except OSError as ose:
-            parameters = ' disk_name \"{}\"'.format(self.config['disk_name'])
+            parameters = ' disk_name \"{}\"'.format(disk_name)
             if 'disk_type' in self.config:
                 parameters += ' disk_type \"{}\"'.format(self.config['disk_type'])
             self.log(
@@ -141,36 +149,103 @@ class Sensor(TaskSensorBase):
                 '(try checking smartmontools pckage)'
                 '\n\nreason from shell: \n{}\n'.format(parameters, ose)
             )
-            return
+            return None
 
-        #get attributes from output
-        # start_attr - index in output where table starts
-        # regex (groups in brackets):
-        # (id attribute_name flag)(value)(\s)(worst)(\s)(thresh)(\s)(type updated when_fail \s)(raw)
-        # this is example row from the output with groups
-        #(  9 Power_On_Hours          0x0012   )(098)(   )(098)
-        #(   )(000)(    )(Old_age   Always       -       )(969)
-        start_attr = self.__class__.beg_attr.search(output).end()
-        attributes = re.compile(
-            '(\\s*{}\\s+[A-Za-z_]+\\s+\\S+\\s+)'
-            '([0-9]{{3}})(\\s+)'
-            '([0-9]{{3}})(\\s+)'
-            '([0-9]{{3}})(\\s+)'
-            '(\\S+\\s+\\S+\\s+\\S+\\s+)(\d+)'.format(self.config['id'])
-        ).search(output, start_attr)
-
-        if attributes is None:
-            self.log('requested id {} not found in output of smartctl'.format(self.config['id']))
+        if returncode & FAILED:
+            if returncode & (1 << 0):
+                self.log(
+                    'command \"{}\" did not parse\n'
+                    'maybe some of the parameters are wrong?'.format(' '.join(command))
+                )
+            elif returncode & (1 << 1):
+                self.log('failed to open device {}'.format(disk_name))
+            else:
+                self.log(
+                    'some SMART or other ATA command to the disk failed'
+                    'or there was a checksum error in a SMART data structure\n'
+                    'the command that caused error: \"{}\"'.format(' '.join(command))
+                )
+            return None
+        if '--json' not in command:
+            return returncode, parse_attributes(output)
+        try:
+            return returncode, parse_json_attributes(output)
+        except ValueError as err:
+            self.log('cannot parse smartctl JSON output: {}'.format(err))
+            return None
+
+    def _read(self, now):
+        '''
+        Returns entry with ``attributes`` of the disk and exit status bits of
+        last ``health`` check, reusing results of other sensors of the disk
+        if recent enough.
+        '''
+        from .smartctl import HEALTH
+
+        max_age = self.config.get('max_age', self.config['sampling_period'] / 2.0)
+        key = '{}:{}'.format(self.config.get('disk_type', ''), self.config['disk_name'])
+        with self.cache.locked(key):
+            entry = self.cache.load(key)
+            health = (
+                'health' not in entry or
+                now - entry['health_time'] >= self.config['health_interval']
+            )
+            if health or now - entry['attributes_time'] >= max_age:
+                result = self._query(health)
+                if result is None:
+                    return None
+                returncode, entry['attributes'] = result
+                entry['attributes_time'] = now
+                if health:
+                    entry['health'] = returncode & HEALTH
+                    entry['health_time'] = now
+                self.cache.save(key, entry)
+        return entry
+
+    def do_run(self):
+        from .smartctl import DiskCache
+
+        if 'id' not in self.config and 'ids' not in self.config:
+            self.log('either id or ids has to be configured')
             return
+        if self.cache is None:
+            try:
+                self.cache = DiskCache(self.config.get('cache_dir'))
+            except OSError as err:
+                self.log('cannot use cache directory: {}'.format(err))
+                return
+        entry = self._read(time.time())
+        if entry is None:
+            return
+        attributes = entry['attributes']
+        returncode = entry['health']
 
-        return (
-            ('value', float(attributes.group(2))),
-            ('worst', float(attributes.group(4))),
-            ('threshold', float(attributes.group(6))),
-            ('raw_value', float(attributes.group(9))),
+        results = [
             ('disk_failing', bool(returncode & (1 << 3))),
             ('below_thresh', bool(returncode & (1 << 4))),
-            ('below_thresh_past', bool(returncode & (1 << 5))),
+            ('below_thr_past', bool(returncode & (1 << 5))),
             ('err_log', bool(returncode & (1 << 6))),
             ('selftest_err_log', bool(returncode & (1 << 7)))
-        )
+        ]
+        if 'ids' in self.config:
+            lines = ['id;name;value;worst;threshold;raw_value']
+            for attr_id in self.config['ids']:
+                attr = attributes.get(attr_id)
+                if attr is None:
+                    self.log('requested id {} not found in output of smartctl'.format(attr_id))
+                    continue
+                lines.append(';'.join([attr_id, str(attr['name'])] + [
+                    repr(attr[column]) for column in ('value', 'worst', 'threshold', 'raw_value')
+                ]))
+            results.append(('attributes', '\n'.join(lines + [''])))
+        if 'id' in self.config:
+            attr = attributes.get(self.config['id'])
+            if attr is None:
+                self.log('requested id {} not found in output of smartctl'.format(
+                    self.config['id']
+                ))
+                return
+            results = [
+                (column, attr[column]) for column in ('value', 'worst', 'threshold', 'raw_value')
+            ] + results
+        return results
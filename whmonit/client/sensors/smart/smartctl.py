@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+'''
+Running ``smartctl`` and parsing its output, shared by sensors of a disk.
+
+Each ``smartctl`` run wakes the disk up, so all attributes are read by a
+single run and the parsed table is kept in a file of :class:`DiskCache`,
+where other sensor processes watching the same disk find it.
+'''
+import json
+import re
+from subprocess import check_output, CalledProcessError
+
+from whmonit.client.sensors.filecache import FileCache
+
+#: Exit status bits meaning ``smartctl`` failed to read anything.
+FAILED = 0b111
+#: Exit status bits of disk health checks.
+HEALTH = 0b11111000
+
+#: Row of attribute table, e.g.
+#: ``  9 Power_On_Hours  0x0012  098  098  000  Old_age  Always  -  969``.
+ATTRIBUTE_ROW = re.compile(
+    r'^\s*(\d+)\s+(\S+)\s+0x[0-9a-fA-F]+\s+'
+    r'(\d+)\s+(\d+)\s+(\d+|---)\s+'
+    r'\S+\s+\S+\s+\S+\s+(\d+)',
+    re.MULTILINE
+)
+#: Leading integer of raw value string, e.g. ``33`` of ``33 (Min/Max 20/45)``.
+RAW_LEADING = re.compile(r'\s*(\d+)')
+
+
+def parse_attributes(output):
+    '''
+    Parses attribute table of ``smartctl -A`` output.
+
+    :returns: dict mapping attribute id (string) to dict of ``name``,
+        ``value``, ``worst``, ``threshold`` and ``raw_value``
+    '''
+    attributes = {}
+    for match in ATTRIBUTE_ROW.finditer(output):
+        attr_id, name, value, worst, threshold, raw_value = match.groups()
+        attributes[str(int(attr_id))] = {
+            'name': name,
+            'value': float(value),
+            'worst': float(worst),
+            'threshold': 0.0 if threshold == '---' else float(threshold),
+            'raw_value': float(raw_value),
+        }
+    return attributes
+
+
+def _raw_value(raw):
+    '''
+    Returns leading integer of ``raw`` value string, as the text table has
+    it, not the packed 48 bit value (e.g. of temperature with min/max).
+    '''
+    match = RAW_LEADING.match(raw['string'])
+    return float(match.group(1) if match else raw['value'])
+
+
+def parse_json_attributes(output):
+    '''Parses ``smartctl --json -A`` output, see :func:`parse_attributes`.'''
+    table = json.loads(output).get('ata_smart_attributes', {}).get('table', [])
+    return dict(
+        (str(attr['id']), {
+            'name': str(attr['name']),
+            'value': float(attr['value']),
+            'worst': float(attr['worst']),
+            'threshold': float(attr.get('thresh', 0)),
+            'raw_value': _raw_value(attr['raw']),
+        }) for attr in table
+    )
+
+
+def run(disk_name, disk_type=None, health=False, use_json=False):
+    '''
+    Runs ``smartctl`` reading attributes (and health, enabling SMART) of
+    the disk.
+
+    :returns: (command, exit status, output)
+    '''
+    command = ['smartctl']
+    if use_json:
+        command.append('--json')
+    if health:
+        command.extend(['-s', 'on'])
+    if disk_type is not None:
+        command.extend(['-d', disk_type])
+    command.extend(['-AH' if health else '-A', disk_name])
+    try:
+        return command, 0, check_output(command)
+    except CalledProcessError as cpe:
+        return command, cpe.returncode, cpe.output
+
+
+class DiskCache(FileCache):
+    '''
+    Results of ``smartctl`` kept in files in ``directory``, one per disk,
+    see :class:`.filecache.FileCache`.
+    '''
+
+    def __init__(self, directory=None):
+        super(DiskCache, self).__init__('smart', directory)
@@ -0,0 +1,3 @@
+'''
+Sensor smart test __init__.
+'''
@@ -0,0 +1,176 @@
+'''
+Tests for whmonit.client.sensors.smart
+'''
+import json
+import os
+from subprocess import CalledProcessError
+
+import pytest
+from mock import Mock
+
+from .. import smartctl
+from ..linux_01 import Sensor
+
+TEXT_OUTPUT = '''smartctl 6.6 2016-05-31 r4324 [x86_64-linux-4.9.0] (local build)
+=== START OF READ SMART DATA SECTION ===
+SMART Attributes Data Structure revision number: 16
+Vendor Specific SMART Attributes with Thresholds:
+ID# ATTRIBUTE_NAME          FLAG     VALUE WORST THRESH TYPE      UPDATED  WHEN_FAILED RAW_VALUE
+  1 Raw_Read_Error_Rate     0x002f   200   200   051    Pre-fail  Always       -       0
+  9 Power_On_Hours          0x0032   098   098   000    Old_age   Always       -       969
+194 Temperature_Celsius     0x0022   117   100   ---    Old_age   Always       -       33 (Min/Max 20/45)
+'''
+
+JSON_OUTPUT = json.dumps({'ata_smart_attributes': {'table': [
+    {'id': 1, 'name': 'Raw_Read_Error_Rate', 'value': 200, 'worst': 200, 'thresh': 51,
+     'raw': {'value': 0, 'string': '0'}},
+    {'id': 9, 'name': 'Power_On_Hours', 'value': 98, 'worst': 98, 'thresh': 0,
+     'raw': {'value': 969, 'string': '969'}},
+    {'id': 194, 'name': 'Temperature_Celsius', 'value': 117, 'worst': 100,
+     # Packed current, min and max temperature.
+     'raw': {'value': 193274839073, 'string': '33 (Min/Max 20/45)'}},
+]}})
+
+EXPECTED = {
+    '1': {'name': 'Raw_Read_Error_Rate', 'value': 200.0, 'worst': 200.0,
+          'threshold': 51.0, 'raw_value': 0.0},
+    '9': {'name': 'Power_On_Hours', 'value': 98.0, 'worst': 98.0,
+          'threshold': 0.0, 'raw_value': 969.0},
+    '194': {'name': 'Temperature_Celsius', 'value': 117.0, 'worst': 100.0,
+            'threshold': 0.0, 'raw_value': 33.0},
+}
+
+
+class FakeSmartctl(object):
+    '''Records commands run, exits with `returncode`.'''
+
+    def __init__(self, json_support=True, returncode=0):
+        self.json_support = json_support
+        self.returncode = returncode
+        self.commands = []
+
+    def __call__(self, command):
+        self.commands.append(command)
+        if '--json' in command:
+            if not self.json_support:
+                raise CalledProcessError(1, command, '=======> UNRECOGNIZED OPTION: json')
+            output = JSON_OUTPUT
+        else:
+            output = TEXT_OUTPUT
+        if self.returncode:
+            raise CalledProcessError(self.returncode, command, output)
+        return output
+
+
+@pytest.fixture
+def fake_smartctl(monkeypatch):
+    '''Fake smartctl with JSON output.'''
+    fake = FakeSmartctl()
+    monkeypatch.setattr(smartctl, 'check_output', fake)
+    monkeypatch.setattr(Sensor, 'use_json', True)
+    return fake
+
+
+def make_sensor(tmpdir, **config):
+    '''Makes sensor with `config`, sharing cache in `tmpdir`.'''
+    config.update(sampling_period=10, disk_name='/dev/sda', cache_dir=str(tmpdir.join('cache')))
+    sensor = Sensor(config, Mock(), None)
+    sensor.log = Mock()
+    return sensor
+
+
+def test_parse_attributes():
+    ''' Text table is parsed. '''
+    assert smartctl.parse_attributes(TEXT_OUTPUT) == EXPECTED
+
+
+def test_parse_json_attributes():
+    ''' JSON output is parsed the same way. '''
+    assert smartctl.parse_json_attributes(JSON_OUTPUT) == EXPECTED
+
+
+def test_cache_directory(tmpdir):
+    ''' Cache directory has to be private. '''
+    directory = tmpdir.join('shared')
+    directory.mkdir()
+    directory.chmod(0o777)
+
+    with pytest.raises(OSError):
+        smartctl.DiskCache(str(directory))
+
+
+class TestSmart(object):
+    ''' Test smart sensor. '''
+
+    def test_attribute(self, tmpdir, fake_smartctl):
+        ''' Single attribute is sent as separate streams. '''
+        result = make_sensor(tmpdir, id='194').do_run()
+
+        assert result[:4] == [
+            ('value', 117.0), ('worst', 100.0), ('threshold', 0.0), ('raw_value', 33.0),
+        ]
+        assert fake_smartctl.commands == [
+            ['smartctl', '--json', '-s', 'on', '-AH', '/dev/sda'],
+        ]
+
+    def test_shared(self, tmpdir, fake_smartctl, monkeypatch):
+        ''' Sensors of the disk share single smartctl run. '''
+        sensors = [make_sensor(tmpdir, id=attr_id) for attr_id in ('1', '9', '194')]
+        now = [1000.0]
+        monkeypatch.setattr('time.time', lambda: now[0])
+
+        for sensor in sensors:
+            sensor.do_run()
+        assert len(fake_smartctl.commands) == 1
+        # Other disk.
+        make_sensor(tmpdir, id='9', disk_type='sat').do_run()
+        assert len(fake_smartctl.commands) == 2
+
+        now[0] += 5
+        assert dict(sensors[1].do_run())['raw_value'] == 969.0
+        assert fake_smartctl.commands[-1] == ['smartctl', '--json', '-A', '/dev/sda']
+        assert len(fake_smartctl.commands) == 3
+
+        now[0] += 3600
+        sensors[0].do_run()
+        assert fake_smartctl.commands[-1][-2] == '-AH'
+
+    def test_health(self, tmpdir, fake_smartctl, monkeypatch):
+        ''' Health flags of last check are sent. '''
+        now = [1000.0]
+        monkeypatch.setattr('time.time', lambda: now[0])
+        sensor = make_sensor(tmpdir, id='9', health_interval=600)
+        fake_smartctl.returncode = (1 << 3) | (1 << 6)
+
+        result = dict(sensor.do_run())
+        assert result['disk_failing'] and result['err_log']
+
+        fake_smartctl.returncode = 0
+        now[0] += 10
+        assert dict(sensor.do_run())['disk_failing']
+        now[0] += 600
+        assert not dict(sensor.do_run())['disk_failing']
+
+    def test_ids(self, tmpdir, fake_smartctl):
+        ''' Many attributes are sent as table. '''
+        fake_smartctl.json_support = False
+        sensor = make_sensor(tmpdir, ids=['9', '194', '5'])
+
+        result = dict(sensor.do_run())
+        assert result['attributes'] == (
+            'id;name;value;worst;threshold;raw_value\n'
+            '9;Power_On_Hours;98.0;98.0;0.0;969.0\n'
+            '194;Temperature_Celsius;117.0;100.0;0.0;33.0\n'
+        )
+        sensor.log.assert_called_once_with('requested id 5 not found in output of smartctl')
+        assert not Sensor.use_json
+        assert [command[1] for command in fake_smartctl.commands] == ['--json', '-s']
+
+    def test_failed(self, tmpdir, fake_smartctl):
+        ''' Nothing is sent nor cached when smartctl fails. '''
+        fake_smartctl.returncode = 1 << 1
+        sensor = make_sensor(tmpdir, id='9')
+
+        assert sensor.do_run() is None
+        sensor.log.assert_called_once_with('failed to open device /dev/sda')
+        assert not [name for name in os.listdir(sensor.cache.directory) if name.endswith('.json')]
@@ -4,17 +4,32 @@
 Active SNMP sensor.
 '''
 
-from timeit import timeit
-
 from whmonit.client.sensors import TaskSensorBase
-from whmonit.common.csvline import write
+from whmonit.common.csvline import write, write_lines
+
+#: Default SNMP port.
+PORT = 161
+
+
+def parse_agent(agent, port=PORT):
+    '''Splits ``host`` or ``host:port`` into (host, port).'''
+    host, sep, agent_port = agent.rpartition(':')
+    if sep and agent_port.isdigit() and ':' not in host:
+        return host, int(agent_port)
+    return agent, port
 
 
 class Sensor(TaskSensorBase):
     '''
     SNMP active class.
 
-    Uses pysnmp library to get states of objects of given OID.
+    Uses pysnmp library to get states of objects of given OID and walk
+    subtrees (with GETBULK) of one or many devices, all polled at once.
+    Engine and transports are kept between runs.
+
+    Polling single ``host``, numeric value of the only OID is sent as
+    ``value``, other values (text ones as before) as ``response``. Values
+    walked or polled from many ``hosts`` go to ``varbinds`` table.
     '''
 
     name = 'snmp_active'
@@ -30,18 +45,36 @@ class Sensor(TaskSensorBase):
         'response': {
             'type': str,
             'description': 'Response to GET in format: csv(OID, response).'
-        }
+        },
+        'value': {
+            'type': float,
+            'description': 'Numeric response to GET of single OID.'
+        },
+        'varbinds': {
+            'type': str,
+            'description': 'Table of values: host;oid;value.'
+        },
+        'agents': {
+            'type': str,
+            'description': 'Table of polled devices: host;response_time;error.'
+        },
     }
     config_schema = {
         '$schema': 'http://json-schema.org/schema#',
         'type': 'object',
         'properties': {
             'host': {'type': 'string'},
+            'hosts': {
+                'type': 'array',
+                'items': {'type': 'string', 'description': 'host or host:port'},
+                'minItems': 1,
+                'uniqueItems': True
+            },
             'port': {
                 'type': 'integer',
                 'minimum': 1,
                 'maximum': 65535,
-                'default': 161
+                'default': PORT
             },
             'device': {'oneOf': [
                 {
@@ -84,74 +117,121 @@ class Sensor(TaskSensorBase):
                 ]},
                 'minItems': 1,
                 'uniqueItems': True
+            },
+            'walk': {
+                'type': 'array',
+                'items': {'type': 'string', 'pattern': '^[0-9]+(\\.[0-9]+)*$'},
+                'description': 'Subtrees to walk, e.g. interface table',
+                'minItems': 1,
+                'uniqueItems': True
+            },
+            'max_repetitions': {
+                'type': 'integer',
+                'minimum': 1,
+                'default': 25,
+                'description': 'OIDs asked for in single GETBULK request'
+            },
+            'max_walk_rows': {
+                'type': 'integer',
+                'minimum': 1,
+                'default': 10000,
+                'description': 'OIDs walked in a subtree at most'
+            },
+            'timeout': {
+                'type': 'number',
+                'minimum': 0,
+                'default': 1,
+                'description': 'Seconds to wait for response'
+            },
+            'retries': {
+                'type': 'integer',
+                'minimum': 0,
+                'default': 1
             }
         },
-        'required': ['host', 'device', 'OIDs'],
+        'required': ['device'],
         'additionalProperties': False
     }
 
-    def do_run(self):
-        '''Returns GET respons from SNMP device'''
-        # R0914 Too many local variables
-        # pylint: disable=R0914
+    #: :class:`.poller.Poller`, made at first run.
+    poller = None
 
-        from pysnmp.entity.rfc3413.oneliner import cmdgen
-        from pysnmp.smi.error import SmiError
+    def _auth(self):
+        '''Returns authentication data of devices.'''
+        from pysnmp.hlapi import asyncore as hlapi
 
         device = self.config['device']
-        if device['version'] == 'v1':
-            args = [device[key] for key in ['index', 'name']].append(0)
-            data = cmdgen.CommunityData(*args)
-        elif device['version'] == 'v2c':
-            args = [device[key] for key in ['index', 'name']]
-            data = cmdgen.CommunityData(*args)
-        else:
-            args = [device[key] for key in ['username', 'authkey', 'privkey']]
-            data = cmdgen.UsmUserData(*args)
+        if device['version'] == 'v3':
+            return hlapi.UsmUserData(device['username'], device['authkey'], device['privkey'])
+        return hlapi.CommunityData(
+            device['index'], device['name'], mpModel=0 if device['version'] == 'v1' else 1
+        )
+
+    def _agents(self):
+        '''Returns list of (name, (host, port)) of devices to poll.'''
+        names = ([self.config['host']] if 'host' in self.config else []) + [
+            name for name in self.config.get('hosts', []) if name != self.config.get('host')
+        ]
+        return [(name, parse_agent(name, self.config['port'])) for name in names]
+
+    def do_run(self):
+        '''Returns GET responses and walked values of SNMP devices.'''
+        from pysnmp.smi.error import SmiError
+        from .poller import Poller, is_numeric, text
+
+        agents = self._agents()
+        oids = self.config.get('OIDs', [])
+        walk = self.config.get('walk', [])
+        if not agents:
+            return (('error_message', 'Either host or hosts has to be configured.'),)
+        if not oids and not walk:
+            return (('error_message', 'Either OIDs or walk has to be configured.'),)
+
+        if self.poller is None:
+            self.poller = Poller(
+                self._auth(), self.config['timeout'], self.config['retries'],
+                self.config['max_repetitions'], self.config['max_walk_rows'],
+            )
         try:
-            cmd_gen = cmdgen.CommandGenerator()
-            ret_vals = {}
-
-            def send_get_request():
-                ''' cmd_gen.getCmd wrapper for timeit usage '''
-                ret_vals['getCmd'] = cmd_gen.getCmd(
-                    data,
-                    cmdgen.UdpTransportTarget(
-                        (self.config['host'], self.config['port'])
-                    ),
-                    *[
-                        x if x.__class__ is str else ((x[0], x[1]), x[2])
-                        for x in self.config['OIDs']
-                    ]
-                )
-            time_elapsed = timeit(send_get_request, number=1)
-            err_indication, err_status, err_index, var_binds = ret_vals['getCmd']
-            if err_indication:
-                return (
-                    ('response_time', time_elapsed),
-                    (
-                        'error_message', 'engine-level error: {}'.format(
-                            err_indication
-                        )
-                    )
-                )
-            else:
-                if err_status:
-                    return (
-                        ('response_time', time_elapsed),
-                        ('error_message', 'PDU-level error: {} at {}'.format(
-                            err_status.prettyPrint(),
-                            err_index and var_binds[int(err_index) - 1] or '?'
-                        ))
-                    )
-                else:
-                    return (
-                        [
-                            ('response', write([name.prettyPrint(), val.prettyPrint()]))
-                            for name, val in var_binds
-                        ]
-                        +
-                        [('response_time', time_elapsed)]
-                    )
+            results = self.poller.poll([agent for _, agent in agents], oids, walk)
         except SmiError as err:
             self.log('Invalid MIB name or symbol. {}'.format(err))
+            return
+
+        single = len(agents) == 1
+        output = []
+        varbinds = []
+        for name, agent in agents:
+            result = results[agent]
+            for error in result.errors:
+                output.append(('error_message', error if single else '{}: {}'.format(name, error)))
+            get = result.get
+            if single:
+                if result.response_time is not None:
+                    output.append(('response_time', result.response_time))
+                if len(get) == 1 and is_numeric(get[0][1]):
+                    output.append(('value', float(get[0][1])))
+                    get = []
+                output.extend(
+                    ('response', write([oid.prettyPrint(), text(val)]))
+                    for oid, val in get if not is_numeric(val)
+                )
+                get = [(oid, val) for oid, val in get if is_numeric(val)]
+            varbinds.extend(
+                (name, oid.prettyPrint(), repr(float(val)) if is_numeric(val) else text(val))
+                for oid, val in get + result.walk
+            )
+        if varbinds:
+            output.append(('varbinds', write_lines(
+                [('host', 'oid', 'value')] + varbinds, delimiter=';'
+            )))
+        if not single:
+            output.append(('agents', write_lines([('host', 'response_time', 'error')] + [
+                (
+                    name,
+                    '' if results[agent].response_time is None
+                    else repr(results[agent].response_time),
+                    '. '.join(results[agent].errors),
+                ) for name, agent in agents
+            ], delimiter=';')))
+        return output
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+'''
+Polling many SNMP agents concurrently on a single pysnmp dispatcher.
+
+Requests to all agents are sent at once and answered in any order, so a run
+takes about as long as the slowest agent, not the sum of all of them. The
+engine and transport targets (resolved agent addresses) are kept between
+:meth:`Poller.poll` calls.
+
+Subtrees (e.g. interface tables) are walked with GETBULK (GETNEXT for SNMP
+v1), each response continuing from the last OID received until the walk
+leaves the subtree. A walk is stopped with an error when an agent returns
+OIDs not increasing (which would make it loop forever) or more than
+``max_walk_rows`` of them.
+'''
+import time
+from functools import partial
+
+from pyasn1.type import univ
+from pysnmp.error import PySnmpError
+from pysnmp.hlapi import asyncore as hlapi
+from pysnmp.proto import rfc1905
+
+
+def object_type(oid):
+    '''
+    Returns ``ObjectType`` of ``oid``, given as dotted string or as (MIB
+    name, MIB symbol, instance id).
+    '''
+    if isinstance(oid, basestring):
+        return hlapi.ObjectType(hlapi.ObjectIdentity(oid))
+    return hlapi.ObjectType(hlapi.ObjectIdentity(*oid))
+
+
+def is_numeric(value):
+    '''Checks whether varbind ``value`` is a number (counter, gauge...).'''
+    return isinstance(value, univ.Integer)
+
+
+def text(value):
+    '''Returns ``value`` of varbind as (UTF-8) string.'''
+    value = value.prettyPrint()
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return value
+
+
+class Result(object):
+    '''Outcome of polling a single agent.'''
+    # R0903: Too few public methods
+    # pylint: disable=R0903
+
+    def __init__(self, started):
+        self.started = started
+        #: Seconds from sending first request to getting last response.
+        self.response_time = None
+        #: List of (OID, value) from GET, in order requested.
+        self.get = []
+        #: List of (OID, value) of walked subtrees.
+        self.walk = []
+        #: List of error messages.
+        self.errors = []
+        self._pending = 0
+
+
+class Poller(object):
+    '''
+    Sends GET requests and walks subtrees of many agents at once, using
+    ``auth`` (``CommunityData`` or ``UsmUserData``).
+    '''
+
+    def __init__(self, auth, timeout=1, retries=1, max_repetitions=25, max_walk_rows=10000):
+        # R0913: Too many arguments
+        # pylint: disable=R0913
+        self.auth = auth
+        self.timeout = timeout
+        self.retries = retries
+        self.max_repetitions = max_repetitions
+        self.max_walk_rows = max_walk_rows
+        self.engine = hlapi.SnmpEngine()
+        self.context = hlapi.ContextData()
+        #: Maps (host, port) to ``UdpTransportTarget``.
+        self._targets = {}
+
+    def target(self, host, port):
+        '''Returns transport target of agent, made once.'''
+        target = self._targets.get((host, port))
+        if target is None:
+            target = self._targets[(host, port)] = hlapi.UdpTransportTarget(
+                (host, port), timeout=self.timeout, retries=self.retries,
+            )
+        return target
+
+    def poll(self, agents, get_oids=(), walk_oids=()):
+        '''
+        GETs ``get_oids`` and walks subtrees of ``walk_oids`` (dotted
+        strings) of each of ``agents`` ((host, port) pairs).
+
+        :returns: dict mapping agent to :class:`Result`
+        '''
+        # W0212: Access to a protected member
+        # pylint: disable=W0212
+        get_types = [object_type(oid) for oid in get_oids]
+        results = {}
+        for agent in agents:
+            result = results[agent] = Result(time.time())
+            try:
+                target = self.target(*agent)
+            except PySnmpError as err:
+                result.errors.append('engine-level error: {}'.format(err))
+                continue
+            if get_types:
+                self._request(hlapi.getCmd, result, target, (), get_types, self._got)
+            for oid in walk_oids:
+                subtree = univ.ObjectIdentifier(oid)
+                self._walk(result, target, subtree, subtree, 0)
+        if not any(result._pending for result in results.values()):
+            # Nothing sent, engine has no transport dispatcher to run.
+            return results
+        self.engine.transportDispatcher.runDispatcher()
+        return results
+
+    def _request(self, command, result, target, args, var_binds, callback):
+        '''
+        Sends request, ``callback`` gets :class:`Result`, transport target
+        and var binds of response.
+        '''
+        # R0913: Too many arguments
+        # W0212: Access to a protected member
+        # pylint: disable=R0913,W0212
+        result._pending += 1
+        command(
+            self.engine, self.auth, target, self.context, *(args + tuple(var_binds)),
+            lookupMib=False, cbFun=self._response, cbCtx=(result, callback, target)
+        )
+
+    def _walk(self, result, target, subtree, start, rows):
+        '''
+        Asks for OIDs following ``start`` in ``subtree``, ``rows`` of it
+        received so far.
+        '''
+        # R0913: Too many arguments
+        # pylint: disable=R0913
+        callback = partial(self._walked, subtree=subtree, last=start, rows=rows)
+        if self.auth.mpModel == 0:
+            # No GETBULK in SNMP v1.
+            self._request(
+                hlapi.nextCmd, result, target, (), [object_type(start.prettyPrint())], callback,
+            )
+        else:
+            self._request(
+                hlapi.bulkCmd, result, target, (0, self.max_repetitions),
+                [object_type(start.prettyPrint())], callback,
+            )
+
+    def _response(self, engine, handle, error_indication, error_status, error_index,
+                  var_binds, context):
+        '''Common callback of all requests.'''
+        # R0913: Too many arguments
+        # W0212: Access to a protected member
+        # W0613: Unused argument
+        # pylint: disable=R0913,W0212,W0613
+        result, callback, target = context
+        result._pending -= 1
+        if error_indication:
+            result.errors.append('engine-level error: {}'.format(error_indication))
+        elif error_status:
+            result.errors.append('PDU-level error: {} at {}'.format(
+                error_status.prettyPrint(),
+                error_index and var_binds[int(error_index) - 1] or '?'
+            ))
+        else:
+            callback(result, target, var_binds)
+        if not result._pending:
+            result.response_time = time.time() - result.started
+
+    @staticmethod
+    def _got(result, target, var_binds):
+        '''Handles GET response.'''
+        # W0613: Unused argument
+        # pylint: disable=W0613
+        result.get.extend(var_binds)
+
+    def _walked(self, result, target, var_table, subtree, last, rows):
+        '''
+        Handles part of walk, asks for more if still in ``subtree``,
+        following ``last`` OID.
+        '''
+        # R0913: Too many arguments
+        # pylint: disable=R0913
+        for row in var_table:
+            name, value = row[0]
+            if isinstance(value, rfc1905.EndOfMibView) or not subtree.isPrefixOf(name):
+                return
+            if name <= last:
+                result.errors.append('walk of {}: OID not increasing: {}'.format(
+                    subtree.prettyPrint(), name.prettyPrint()
+                ))
+                return
+            if rows >= self.max_walk_rows:
+                result.errors.append('walk of {}: more than {} OIDs'.format(
+                    subtree.prettyPrint(), self.max_walk_rows
+                ))
+                return
+            result.walk.append((name, value))
+            last = name
+            rows += 1
+        if var_table:
+            self._walk(result, target, subtree, last, rows)
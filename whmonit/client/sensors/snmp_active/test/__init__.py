@@ -0,0 +1,3 @@
+'''
+Sensor snmp_active test __init__.
+'''
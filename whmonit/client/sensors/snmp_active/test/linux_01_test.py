@@ -0,0 +1,271 @@
+'''
+Tests for whmonit.client.sensors.snmp_active
+'''
+import pytest
+from mock import Mock
+from pysnmp.error import PySnmpError
+from pysnmp.proto import rfc1902, rfc1905
+
+from .. import poller
+from ..linux_01 import Sensor, parse_agent
+
+IF_DESCR = '1.3.6.1.2.1.2.2.1.2'
+IF_IN_OCTETS = '1.3.6.1.2.1.2.2.1.10'
+SYS_DESCR = '1.3.6.1.2.1.1.1.0'
+SYS_UPTIME = '1.3.6.1.2.1.1.3.0'
+
+
+class FakeDispatcher(object):
+    '''Calls back responses queued by requests, in order.'''
+
+    def __init__(self):
+        self.queue = []
+        self.runs = 0
+
+    def runDispatcher(self):
+        '''Delivers responses, also to requests sent meanwhile.'''
+        # C0103: Invalid name
+        # pylint: disable=C0103
+        self.runs += 1
+        while self.queue:
+            callback, args = self.queue.pop(0)
+            callback(*args)
+
+
+class FakeSnmp(object):
+    '''
+    Stands for `pysnmp.hlapi.asyncore`, answering requests from `agents`
+    mapping host to dict of OID to value.
+    '''
+    # C0103: Invalid name
+    # pylint: disable=C0103
+
+    def __init__(self, agents):
+        self.agents = dict(
+            (host, sorted((rfc1902.ObjectName(oid), value) for oid, value in values.iteritems()))
+            for host, values in agents.iteritems()
+        )
+        self.dispatcher = FakeDispatcher()
+        self.requests = []
+        self.targets = 0
+        #: OID a buggy agent always answers GETBULK from, whatever asked.
+        self.restart = None
+
+    def SnmpEngine(self):
+        '''Engine with fake dispatcher.'''
+        return Mock(transportDispatcher=self.dispatcher)
+
+    @staticmethod
+    def ContextData():
+        '''Context.'''
+        return Mock()
+
+    @staticmethod
+    def ObjectIdentity(*args):
+        '''Object is represented by its OID.'''
+        return args[0]
+
+    @staticmethod
+    def ObjectType(identity):
+        '''Object is represented by its OID.'''
+        return identity
+
+    def UdpTransportTarget(self, address, timeout, retries):
+        '''Target is host, unless it can't be resolved.'''
+        # W0613: Unused argument
+        # pylint: disable=W0613
+        if address[0] == 'unknown':
+            raise PySnmpError('Bad IPv4/UDP transport address unknown@161')
+        self.targets += 1
+        return address[0]
+
+    def _respond(self, host, options, table):
+        '''Queues response from `host`.'''
+        if host not in self.agents:
+            args = ('No SNMP response received before timeout', 0, 0, [])
+        else:
+            args = (None, 0, 0, table(self.agents[host]))
+        self.dispatcher.queue.append(
+            (options['cbFun'], (None, None) + args + (options['cbCtx'],))
+        )
+
+    def getCmd(self, engine, auth, host, context, *oids, **options):
+        '''GET.'''
+        # W0613: Unused argument
+        # pylint: disable=W0613
+        self.requests.append(('get', host) + oids)
+
+        def table(values):
+            '''Values of `oids`.'''
+            values = dict(values)
+            return [
+                (rfc1902.ObjectName(oid), values.get(rfc1902.ObjectName(oid), rfc1905.noSuchObject))
+                for oid in oids
+            ]
+        self._respond(host, options, table)
+
+    def bulkCmd(self, engine, auth, host, context, non_repeaters, repetitions, oid,
+                **options):
+        '''GETBULK of single OID.'''
+        # R0913: Too many arguments
+        # W0613: Unused argument
+        # pylint: disable=R0913,W0613
+        self.requests.append(('bulk', host, oid))
+        oid = self.restart or oid
+
+        def table(values):
+            '''`repetitions` values following `oid`.'''
+            rows = [[(name, value)] for name, value in values if name > rfc1902.ObjectName(oid)]
+            rows = rows[:repetitions]
+            if len(rows) < repetitions:
+                rows.append([(rfc1902.ObjectName(oid), rfc1905.endOfMibView)])
+            return rows
+        self._respond(host, options, table)
+
+
+@pytest.fixture
+def snmp(monkeypatch):
+    '''Fake SNMP with two agents.'''
+    values = {
+        SYS_DESCR: rfc1902.OctetString('Linux router'),
+        SYS_UPTIME: rfc1902.TimeTicks(1234),
+        IF_DESCR + '.1': rfc1902.OctetString('lo'),
+        IF_DESCR + '.2': rfc1902.OctetString('eth0'),
+        IF_DESCR + '.3': rfc1902.OctetString('eth1'),
+        IF_IN_OCTETS + '.1': rfc1902.Counter32(10),
+        IF_IN_OCTETS + '.2': rfc1902.Counter32(20),
+        IF_IN_OCTETS + '.3': rfc1902.Counter32(30),
+    }
+    snmp = FakeSnmp({'router': values, 'switch': {SYS_UPTIME: rfc1902.TimeTicks(99)}})
+    monkeypatch.setattr(poller, 'hlapi', snmp)
+    return snmp
+
+
+def make_sensor(**config):
+    '''Makes sensor with `config`.'''
+    config.update(sampling_period=10, device={'version': 'v2c'})
+    sensor = Sensor(config, Mock(), None)
+    sensor.log = Mock()
+    return sensor
+
+
+@pytest.mark.parametrize(('agent', 'expected'), [
+    ('router', ('router', 161)),
+    ('router:1161', ('router', 1161)),
+    ('fe80::1', ('fe80::1', 161)),
+])
+def test_parse_agent(agent, expected):
+    ''' Port is optional. '''
+    assert parse_agent(agent) == expected
+
+
+class TestSnmpActive(object):
+    ''' Test snmp_active sensor. '''
+
+    def test_numeric(self, snmp):
+        ''' Numeric value of single OID goes out as float. '''
+        sensor = make_sensor(host='router', OIDs=[SYS_UPTIME])
+
+        result = dict(sensor.do_run())
+        assert result['value'] == 1234.0
+        assert isinstance(result['response_time'], float)
+        assert set(result) == set(['value', 'response_time'])
+
+    def test_text(self, snmp):
+        ''' Text values go out as CSV, numeric ones as table. '''
+        sensor = make_sensor(host='router', OIDs=[SYS_DESCR, SYS_UPTIME])
+
+        result = sensor.do_run()
+        assert ('response', '{},Linux router'.format(SYS_DESCR)) in result
+        assert dict(result)['varbinds'] == 'host;oid;value\nrouter;{};1234.0\n'.format(SYS_UPTIME)
+
+    def test_reuse(self, snmp):
+        ''' Engine and transports are made once. '''
+        sensor = make_sensor(host='router', OIDs=[SYS_UPTIME])
+
+        sensor.do_run()
+        engine = sensor.poller.engine
+        sensor.do_run()
+        assert sensor.poller.engine is engine
+        assert snmp.targets == 1
+        assert snmp.dispatcher.runs == 2
+
+    def test_walk(self, snmp):
+        ''' Subtree is walked with GETBULK requests until left. '''
+        sensor = make_sensor(host='router', walk=[IF_DESCR], max_repetitions=2)
+
+        lines = dict(sensor.do_run())['varbinds'].splitlines()
+        assert lines == ['host;oid;value'] + [
+            'router;{}.{};{}'.format(IF_DESCR, index, name)
+            for index, name in [(1, 'lo'), (2, 'eth0'), (3, 'eth1')]
+        ]
+        assert snmp.requests == [
+            ('bulk', 'router', IF_DESCR),
+            ('bulk', 'router', IF_DESCR + '.2'),
+        ]
+
+    def test_walk_not_increasing(self, snmp):
+        ''' Walk stops when agent returns OIDs not increasing. '''
+        snmp.restart = IF_DESCR
+        sensor = make_sensor(host='router', walk=[IF_DESCR], max_repetitions=2)
+
+        result = sensor.do_run()
+        assert ('error_message', 'walk of {0}: OID not increasing: {0}.1'.format(IF_DESCR)) \
+            in result
+        assert len(dict(result)['varbinds'].splitlines()) == 3
+        assert len(snmp.requests) == 2
+
+    def test_walk_rows_limit(self, snmp):
+        ''' Walk stops after `max_walk_rows` OIDs. '''
+        sensor = make_sensor(host='router', walk=[IF_DESCR], max_walk_rows=2)
+
+        result = sensor.do_run()
+        assert ('error_message', 'walk of {}: more than 2 OIDs'.format(IF_DESCR)) in result
+        assert len(dict(result)['varbinds'].splitlines()) == 3
+
+    def test_many_hosts(self, snmp):
+        ''' Hosts are polled at once, each failing on its own. '''
+        sensor = make_sensor(
+            hosts=['router', 'switch', 'gone:1161', 'unknown'],
+            OIDs=[SYS_UPTIME], walk=[IF_IN_OCTETS],
+        )
+
+        result = sensor.do_run()
+        assert snmp.dispatcher.runs == 1
+        assert ('error_message',
+                'gone:1161: engine-level error: No SNMP response received before timeout') in result
+        assert ('error_message', 'unknown: engine-level error: '
+                'Bad IPv4/UDP transport address unknown@161') in result
+        result = dict(result)
+        assert 'value' not in result and 'response_time' not in result
+        assert result['varbinds'].splitlines()[1:] == [
+            'router;{};1234.0'.format(SYS_UPTIME),
+            'router;{}.1;10.0'.format(IF_IN_OCTETS),
+            'router;{}.2;20.0'.format(IF_IN_OCTETS),
+            'router;{}.3;30.0'.format(IF_IN_OCTETS),
+            'switch;{};99.0'.format(SYS_UPTIME),
+        ]
+        agents = [line.split(';') for line in result['agents'].splitlines()]
+        assert [agent[0] for agent in agents] == ['host', 'router', 'switch', 'gone:1161', 'unknown']
+        assert agents[4][1:] == [
+            '', 'engine-level error: Bad IPv4/UDP transport address unknown@161'
+        ]
+
+    def test_nothing_sent(self, snmp):
+        ''' Dispatcher is not run when no agent could be asked. '''
+        # Real engine has no dispatcher until a request is sent.
+        snmp.dispatcher = None
+        sensor = make_sensor(host='unknown', OIDs=[SYS_UPTIME])
+
+        assert list(sensor.do_run()) == [
+            ('error_message', 'engine-level error: Bad IPv4/UDP transport address unknown@161'),
+        ]
+
+    def test_nothing_to_poll(self, snmp):
+        ''' Host and OIDs have to be configured. '''
+        assert make_sensor(OIDs=[SYS_UPTIME]).do_run() == (
+            ('error_message', 'Either host or hosts has to be configured.'),
+        )
+        assert make_sensor(host='router').do_run() == (
+            ('error_message', 'Either OIDs or walk has to be configured.'),
+        )
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+'''
+Bounded buffer of received notifications, limiting rate of each sender.
+
+During notification storms (e.g. flapping links) a single device may send
+thousands of traps per second. Traps over the rate limit of their sender,
+or not fitting in the buffer, are dropped and counted instead of being kept
+in an ever growing backlog.
+'''
+from collections import deque
+
+
+class RateLimiter(object):
+    '''
+    Token bucket of each sender: ``rate`` notifications per second, up to
+    ``burst`` at once.
+    '''
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        #: Maps sender to (tokens, time of last update).
+        self._buckets = {}
+
+    def allow(self, sender, now):
+        '''Takes token of ``sender``, returns whether there was one.'''
+        tokens, last = self._buckets.get(sender, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        allowed = tokens >= 1
+        self._buckets[sender] = tokens - allowed, now
+        return allowed
+
+    def prune(self, now):
+        '''Forgets senders whose buckets got full again.'''
+        for sender, (tokens, last) in self._buckets.items():
+            if tokens + (now - last) * self.rate >= self.burst:
+                del self._buckets[sender]
+
+
+class TrapBuffer(object):
+    '''
+    Records of at most ``size`` notifications, in order received, with
+    counts of received and dropped ones.
+    '''
+
+    def __init__(self, size, limiter=None):
+        self.size = size
+        self.limiter = limiter
+        self.records = deque()
+        self.received = 0
+        #: Dropped because the buffer was full.
+        self.dropped = 0
+        #: Dropped because the sender was over its rate limit.
+        self.rate_limited = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, sender, record, now):
+        '''Adds ``record`` from ``sender``, returns whether it was kept.'''
+        self.received += 1
+        if self.limiter is not None and not self.limiter.allow(sender, now):
+            self.rate_limited += 1
+            return False
+        if len(self.records) >= self.size:
+            self.dropped += 1
+            return False
+        self.records.append(record)
+        return True
+
+    def take(self, count):
+        '''Removes and returns up to ``count`` oldest records.'''
+        return [self.records.popleft() for _ in xrange(min(count, len(self.records)))]
+
+    def counts(self):
+        '''
+        Returns (received, dropped, rate_limited) counts since previous call.
+        '''
+        counts = self.received, self.dropped, self.rate_limited
+        self.received = self.dropped = self.rate_limited = 0
+        return counts
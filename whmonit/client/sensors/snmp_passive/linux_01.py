@@ -3,17 +3,36 @@
 '''
 SNMP passive sensor.
 '''
-from datetime import datetime
+import json
 import socket
+import time
 
 from whmonit.client.sensors import AdvancedSensorBase
 
+from .buffer import RateLimiter, TrapBuffer
+
+#: Varbinds of SNMPv2 notifications: sysUpTime.0 and snmpTrapOID.0.
+UPTIME_OID = '1.3.6.1.2.1.1.3.0'
+TRAP_OID = '1.3.6.1.6.3.1.1.4.1.0'
+
 
 class Sensor(AdvancedSensorBase):
     '''
     SNMP passive sensor.
 
     Uses pysnmp library to handle TRAP and INFORM messages.
+
+    Each notification is decoded into a single record (JSON object of
+    ``sender``, ``time``, ``context_engine_id``, ``context_name``,
+    ``trap_oid``, ``uptime`` and remaining ``varbinds``). Records are sent in
+    batches (a single ``str`` result, one record per line) of at most
+    ``batch_size`` records, collected for at most ``batch_interval``
+    milliseconds.
+
+    Records wait for sending in a buffer of ``buffer_size`` records, those
+    not fitting in or over ``rate_limit`` per second of their sender are
+    dropped. Numbers of received and dropped notifications are sent every
+    ``stats_interval`` seconds.
     '''
 
     name = 'snmp_passive'
@@ -95,34 +114,105 @@ class Sensor(AdvancedSensorBase):
                 ]},
                 'minItems': 1,
                 'uniqueItems': True
-            }
+            },
+            'batch_size': {'type': 'integer', 'minimum': 1, 'default': 100},
+            'batch_interval': {'type': 'integer', 'minimum': 0, 'default': 1000},
+            'buffer_size': {'type': 'integer', 'minimum': 1, 'default': 10000},
+            'rate_limit': {
+                'type': 'number',
+                'minimum': 0,
+                'default': 100,
+                'description': 'Notifications per second of single sender, 0 for no limit'
+            },
+            'stats_interval': {'type': 'integer', 'minimum': 1, 'default': 60}
         },
         'required': ['devices'],
         'additionalProperties': False
     }
     streams = {
-        'sender': {
+        'traps': {
             'type': str,
-            'description': "Device's address."
+            'description': 'Received notifications, JSON record per line.'
         },
-        'context_engine_id': {
-            'type': str,
-            'description': "Device's context engine ID."
+        'received': {
+            'type': float,
+            'description': 'Number of notifications received in stats interval.'
         },
-        'context_name': {
-            'type': str,
-            'description': "Device's context name."
+        'dropped': {
+            'type': float,
+            'description': 'Number of notifications dropped because of full buffer.'
         },
-        'variable_name': {
-            'type': str,
-            'description': "Changed variable's name."
-        },
-        'variable_value': {
-            'type': str,
-            'description': "New variable's value."
+        'rate_limited': {
+            'type': float,
+            'description': 'Number of notifications dropped over rate limit of sender.'
         }
     }
 
+    buffer = None
+
+    def start(self):
+        '''Sets up buffer.'''
+        limiter = None
+        if self.config['rate_limit']:
+            limiter = RateLimiter(self.config['rate_limit'])
+        self.buffer = TrapBuffer(self.config['buffer_size'], limiter)
+        self._pending_since = None
+        self._stats_at = time.time()
+
+    def receive(self, sender, context_engine_id, context_name, var_binds, now):
+        '''Buffers notification, sends full batch.'''
+        # R0913: Too many arguments
+        # pylint: disable=R0913
+        record = {
+            'sender': sender,
+            'time': int(now * 1000),
+            'context_engine_id': context_engine_id.prettyPrint(),
+            'context_name': context_name.prettyPrint(),
+            'trap_oid': None,
+            'uptime': None,
+            'varbinds': [],
+        }
+        for name, val in var_binds:
+            name = name.prettyPrint()
+            if name == TRAP_OID:
+                record['trap_oid'] = val.prettyPrint()
+            elif name == UPTIME_OID:
+                record['uptime'] = val.prettyPrint()
+            else:
+                record['varbinds'].append([name, val.prettyPrint()])
+        if not self.buffer.add(sender, record, now):
+            return
+        if self._pending_since is None:
+            self._pending_since = now
+        if len(self.buffer) >= self.config['batch_size']:
+            self.flush()
+
+    def flush(self):
+        '''Sends buffered records in batches.'''
+        batch_size = self.config['batch_size']
+        while len(self.buffer):
+            records = self.buffer.take(batch_size)
+            self.send_results(self.timestamp(), (('traps', ''.join(
+                json.dumps(record, sort_keys=True) + '\n' for record in records
+            )),))
+        self._pending_since = None
+
+    def tick(self, now):
+        '''Sends old enough batch, reports counts when due.'''
+        if (self._pending_since is not None and
+                now - self._pending_since >= self.config['batch_interval'] / 1000.0):
+            self.flush()
+        if now - self._stats_at >= self.config['stats_interval']:
+            received, dropped, rate_limited = self.buffer.counts()
+            self.send_results(self.timestamp(), (
+                ('received', float(received)),
+                ('dropped', float(dropped)),
+                ('rate_limited', float(rate_limited)),
+            ))
+            if self.buffer.limiter is not None:
+                self.buffer.limiter.prune(now)
+            self._stats_at = now
+
     def do_run(self):
         '''
         Run sensor.
@@ -226,21 +316,25 @@ class Sensor(AdvancedSensorBase):
             '''
             Callback function for receiving notifications.
             '''
+            del cb_ctx
             _, transport_address = snmp_engine.msgAndPduDsp.getTransportInfo(
                 state_reference
             )
-            for name, val in var_binds:
-                self.send_results(datetime.utcnow(), (
-                    ('sender', transport_address),
-                    ('context_engine_id', context_engine_id.prettyPrint()),
-                    ('context_name', context_name.prettyPrint()),
-                    ('variable_name', name.prettyPrint()),
-                    ('variable_value', val.prettyPrint())
-                ))
+            self.receive(
+                transport_address[0], context_engine_id, context_name, var_binds, time.time()
+            )
 
+        self.start()
         # Register SNMP Application at the SNMP engine.
         ntfrcv.NotificationReceiver(snmp_engine, cb_fun)
 
+        # Ticks often enough to send batches in time.
+        dispatcher = snmp_engine.transportDispatcher
+        dispatcher.setTimerResolution(
+            min(max(self.config['batch_interval'] / 1000.0, 0.01), 0.5)
+        )
+        dispatcher.registerTimerCbFun(self.tick)
+
         # This job would never finish.
         snmp_engine.transportDispatcher.jobStarted(1)
 
@@ -249,5 +343,5 @@ class Sensor(AdvancedSensorBase):
             snmp_engine.transportDispatcher.runDispatcher()
         except PySnmpError as err:
             snmp_engine.transportDispatcher.closeDispatcher()
-            self.send_results(datetime.utcnow(), (('error', err.message),))
+            self.log(err.message)
             return
@@ -0,0 +1,3 @@
+'''
+Sensor snmp_passive test __init__.
+'''
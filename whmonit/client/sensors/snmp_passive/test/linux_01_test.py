@@ -0,0 +1,125 @@
+'''
+Tests for whmonit.client.sensors.snmp_passive
+'''
+import json
+
+import pytest
+from mock import Mock
+from pysnmp.proto import rfc1902
+
+from ..buffer import RateLimiter, TrapBuffer
+from ..linux_01 import Sensor, TRAP_OID, UPTIME_OID
+
+LINK_DOWN = '1.3.6.1.6.3.1.1.5.3'
+IF_INDEX = '1.3.6.1.2.1.2.2.1.1.2'
+
+
+def make_sensor(**config):
+    '''Makes started sensor with `config`, collecting results.'''
+    config.update(devices=[{'version': 'v2c'}])
+    sensor = Sensor(config, Mock(), None)
+    sensor.results = []
+    sensor.do_send_results = lambda timestamp, data: sensor.results.extend(data)
+    sensor.start()
+    return sensor
+
+
+def link_down(sensor, sender='10.0.0.1', now=0.0):
+    '''Sensor receives linkDown trap.'''
+    sensor.receive(sender, rfc1902.OctetString(hexValue='8000'), rfc1902.OctetString(''), [
+        (rfc1902.ObjectName(UPTIME_OID), rfc1902.TimeTicks(4200)),
+        (rfc1902.ObjectName(TRAP_OID), rfc1902.ObjectName(LINK_DOWN)),
+        (rfc1902.ObjectName(IF_INDEX), rfc1902.Integer(2)),
+    ], now)
+
+
+def traps(sensor):
+    '''Batches sent, as lists of records.'''
+    return [
+        [json.loads(line) for line in value.splitlines()]
+        for stream, value in sensor.results if stream == 'traps'
+    ]
+
+
+def test_rate_limiter():
+    ''' Each sender gets its rate, burst at once. '''
+    limiter = RateLimiter(2)
+
+    assert [limiter.allow('a', 0.0) for _ in xrange(3)] == [True, True, False]
+    assert limiter.allow('b', 0.0)
+    assert limiter.allow('a', 0.5)
+    assert not limiter.allow('a', 0.5)
+
+    limiter.prune(0.6)
+    assert set(limiter._buckets) == set(['a'])
+    limiter.prune(10.0)
+    assert not limiter._buckets
+
+
+def test_buffer():
+    ''' Records over size are dropped and counted. '''
+    buff = TrapBuffer(2, RateLimiter(1, 3))
+
+    assert [buff.add('a', index, 0.0) for index in xrange(4)] == [True, True, False, False]
+    assert buff.take(5) == [0, 1]
+    assert buff.counts() == (4, 1, 1)
+    assert buff.counts() == (0, 0, 0)
+
+
+class TestSnmpPassive(object):
+    ''' Test snmp_passive sensor. '''
+
+    def test_record(self):
+        ''' Notification is a single record. '''
+        sensor = make_sensor(batch_size=1)
+
+        link_down(sensor, now=1.5)
+        assert traps(sensor) == [[{
+            'sender': '10.0.0.1',
+            'time': 1500,
+            'context_engine_id': '0x8000',
+            'context_name': '',
+            'trap_oid': LINK_DOWN,
+            'uptime': '4200',
+            'varbinds': [[IF_INDEX, '2']],
+        }]]
+
+    def test_batches(self):
+        ''' Batches are sent when full or old enough. '''
+        sensor = make_sensor(batch_size=3, batch_interval=500)
+
+        for index in xrange(4):
+            link_down(sensor, '10.0.0.{}'.format(index), now=10.0)
+        assert [len(batch) for batch in traps(sensor)] == [3]
+
+        sensor.tick(10.4)
+        assert len(traps(sensor)) == 1
+        sensor.tick(10.5)
+        assert [batch[0]['sender'] for batch in traps(sensor)] == ['10.0.0.0', '10.0.0.3']
+
+    def test_storm(self):
+        ''' Storm of single sender is rate limited, counts are reported. '''
+        sensor = make_sensor(rate_limit=10, stats_interval=60)
+        sensor._stats_at = 0.0
+
+        for _ in xrange(1000):
+            link_down(sensor, now=1.0)
+        link_down(sensor, '10.0.0.2', now=1.0)
+        sensor.tick(59.0)
+        assert sensor.results[-1][0] == 'traps'
+        assert len(traps(sensor)[0]) == 11
+
+        sensor.tick(60.0)
+        assert sensor.results[-3:] == [
+            ('received', 1001.0), ('dropped', 0.0), ('rate_limited', 990.0),
+        ]
+
+    @pytest.mark.parametrize('rate_limit', [0, 100])
+    def test_full_buffer(self, rate_limit):
+        ''' Records not fitting in buffer are dropped. '''
+        sensor = make_sensor(batch_size=100, buffer_size=5, rate_limit=rate_limit)
+
+        for _ in xrange(8):
+            link_down(sensor)
+        assert len(sensor.buffer) == 5
+        assert sensor.buffer.counts() == (8, 3, 0)
@@ -5,18 +5,42 @@ Processor and memory usage sensor.
 '''
 
 from whmonit.client.sensors import TaskSensorBase
+from whmonit.client.sensors.procfs import ProcMixin, memory_percent, parse_meminfo
+from whmonit.client.sensors.procstat import CPU_MODES, CpuUsage, parse_cpu_times, usage_table
 
 
-class Sensor(TaskSensorBase):
-    '''Cpu and memory sensor class.'''
+def _mode_streams():
+    '''Streams of time spent in each CPU mode.'''
+    return dict(
+        ('cpu_{}'.format(mode), {
+            'type': float,
+            'description': 'Percentage of processors time spent in {} mode.'.format(mode),
+            'unit': '%'
+        })
+        for mode in CPU_MODES
+    )
+
+
+class Sensor(TaskSensorBase, ProcMixin):
+    '''
+    Cpu and memory sensor class.
+
+    Processors usage is computed from time counters sampled at each run,
+    so it covers the time since previous run and is not reported by the
+    first one.
+    '''
 
     name = 'sysstat'
-    streams = {
+    streams = dict(_mode_streams(), **{
         'proc_avg': {
             'type': float,
             'description': 'Processors usage percentage.',
             'unit': '%'
         },
+        'proc_cores': {
+            'type': str,
+            'description': 'Usage and time spent in each mode (percentage) of each processor.'
+        },
         'vmem_perc': {
             'type': float,
             'description': 'Virtual memory usage percentage.',
@@ -27,24 +51,26 @@ class Sensor(TaskSensorBase):
             'description': 'Swap memory usage percentage.',
             'unit': '%'
         }
-    }
+    })
+
+    cpu_usage = None
 
     def do_run(self):
         '''Executes itself.'''
 
-        import psutil
-
-        # Count processor usage in percent for each core and count average.
-        cpu_perc_avg = 0
-        cpu_perc = psutil.cpu_percent(interval=1, percpu=True)
-        for core in range(psutil.cpu_count()):
-            cpu_perc_avg += cpu_perc[core]
-        cpu_perc_avg = cpu_perc_avg / psutil.cpu_count()
+        if self.cpu_usage is None:
+            self.cpu_usage = CpuUsage(self.proc)
+        usages = self.cpu_usage.update(parse_cpu_times(self.read_proc('stat')))
+        result = []
+        if usages and usages[0][0] == 'cpu':
+            total = usages[0][1]
+            result.append(('proc_avg', total['busy']))
+            result.extend(('cpu_{}'.format(mode), total[mode]) for mode in CPU_MODES)
+            result.append(('proc_cores', usage_table(usages)))
 
         # Virtual memory and Swap memory.
-        vmem_perc = psutil.virtual_memory()[2]
-        smem_perc = psutil.swap_memory()[3]
+        vmem_perc, smem_perc = memory_percent(parse_meminfo(self.read_proc('meminfo')))
 
-        return (('proc_avg', float(cpu_perc_avg)),
-                ('vmem_perc', float(vmem_perc)),
-                ('smem_perc', float(smem_perc)))
+        result.extend((('vmem_perc', vmem_perc),
+                       ('smem_perc', smem_perc)))
+        return tuple(result)
@@ -0,0 +1,3 @@
+'''
+Sensor sysstat test __init__.
+'''
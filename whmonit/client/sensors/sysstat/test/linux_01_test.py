@@ -0,0 +1,26 @@
+'''
+Tests for whmonit.client.sensors.sysstat
+'''
+from mock import Mock
+
+from whmonit.client.sensors.test.procstat_test import write_stat
+
+from ..linux_01 import Sensor
+
+
+def test_cpu_usage(tmpdir, monkeypatch):
+    ''' Usage since previous run is reported, starting with the second run. '''
+    monkeypatch.setattr(Sensor, 'proc', str(tmpdir))
+    write_stat(tmpdir, 100, 100, 1000, 10)
+    tmpdir.join('meminfo').write(
+        'MemTotal: 1000 kB\nMemFree: 100 kB\nBuffers: 50 kB\nCached: 100 kB\n'
+        'SwapTotal: 0 kB\nSwapFree: 0 kB\n'
+    )
+    sensor = Sensor({'sampling_period': 1}, Mock(), None)
+
+    assert dict(sensor.do_run()) == {'vmem_perc': 75, 'smem_perc': 0}
+    write_stat(tmpdir, 150, 100, 1050, 0)
+    result = dict(sensor.do_run())
+    assert result['proc_avg'] == 50
+    assert (result['cpu_user'], result['cpu_idle'], result['cpu_iowait']) == (50, 50, 0)
+    assert result['proc_cores'].splitlines()[1].startswith('cpu0;50.0;50.0;')
@@ -149,6 +149,19 @@ class TestClassSensors(object):
             datetime(2006, 1, 2, 3, 4, 5), (('default', 47),)
         )
 
+    def test_send_results_millisecond_timestamps(self):
+        '''
+        Sensors opting in are stamped with integer milliseconds.
+        '''
+        self.sensor.millisecond_timestamps = True
+        with patch('whmonit.client.sensors.base.now_milliseconds') as now:
+            now.return_value = 1136171045000
+            self.sensor.run()
+        self.send_data.assert_called_once_with(
+            1136171045000, (('default', 47),)
+        )
+        assert not self.datetime_mock.utcnow.called
+
     def test_advanced_sensor(self):
         '''
         Tests if a simple AdvanceSensor will periodicaly send data.
@@ -0,0 +1,55 @@
+'''
+Tests for whmonit.client.sensors.counters
+'''
+from ..counters import CounterDeltas, counter_delta, selected
+
+
+def test_counter_delta():
+    ''' Wrapped 32-bit counters give small positive deltas, others were reset. '''
+    assert counter_delta(10, 15) == 5
+    assert counter_delta(2 ** 32 - 5, 5) == 10
+    # Too far from the top to have wrapped.
+    assert counter_delta(1000, 10) is None
+    # 64-bit counters don't wrap.
+    assert counter_delta(2 ** 40, 5) is None
+
+
+def test_selected():
+    ''' Names have to match include patterns and no exclude ones. '''
+    assert selected('sda')
+    assert selected('sda', ['sd*'], ['loop*'])
+    assert not selected('loop0', [], ['loop*'])
+    assert not selected('vda', ['sd*'])
+
+
+def test_counter_deltas():
+    ''' Deltas are computed against previous sample of each device. '''
+    deltas = CounterDeltas()
+    assert deltas.start(100) is None
+    assert deltas.add('sda', (1, 2)) is None
+    assert deltas.add('sdb', (1, 2)) is None
+
+    assert deltas.start(110) == 10
+    assert deltas.add('sda', (5, 2)) == (4, 0)
+    assert deltas.start(120) == 10
+    # Device missing in the last sample is forgotten.
+    assert deltas.add('sdb', (5, 5)) is None
+
+
+def test_counter_reset():
+    ''' Counters going down start over unless wrapped, gauges may go down. '''
+    deltas = CounterDeltas(gauges=(1,))
+    deltas.start(100)
+    deltas.add('eth0', (2 ** 32 - 5, 5))
+    deltas.start(110)
+    assert deltas.add('eth0', (2 ** 32, 1)) == (5, -4)
+    deltas.start(120)
+    # Re-created, counts from zero.
+    assert deltas.add('eth0', (10, 1)) is None
+    deltas.start(130)
+    assert deltas.add('eth0', (15, 1)) == (5, 0)
+    deltas.start(140)
+    deltas.add('eth0', (2 ** 32 - 5, 1))
+    deltas.start(150)
+    # 32-bit counter wrapped.
+    assert deltas.add('eth0', (5, 1)) == (10, 0)
@@ -0,0 +1,110 @@
+'''
+Tests for whmonit.client.sensors.procnet
+'''
+import os
+
+import pytest
+
+from ..filecache import FileCache
+from ..procnet import SocketTable, parse_table
+
+HEADER = (
+    '  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt'
+    '   uid  timeout inode\n'
+)
+
+
+def socket_line(local, remote, state, uid, inode):
+    '''Line of `/proc/net/tcp` like table.'''
+    return (
+        '   0: {} {} {} 00000000:00000000 00:00000000 00000000 {:5d}        0 {}'
+        ' 1 0000000000000000 100 0 0 10 0\n'
+    ).format(local, remote, state, uid, inode)
+
+
+def write_table(proc, name, *lines):
+    '''Writes fake `/proc/net/<name>` table.'''
+    proc.ensure('net', dir=True).join(name).write(HEADER + ''.join(lines))
+
+
+def open_socket(proc, pid, fd, inode):
+    '''Makes `pid` have socket `inode` open as `fd`.'''
+    fddir = proc.ensure(str(pid), 'fd', dir=True)
+    os.symlink('socket:[{}]'.format(inode), str(fddir.join(str(fd))))
+
+
+@pytest.fixture
+def proc(tmpdir):
+    '''Fake `/proc` with sshd on tcp/22 (both v4 and v6) and dns on udp/53.'''
+    proc = tmpdir.mkdir('proc')
+    write_table(
+        proc, 'tcp',
+        socket_line('00000000:0016', '00000000:0000', '0A', 0, 100),
+        # Established connection from local port 22 and to port 80.
+        socket_line('0100007F:0016', '0100007F:BC8F', '01', 0, 101),
+        socket_line('0100007F:BC8F', '0100007F:0050', '01', 1000, 102),
+    )
+    write_table(
+        proc, 'tcp6',
+        socket_line('0' * 32 + ':0016', '0' * 32 + ':0000', '0A', 0, 103),
+    )
+    write_table(proc, 'udp', socket_line('00000000:0035', '00000000:0000', '07', 101, 200))
+    open_socket(proc, 10, 3, 100)
+    open_socket(proc, 10, 4, 103)
+    open_socket(proc, 20, 5, 200)
+    proc.ensure('30', 'fd', dir=True).join('0').write('')
+    return proc
+
+
+class TestSocketTable(object):
+    ''' Test reading listening sockets. '''
+
+    def test_parse_table(self):
+        ''' Only sockets in given state without remote address are listed. '''
+        data = HEADER + socket_line('0100007F:0016', '00000000:0000', '0A', 5, 7) + \
+            socket_line('0100007F:0016', '0100007F:0050', '0A', 5, 8)
+        assert parse_table(data, '0A') == [(22, 5, 7)]
+        assert parse_table(data, '07') == []
+
+    def test_find(self, proc):
+        ''' Sockets are found by protocol and port, IPv6 included. '''
+        table = SocketTable(str(proc))
+
+        assert table.find('tcp', 22) == [(0, 100), (0, 103)]
+        assert table.find('udp', 53) == [(101, 200)]
+        assert table.find('tcp', 80) == []
+        assert table.find('udp', 22) == []
+
+    def test_owner(self, proc):
+        ''' Owners are found by socket inode, remembered for later. '''
+        table = SocketTable(str(proc))
+
+        assert table.owner(200) == 20
+        assert table.owner(100) == 10
+        assert table.owner(102) is None
+
+    def test_snapshot(self, proc, tmpdir, monkeypatch):
+        '''
+        Snapshot is shared through cache until old enough, owners of all
+        sockets are found by the first one asking for an owner.
+        '''
+        clock = [1000.0]
+        monkeypatch.setattr('time.time', lambda: clock[0])
+        cache = FileCache('test', str(tmpdir.join('cache')))
+        table = SocketTable.snapshot(cache, 1, str(proc))
+        assert cache.load('sockets' + str(proc))['owners'] is None
+
+        # Another process.
+        shared = SocketTable.snapshot(FileCache('test', str(tmpdir.join('cache'))), 1, str(proc))
+        assert shared is not table
+        assert shared.find('tcp', 22) == [(0, 100), (0, 103)]
+        assert shared.owner(200) == 20
+
+        # Owners not looked for again.
+        proc.join('10').remove()
+        assert table.owner(100) == 10
+        assert table.owner(102) is None
+
+        clock[0] += 1
+        table = SocketTable.snapshot(cache, 1, str(proc))
+        assert table.owner(100) is None
@@ -0,0 +1,48 @@
+'''
+Tests for whmonit.client.sensors.procstat
+'''
+import pytest
+
+from ..procstat import CpuUsage, parse_cpu_times, usage_table
+
+STAT = '''cpu  {0} 0 {1} {2} {3} 0 0 0 0 0
+cpu0 {0} 0 {1} {2} {3} 0 0 0 0 0
+intr 221101 0 0 0
+ctxt 826233
+'''
+
+
+def write_stat(proc, user, system, idle, iowait):
+    '''Writes fake `/proc/stat` with a single CPU.'''
+    proc.join('stat').write(STAT.format(user, system, idle, iowait))
+
+
+def test_parse_cpu_times():
+    ''' CPU lines are parsed, missing columns are zero. '''
+    data = 'cpu  1 2 3 4 5 6 7\ncpu0 1 2 3 4 5 6 7\ncpu1 0 0 0 0 0 0 0\nintr 1 2\ncpu9 1\n'
+
+    times = parse_cpu_times(data)
+
+    assert [name for name, _ in times] == ['cpu', 'cpu0', 'cpu1']
+    assert times[0][1] == (1, 2, 3, 4, 5, 6, 7, 0, 0, 0)
+
+
+def test_cpu_usage(tmpdir):
+    ''' Usage is computed from counters since previous sample. '''
+    write_stat(tmpdir, 100, 100, 1000, 10)
+    usage = CpuUsage(str(tmpdir))
+
+    assert usage.update() == []
+    write_stat(tmpdir, 130, 110, 1050, 20)
+    usages = usage.update()
+    assert [name for name, _ in usages] == ['cpu', 'cpu0']
+    total = usages[0][1]
+    assert total['user'] == 30
+    assert total['iowait'] == 10
+    assert total['busy'] == pytest.approx(40)
+    # No time passed.
+    assert usage.update() == []
+
+    lines = usage_table(usages).splitlines()
+    assert lines[0].split(';')[:4] == ['cpu', 'busy', 'user', 'nice']
+    assert lines[1].split(';')[:3] == ['cpu0', repr(total['busy']), '30.0']
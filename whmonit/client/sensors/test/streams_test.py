@@ -0,0 +1,29 @@
+'''
+Tests of streams declared by all sensors.
+'''
+import importlib
+import os
+
+import pytest
+
+from whmonit.common.types import SensorName, StreamName
+
+SENSORS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sensor_modules():
+    '''Names of modules of all sensors.'''
+    return sorted(
+        'whmonit.client.sensors.{}.linux_01'.format(name)
+        for name in os.listdir(SENSORS_DIR)
+        if os.path.isfile(os.path.join(SENSORS_DIR, name, 'linux_01.py'))
+    )
+
+
+@pytest.mark.parametrize('module', sensor_modules())
+def test_stream_names(module):
+    ''' Names of sensor and its streams are valid, so results can be shipped. '''
+    sensor = importlib.import_module(module).Sensor
+    SensorName(sensor.name)
+    for stream in sensor.streams:
+        StreamName(stream)
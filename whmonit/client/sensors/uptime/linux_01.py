@@ -3,13 +3,12 @@
 '''
 Uptime sensor.
 '''
-import time
-
 from whmonit.client.sensors import TaskSensorBase
+from whmonit.client.sensors.procfs import ProcMixin
 from whmonit.common.units import unit_reg
 
 
-class Sensor(TaskSensorBase):
+class Sensor(TaskSensorBase, ProcMixin):
     '''Generic 'uptime' sensor.'''
     # W0232: Class has no __init__ method
     # R0201: Method could be a function
@@ -17,6 +16,7 @@ class Sensor(TaskSensorBase):
     # pylint: disable=W0232,R0201,R0903
 
     name = 'uptime'
+    millisecond_timestamps = True
     streams = {
         'default': {
             'type': float,
@@ -27,7 +27,4 @@ class Sensor(TaskSensorBase):
 
     def do_run(self):
         '''Returns system uptime.'''
-        import psutil
-
-        contents = time.time() - psutil.boot_time()
-        return (("default", float(contents)),)
+        return (("default", float(self.read_proc('uptime').split()[0])),)
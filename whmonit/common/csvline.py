@@ -40,3 +40,17 @@ def write(line):
     writer = csv.writer(output, lineterminator='')
     writer.writerow(line)
     return output.getvalue()
+
+
+def write_lines(lines, **fmtparams):
+    '''
+    Writes lists of values into CSV formatted string, each line ended with
+    newline.
+
+    :param lines: Iterable of lists of values.
+    :param fmtparams: Formatting parameters of :func:`csv.writer`.
+    '''
+    output = StringIO()
+    writer = csv.writer(output, lineterminator='\n', **fmtparams)
+    writer.writerows(lines)
+    return output.getvalue()
@@ -0,0 +1,313 @@
+'''
+Columnar serialization of agent batches.
+
+:class:`.AgentRequest` is a list of chunks each carrying its own config id,
+stream name, timestamp and packed value. In a typical batch the same few
+(config_id, stream) pairs repeat over and over, sampled at regular intervals,
+so most of the JSON representation is repeated metadata.
+
+:class:`ColumnarTypeRegistrySerializer` writes :class:`.AgentRequest`
+grouped by (config_id, stream_name, value schema)::
+
+    varint groups
+    group*:
+        varint len, config_id
+        varint len, stream_name
+        varint len, value schema
+        varint count
+        timestamps: zigzag varint first value, zigzag varint first delta,
+                    zigzag varint delta-of-delta for the rest
+        values: ``float`` - varint len, Gorilla XOR bit stream
+                other     - (varint len, serialized value)*
+
+Chunks order is kept within a group only. Regularly sampled streams encode
+timestamps as a single zero byte per chunk, repeated float values as a single
+bit.
+
+Everything except :class:`.AgentRequest` is serialized exactly like
+:class:`.JSONTypeRegistrySerializer` does.
+'''
+
+from __future__ import absolute_import
+
+import struct
+from collections import OrderedDict
+
+from whmonit.common.time import milliseconds_to_datetime, to_milliseconds
+
+from .base import DeserializationError
+from .json import JSONTypeRegistrySerializer
+
+
+_DOUBLE = struct.Struct('!d')
+_UINT64 = struct.Struct('!Q')
+
+
+def write_varint(out, value):
+    '''Appends unsigned ``value`` to ``out`` bytearray as LEB128 varint.'''
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    '''
+    Reads unsigned LEB128 varint from ``data`` bytearray at ``pos``.
+
+    :returns: (value, new position)
+    '''
+    result = 0
+    shift = 0
+    while True:
+        try:
+            byte = data[pos]
+        except IndexError:
+            raise DeserializationError()
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def zigzag(value):
+    '''Maps signed integers to unsigned ones, small magnitudes stay small.'''
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value):
+    '''Reverses :func:`zigzag`.'''
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def write_bytes(out, value):
+    '''Appends length prefixed ``value`` string to ``out``.'''
+    write_varint(out, len(value))
+    out.extend(value)
+
+
+def read_bytes(data, pos):
+    '''
+    Reads length prefixed string from ``data`` at ``pos``.
+
+    :returns: (value, new position)
+    '''
+    length, pos = read_varint(data, pos)
+    if pos + length > len(data):
+        raise DeserializationError()
+    return str(data[pos:pos + length]), pos + length
+
+
+def encode_timestamps(out, timestamps):
+    '''Appends delta-of-delta encoded millisecond ``timestamps`` to ``out``.'''
+    previous = 0
+    previous_delta = 0
+    for i, timestamp in enumerate(timestamps):
+        delta = timestamp - previous
+        write_varint(out, zigzag(delta - previous_delta if i > 1 else delta))
+        previous = timestamp
+        previous_delta = delta
+
+
+def decode_timestamps(data, pos, count):
+    '''
+    Reads ``count`` timestamps written by :func:`encode_timestamps`.
+
+    :returns: (list of timestamps, new position)
+    '''
+    timestamps = []
+    previous = 0
+    delta = 0
+    for i in xrange(count):
+        value, pos = read_varint(data, pos)
+        value = unzigzag(value)
+        delta = delta + value if i > 1 else value
+        previous += delta
+        timestamps.append(previous)
+    return timestamps, pos
+
+
+class BitWriter(object):
+    '''Big-endian bit stream writer backed by ``bytearray``.'''
+
+    def __init__(self):
+        self._out = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value, bits):
+        '''Writes ``bits`` lowest bits of ``value``.'''
+        self._acc = (self._acc << bits) | value
+        self._bits += bits
+        while self._bits >= 8:
+            self._bits -= 8
+            self._out.append((self._acc >> self._bits) & 0xff)
+        self._acc &= (1 << self._bits) - 1
+
+    def getvalue(self):
+        '''Returns written bytes, last byte padded with zeros.'''
+        if self._bits:
+            return self._out + bytearray([(self._acc << (8 - self._bits)) & 0xff])
+        return self._out[:]
+
+
+class BitReader(object):
+    '''Reads bit stream written by :class:`BitWriter`.'''
+
+    def __init__(self, data):
+        self._data = data
+        self._pos = 0
+        self._acc = 0
+        self._bits = 0
+
+    def read(self, bits):
+        '''Reads ``bits`` bits as unsigned integer.'''
+        while self._bits < bits:
+            try:
+                self._acc = (self._acc << 8) | self._data[self._pos]
+            except IndexError:
+                raise DeserializationError()
+            self._pos += 1
+            self._bits += 8
+        self._bits -= bits
+        value = self._acc >> self._bits
+        self._acc &= (1 << self._bits) - 1
+        return value
+
+
+def encode_floats(values):
+    '''
+    Gorilla XOR encoding of ``values``, see "Gorilla: A Fast, Scalable,
+    In-Memory Time Series Database" (Pelkonen et al.), section 4.1.2.
+
+    First value is stored as it is, every next one as XOR with its
+    predecessor: ``0`` when equal, otherwise ``1`` followed by ``0`` and the
+    meaningful bits if they fit in the previous leading/trailing zeros window,
+    or by ``1``, 5 bits of leading zeros count, 6 bits of meaningful bits
+    count and the meaningful bits.
+
+    :returns: bytearray
+    '''
+    writer = BitWriter()
+    previous = None
+    leading = trailing = -1
+    for value in values:
+        bits = _UINT64.unpack(_DOUBLE.pack(value))[0]
+        if previous is None:
+            writer.write(bits, 64)
+            previous = bits
+            continue
+        xored = bits ^ previous
+        previous = bits
+        if not xored:
+            writer.write(0, 1)
+            continue
+        new_leading = min(64 - xored.bit_length(), 31)
+        new_trailing = (xored & -xored).bit_length() - 1
+        if leading >= 0 and new_leading >= leading and new_trailing >= trailing:
+            writer.write(0b10, 2)
+            writer.write(xored >> trailing, 64 - leading - trailing)
+        else:
+            leading, trailing = new_leading, new_trailing
+            meaningful = 64 - leading - trailing
+            writer.write(0b11, 2)
+            writer.write(leading, 5)
+            # 64 meaningful bits do not fit in 6 bits, 0 is never used.
+            writer.write(meaningful & 0x3f, 6)
+            writer.write(xored >> trailing, meaningful)
+    return writer.getvalue()
+
+
+def decode_floats(data, count):
+    '''Reads ``count`` floats written by :func:`encode_floats`.'''
+    reader = BitReader(data)
+    values = []
+    previous = None
+    leading = trailing = 0
+    for _ in xrange(count):
+        if previous is None:
+            previous = reader.read(64)
+        elif reader.read(1):
+            if reader.read(1):
+                leading = reader.read(5)
+                trailing = 64 - leading - (reader.read(6) or 64)
+            previous ^= reader.read(64 - leading - trailing) << trailing
+        values.append(_DOUBLE.unpack(_UINT64.pack(previous))[0])
+    return values
+
+
+class ColumnarTypeRegistrySerializer(JSONTypeRegistrySerializer):
+    '''
+    JSON serializer with columnar binary :class:`.AgentRequest` encoding.
+    '''
+
+    # Methods are named after types so can contains CamelCase.
+    # pylint: disable=C0103
+
+    # There is probably not much sense in documenting these methods with
+    # docstrings.
+    # pylint: disable=C0111
+
+    # `schema` is not always used but this is the method interface.
+    # pylint: disable=W0613
+
+    signature = 2
+
+    def serialize_AgentRequest(self, data):
+        groups = OrderedDict()
+        for chunk in data:
+            key = (chunk.config_id, chunk.stream_name, self.data_to_schema(chunk.data))
+            groups.setdefault(key, []).append(chunk)
+
+        out = bytearray()
+        write_varint(out, len(groups))
+        for (config_id, stream_name, schema), chunks in groups.iteritems():
+            write_bytes(out, str(config_id))
+            write_bytes(out, str(stream_name))
+            write_bytes(out, schema)
+            write_varint(out, len(chunks))
+            encode_timestamps(out, [to_milliseconds(chunk.timestamp) for chunk in chunks])
+            if schema == 'float':
+                write_bytes(out, encode_floats([chunk.data for chunk in chunks]))
+            else:
+                value_serializer = self._select_serializer(type(chunks[0].data))
+                for chunk in chunks:
+                    write_bytes(out, value_serializer(chunk.data))
+        return str(out)
+
+    def deserialize_AgentRequest(self, data, schema):
+        expected_type = self.schema_to_type(schema)
+        chunk_type = self.schema_to_type('AgentRequestChunk')
+        config_id_type = self.schema_to_type('ID')
+        stream_name_type = self.schema_to_type('StreamName')
+
+        data = bytearray(data)
+        result = expected_type()
+        groups, pos = read_varint(data, 0)
+        for _ in xrange(groups):
+            config_id, pos = read_bytes(data, pos)
+            stream_name, pos = read_bytes(data, pos)
+            value_schema, pos = read_bytes(data, pos)
+            count, pos = read_varint(data, pos)
+            config_id = config_id_type.interned(config_id)
+            stream_name = stream_name_type.interned(stream_name)
+
+            timestamps, pos = decode_timestamps(data, pos, count)
+            if value_schema == 'float':
+                encoded, pos = read_bytes(data, pos)
+                values = decode_floats(bytearray(encoded), count)
+            else:
+                value_deserializer = self._select_deserializer(self.schema_to_type(value_schema))
+                values = []
+                for _ in xrange(count):
+                    value, pos = read_bytes(data, pos)
+                    values.append(value_deserializer(value, value_schema))
+
+            for timestamp, value in zip(timestamps, values):
+                result.append(chunk_type(
+                    config_id, stream_name, milliseconds_to_datetime(timestamp), value,
+                ))
+        if pos != len(data):
+            raise DeserializationError()
+        return result
@@ -6,7 +6,9 @@ from __future__ import absolute_import
 
 import json
 
-from whmonit.common.time import datetime_to_milliseconds, milliseconds_to_datetime
+from whmonit.common.time import (
+    datetime_to_milliseconds, milliseconds_to_datetime, check_millisecond_timestamp,
+)
 
 from .base import TypeRegistrySerializationBase, DeserializationError
 
@@ -61,39 +63,50 @@ class JSONTypeRegistrySerializer(TypeRegistrySerializationBase):
         # `nanotime` has range as (1970, 2554).
         return milliseconds_to_datetime(int(data))
 
+    def _serialize_timestamp(self, data):
+        # Integer millisecond timestamps go to the wire as they are, it's the
+        # same representation `serialize_datetime` produces.
+        if isinstance(data, (int, long)):
+            return str(check_millisecond_timestamp(data))
+        return self.serialize(data)
+
     def serialize_TimeSeries(self, data):
-        serialized = []
-        for key, value in data.iteritems():
-            serialized.append([self.serialize(key), self.serialize(value)])
-        return json.dumps(serialized)
+        # Value serializer is selected once for the whole series.
+        value_serializer = self._select_serializer(data.item_type)
+        return json.dumps([
+            ['%d' % timestamp, value_serializer(value)]
+            for timestamp, value in data.itermilliseconds()
+        ])
 
     def deserialize_TimeSeries(self, serialized_data, schema):
         # TODO #601: Optimize serialization/deserialization.
-        # Current implementation is not pretty, it needs 2x memory of actual
-        # data to deserialize it :(.
+        # Parsed JSON document is still kept in memory next to the series
+        # while deserializing, the series itself uses compact arrays though.
 
         expected_type = self.schema_to_type(schema)
         sub_schema = self._unwrap_series(schema)[0]
 
         value_deserializer = self._select_deserializer(expected_type.item_type)
         deserialized_data = json.loads(serialized_data)
-        data = expected_type()
 
         if not isinstance(deserialized_data, list):
             raise DeserializationError()
+        timestamps = []
+        values = []
         for item in deserialized_data:
-            if not isinstance(item, list) or len(item) is not 2:
+            if not isinstance(item, list) or len(item) != 2:
                 raise DeserializationError()
-            data.add(self.deserialize_datetime(item[0], 'datetime'),
-                     value_deserializer(item[1], sub_schema))
+            timestamps.append(int(item[0]))
+            values.append(value_deserializer(item[1], sub_schema))
 
-        return data
+        return expected_type.from_columns(timestamps, values)
 
     def serialize_IntervalSeries(self, data):
-        serialized = [
-            [self.serialize(key[0]), self.serialize(key[1]), self.serialize(value)]
-            for key, value in data.iteritems()]
-        return json.dumps(serialized)
+        value_serializer = self._select_serializer(data.item_type)
+        return json.dumps([
+            ['%d' % start, '%d' % end, value_serializer(value)]
+            for (start, end), value in data.itermilliseconds()
+        ])
 
     def deserialize_IntervalSeries(self, serialized_data, schema):
         # TODO #1408: Implement real serialization of IntervalSeries
@@ -103,33 +116,34 @@ class JSONTypeRegistrySerializer(TypeRegistrySerializationBase):
 
         value_deserializer = self._select_deserializer(expected_type.item_type)
         deserialized_data = json.loads(serialized_data)
-        data = expected_type()
 
         if not isinstance(deserialized_data, list):
             raise DeserializationError()
+        starts = []
+        ends = []
+        values = []
         for item in deserialized_data:
             if not isinstance(item, list) or len(item) != 3:
                 raise DeserializationError()
-            data.add(
-                (self.deserialize_datetime(item[0], 'datetime'),
-                 self.deserialize_datetime(item[1], 'datetime')),
-                value_deserializer(item[2], sub_schema))
+            starts.append(int(item[0]))
+            ends.append(int(item[1]))
+            values.append(value_deserializer(item[2], sub_schema))
 
-        return data
+        return expected_type.from_columns(starts, ends, values)
 
     def serialize_ID(self, data):
         return json.dumps(str(data))
 
     def deserialize_ID(self, data, schema):
         expected_type = self.schema_to_type(schema)
-        return expected_type(str(json.loads(data)))
+        return expected_type.interned(str(json.loads(data)))
 
     def serialize_SensorName(self, data):
         return json.dumps(str(data))
 
     def deserialize_SensorName(self, data, schema):
         expected_type = self.schema_to_type(schema)
-        return expected_type(str(json.loads(data))[:16])
+        return expected_type.interned(str(json.loads(data))[:16])
 
     def serialize_LogDBConfigEntry(self, data):
         _dict = {
@@ -168,13 +182,13 @@ class JSONTypeRegistrySerializer(TypeRegistrySerializationBase):
 
     def deserialize_StreamName(self, data, schema):
         expected_type = self.schema_to_type(schema)
-        return expected_type(str(json.loads(data)))
+        return expected_type.interned(str(json.loads(data)))
 
     def serialize_AgentRequestChunk(self, data):
         _dict = {
             'config_id': self.serialize(data.config_id),
             'stream_name': self.serialize(data.stream_name),
-            'timestamp': self.serialize(data.timestamp),
+            'timestamp': self._serialize_timestamp(data.timestamp),
             'data': self.pack(data.data)
         }
         return json.dumps(_dict)
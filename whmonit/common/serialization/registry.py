@@ -9,6 +9,7 @@ from whmonit.common.error import Error
 from whmonit.common.types import PRIMITIVE_TYPE_REGISTRY as TYPE_REGISTRY
 
 from .base import TypeRegistrySerializationBase
+from .columnar import ColumnarTypeRegistrySerializer
 from .json import JSONTypeRegistrySerializer
 
 
@@ -198,3 +199,4 @@ class SerializerRegistry(object):
 
 SERIALIZERS_REGISTRY = SerializerRegistry()
 SERIALIZERS_REGISTRY.register(JSONTypeRegistrySerializer(TYPE_REGISTRY))
+SERIALIZERS_REGISTRY.register(ColumnarTypeRegistrySerializer(TYPE_REGISTRY))
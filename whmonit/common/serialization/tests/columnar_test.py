@@ -0,0 +1,147 @@
+'''Tests for columnar batch serialization mechanism.'''
+
+import math
+from datetime import datetime
+from random import Random
+
+import pytest
+
+from ...time import milliseconds_to_datetime, to_milliseconds
+from ...types import (
+    AgentRequest, AgentRequestChunk, ID, PrimitiveTypeRegistry, StreamName,
+)
+from ..base import DeserializationError
+from ..columnar import (
+    ColumnarTypeRegistrySerializer, decode_floats, encode_floats,
+)
+from ..json import JSONTypeRegistrySerializer
+from ..registry import SERIALIZERS_REGISTRY
+from .helpers import SerializationTestBase
+
+
+class TestColumnarSerializer(SerializationTestBase):
+    '''Standard test suite for columnar serializer.'''
+    TYPE_REGISTRY = PrimitiveTypeRegistry
+    serializer_class = ColumnarTypeRegistrySerializer
+
+
+def make_serializer():
+    '''Serializer bound to registry with agent request types.'''
+    registry = PrimitiveTypeRegistry()
+    registry.register_many((
+        bool, float, str, datetime, ID, StreamName, AgentRequest, AgentRequestChunk,
+    ))
+    return ColumnarTypeRegistrySerializer(registry)
+
+
+def random_request(random):
+    '''
+    Random batch looking like agent traffic: a few streams sampled at more or
+    less regular intervals, interleaved.
+    '''
+    streams = []
+    for _ in xrange(random.randint(1, 6)):
+        kind = random.choice(('counter', 'noise', 'constant', 'str', 'bool'))
+        streams.append((
+            ID(''.join(random.choice('0123456789abcdefABCDEF') for _ in xrange(40))),
+            StreamName(random.choice(('default', 'error', 'read', 'write'))),
+            kind,
+            random.randint(0, 2 ** 42),
+            random.choice((1, 1000, 10000, 60000)),
+        ))
+
+    request = AgentRequest()
+    for i in xrange(random.randint(0, 300)):
+        config_id, stream_name, kind, start, interval = random.choice(streams)
+        timestamp = start + i * interval + random.choice((0, 0, 0, random.randint(-50, 50)))
+        if kind == 'counter':
+            data = float(i * random.randint(1, 3))
+        elif kind == 'noise':
+            data = random.choice((random.uniform(-1e6, 1e6), random.random(), -0.0,
+                                  float('inf'), 1e-310))
+        elif kind == 'constant':
+            data = 42.5
+        elif kind == 'str':
+            data = 'line {}'.format(random.randint(0, 10))
+        else:
+            data = random.choice((True, False))
+        if random.random() < 0.5:
+            timestamp = milliseconds_to_datetime(timestamp)
+        request.append(AgentRequestChunk(config_id, stream_name, timestamp, data))
+    return request
+
+
+def chunk_key(chunk):
+    '''Comparable representation of a chunk.'''
+    return (chunk.config_id, chunk.stream_name, type(chunk.data), repr(chunk.data),
+            to_milliseconds(chunk.timestamp))
+
+
+@pytest.mark.parametrize('seed', xrange(50))
+def test_agent_request_round_trip(seed):
+    '''Deserialized batch has the same chunks, ordered within streams.'''
+    serializer = make_serializer()
+    request = random_request(Random(seed))
+
+    result = serializer.deserialize(serializer.serialize(request), 'AgentRequest')
+
+    assert isinstance(result, AgentRequest)
+    assert sorted(map(chunk_key, result)) == sorted(map(chunk_key, request))
+    for config_id, stream_name in set((c.config_id, c.stream_name) for c in request):
+        assert [chunk_key(c) for c in result
+                if (c.config_id, c.stream_name) == (config_id, stream_name)] == \
+            [chunk_key(c) for c in request
+             if (c.config_id, c.stream_name) == (config_id, stream_name)]
+    assert all(type(c.config_id) is ID and type(c.stream_name) is StreamName for c in result)
+
+
+@pytest.mark.parametrize('seed', xrange(20))
+def test_floats_round_trip(seed):
+    '''XOR encoding is lossless, bit for bit.'''
+    random = Random(seed)
+    values = [random.choice((
+        random.uniform(-1e300, 1e300), random.random(), float(random.randint(0, 100)),
+        0.0, -0.0, float('inf'), float('-inf'), 5e-324,
+    )) for _ in xrange(random.randint(1, 200))]
+
+    result = decode_floats(encode_floats(values), len(values))
+
+    assert [(x, math.copysign(1, x)) for x in result] == \
+        [(x, math.copysign(1, x)) for x in values]
+
+
+def test_regular_stream_is_compact():
+    '''Regularly sampled constant stream costs about a byte per sample.'''
+    serializer = make_serializer()
+    request = AgentRequest(
+        AgentRequestChunk(ID('a' * 40), StreamName('default'), 1136171045000 + i * 10000, 1.5)
+        for i in xrange(250)
+    )
+
+    serialized = serializer.serialize(request)
+
+    # Header, a byte per timestamp and a bit per value.
+    assert len(serialized) < 80 + 250 * 9 / 8
+    json_serialized = JSONTypeRegistrySerializer(serializer._type_registry).serialize(request)
+    assert len(serialized) * 20 < len(json_serialized)
+
+
+def test_agent_request_truncated():
+    '''Truncated or trailing data is an error.'''
+    serializer = make_serializer()
+    serialized = serializer.serialize(random_request(Random(3)))
+
+    with pytest.raises(DeserializationError):
+        serializer.deserialize(serialized[:-3], 'AgentRequest')
+    with pytest.raises(DeserializationError):
+        serializer.deserialize(serialized + '\0', 'AgentRequest')
+
+
+def test_registered():
+    '''Columnar serializer is available by its signature.'''
+    serializer = SERIALIZERS_REGISTRY[ColumnarTypeRegistrySerializer.signature]
+    request = random_request(Random(7))
+
+    result = SERIALIZERS_REGISTRY.unpack(serializer.pack(request))
+
+    assert sorted(map(chunk_key, result)) == sorted(map(chunk_key, request))
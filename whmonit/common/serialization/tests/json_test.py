@@ -1,6 +1,11 @@
 '''Tests for JSON Serialization mechanism.'''
 
-from ...types import PrimitiveTypeRegistry
+from datetime import datetime
+from random import Random
+
+from ...types import (
+    AgentRequest, AgentRequestChunk, ID, PrimitiveTypeRegistry, StreamName,
+)
 from ..json import JSONTypeRegistrySerializer
 from .helpers import SerializationTestBase
 
@@ -9,3 +14,72 @@ class TestJSONSerializer(SerializationTestBase):
     '''Standard test suite for JSON Serializer.'''
     TYPE_REGISTRY = PrimitiveTypeRegistry
     serializer_class = JSONTypeRegistrySerializer
+
+    def generate_serializer_independent_data(self, type_registry, serializer):
+        '''Adds series containers to standard test data.'''
+        for data in super(TestJSONSerializer, self).generate_serializer_independent_data(
+                type_registry, serializer):
+            yield data
+
+        random = Random(4471)
+        float_series = type_registry.TimeSeries(float)
+        str_series = type_registry.TimeSeries(str)
+        nested_series = type_registry.TimeSeries(float_series)
+        interval_series = type_registry.IntervalSeries(float)
+
+        for size in (0, 1, 50):
+            timestamps = sorted(random.randint(0, 2 ** 42) for _ in xrange(size))
+            values = [random.uniform(-1000, 1000) for _ in xrange(size)]
+            yield {
+                'type_registry': type_registry,
+                'serializer': serializer,
+                'data': float_series.from_columns(timestamps, values),
+                'serialized_schema': 'TimeSeries(float)',
+            }
+            yield {
+                'type_registry': type_registry,
+                'serializer': serializer,
+                'data': str_series.from_columns(timestamps, map(str, values)),
+                'serialized_schema': 'TimeSeries(str)',
+            }
+            yield {
+                'type_registry': type_registry,
+                'serializer': serializer,
+                'data': nested_series.from_columns(
+                    timestamps,
+                    [float_series([(timestamp, value)])
+                     for timestamp, value in zip(timestamps, values)],
+                ),
+                'serialized_schema': 'TimeSeries(TimeSeries(float))',
+            }
+            yield {
+                'type_registry': type_registry,
+                'serializer': serializer,
+                'data': interval_series.from_columns(
+                    timestamps, [timestamp + 10000 for timestamp in timestamps], values,
+                ),
+                'serialized_schema': 'IntervalSeries(float)',
+            }
+
+
+def test_agent_request_chunk_millisecond_timestamp():
+    '''Integer timestamps are serialized the same way as `datetime`.'''
+    registry = PrimitiveTypeRegistry()
+    registry.register_many((
+        float, datetime, ID, StreamName, AgentRequest, AgentRequestChunk,
+    ))
+    serializer = JSONTypeRegistrySerializer(registry)
+
+    def chunk(timestamp):
+        '''Single chunk request with given timestamp.'''
+        return AgentRequest([AgentRequestChunk(
+            ID('a' * 40), StreamName('default'), timestamp, 1.5,
+        )])
+
+    from_int = serializer.serialize(chunk(1136171045123))
+    from_datetime = serializer.serialize(chunk(datetime(2006, 1, 2, 3, 4, 5, 123000)))
+
+    assert from_int == from_datetime
+    result = serializer.deserialize(from_int, 'AgentRequest')[0]
+    assert result.timestamp == datetime(2006, 1, 2, 3, 4, 5, 123000)
+    assert result.data == 1.5
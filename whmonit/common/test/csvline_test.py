@@ -37,3 +37,12 @@ def test_write(data, expected):
     result = csvline.write(data)
 
     assert expected == result
+
+
+def test_write_lines():
+    '''
+    Writes many lines with given delimiter, quoting where needed.
+    '''
+    result = csvline.write_lines([['host', 'value'], ['a', 1], ['b;c', 'x']], delimiter=';')
+
+    assert 'host;value\na;1\n"b;c";x\n' == result
@@ -8,6 +8,8 @@ from whmonit.common.time import MillisecondTimestampTypeError
 from whmonit.common.time import check_millisecond_timestamp
 from whmonit.common.time import datetime_to_milliseconds
 from whmonit.common.time import milliseconds_to_datetime
+from whmonit.common.time import now_milliseconds
+from whmonit.common.time import to_milliseconds
 
 
 class TestTime(unittest.TestCase):
@@ -76,3 +78,27 @@ def test_milliseconds_to_datetime_to_milliseconds(ts, dt):
     assert ts == datetime_to_milliseconds(dt)
     assert milliseconds_to_datetime(datetime_to_milliseconds(dt)) == dt
     assert datetime_to_milliseconds(milliseconds_to_datetime(ts)) == ts
+
+
+@pytest.mark.parametrize(['ts', 'dt'],
+                         [(1381363200000, dt(2013, 10, 10, 0, 0)),
+                          (0, dt(1970, 1, 1)),
+                          (1279655165231L, dt(2010, 7, 20, 19, 46, 5, 231000)),
+                          ])
+def test_to_milliseconds(ts, dt):
+    assert to_milliseconds(ts) == ts
+    assert to_milliseconds(dt) == ts
+
+
+def test_to_milliseconds_invalid():
+    with pytest.raises(MillisecondTimestampTypeError):
+        to_milliseconds('1381363200000')
+
+
+def test_now_milliseconds():
+    before = datetime_to_milliseconds(dt.utcnow())
+    now = now_milliseconds()
+    after = datetime_to_milliseconds(dt.utcnow())
+    assert isinstance(now, (int, long))
+    # `datetime_to_milliseconds` rounds, clock read truncates.
+    assert before - 1 <= now <= after
@@ -0,0 +1,146 @@
+'''
+Tests for types defined in whmonit.common.types.
+'''
+
+import cPickle
+from array import array
+from datetime import datetime
+
+import pytest
+
+from ..error import ArgumentTypeError, ArgumentValueError
+from ..types import (
+    ID, IntervalSeries, NotASpecificTypeError, PRIMITIVE_TYPE_REGISTRY,
+    SensorName, StreamName, TimeSeries,
+)
+
+
+@pytest.mark.parametrize(('type_', 'value'), (
+    (ID, 'a' * 40),
+    (ID, u'0123456789abcdefABCDEF0123456789abcdef01'),
+    (SensorName, 'uptime'),
+    (StreamName, 'default'),
+))
+def test_interned_returns_same_instance(type_, value):
+    '''Repeated values should be constructed only once.'''
+    first = type_.interned(value)
+    second = type_.interned(value)
+
+    assert first is second
+    assert isinstance(first, type_)
+    assert first == type_(value)
+
+
+def test_interned_per_type():
+    '''Types sharing a raw value must not share cached instances.'''
+    assert type(SensorName.interned('default')) is SensorName
+    assert type(StreamName.interned('default')) is StreamName
+
+
+@pytest.mark.parametrize(('type_', 'value', 'error'), (
+    (ID, 'a' * 39, ArgumentValueError),
+    (ID, 'g' * 40, ArgumentValueError),
+    (ID, 40, ArgumentTypeError),
+    (ID, ['a' * 40], ArgumentTypeError),
+    (SensorName, '1sensor', ArgumentValueError),
+    (StreamName, 's' * 17, ArgumentValueError),
+    (StreamName, None, ArgumentTypeError),
+))
+def test_interned_validation(type_, value, error):
+    '''Invalid values raise the same errors as the constructor.'''
+    with pytest.raises(error):
+        type_(value)
+    with pytest.raises(error):
+        type_.interned(value)
+    # Still raises, so nothing got cached.
+    with pytest.raises(error):
+        type_.interned(value)
+
+
+def test_interned_bounded(monkeypatch):
+    '''Cache never grows over `intern_limit`.'''
+    monkeypatch.setattr(StreamName, 'intern_limit', 3)
+    monkeypatch.setattr(StreamName, '_intern_cache', {}, raising=False)
+
+    for i in xrange(10):
+        StreamName.interned('stream{}'.format(i))
+        assert len(StreamName._intern_cache) <= 3
+
+
+def test_series_specialization():
+    '''Specialized series types are cached and valid primitives.'''
+    assert TimeSeries.of(float) is TimeSeries.of(float)
+    assert TimeSeries.of(float) is PRIMITIVE_TYPE_REGISTRY.TimeSeries(float)
+    assert TimeSeries.of(float).__name__ == 'TimeSeries<float>'
+    assert IntervalSeries.of(float) is not TimeSeries.of(float)
+    assert TimeSeries.of(float) in PRIMITIVE_TYPE_REGISTRY
+    assert TimeSeries not in PRIMITIVE_TYPE_REGISTRY
+    assert TimeSeries.of(list) not in PRIMITIVE_TYPE_REGISTRY
+    with pytest.raises(NotASpecificTypeError):
+        TimeSeries()
+
+
+def test_time_series_sorted_add():
+    '''Samples are kept in timestamp order, values in compact arrays.'''
+    series = TimeSeries.of(float)()
+    for timestamp, value in ((30, 3.), (10, 1.), (20, 2), (40, 4.), (20, 2.5)):
+        series.add(timestamp, value)
+
+    assert list(series.timestamps) == [10, 20, 20, 30, 40]
+    assert list(series.values) == [1., 2., 2.5, 3., 4.]
+    assert isinstance(series.values, array)
+    assert series.values.typecode == 'd'
+    assert series.timestamps.itemsize == 8
+
+
+def test_time_series_datetime_api():
+    '''Datetimes are accepted and materialized on demand.'''
+    series = TimeSeries.of(str)([(datetime(2006, 1, 2, 3, 4, 5), 'x')])
+
+    assert list(series.timestamps) == [1136171045000]
+    assert list(series.iteritems()) == [(datetime(2006, 1, 2, 3, 4, 5), 'x')]
+    with pytest.raises(ArgumentTypeError):
+        series.add(0, 1.)
+
+
+def test_time_series_slice():
+    '''Slicing by [start, end) time range.'''
+    series = TimeSeries.of(float).from_columns(range(0, 100, 10), [float(x) for x in xrange(10)])
+
+    assert list(series.slice(15, 45).timestamps) == [20, 30, 40]
+    assert list(series.slice(end=20).values) == [0., 1.]
+    assert list(series.slice(start=90).values) == [9.]
+    assert len(series.slice(50, 10)) == 0
+    assert series.slice() == series
+
+
+def test_time_series_extend():
+    '''Bulk extend keeps the order and checks lengths.'''
+    series = TimeSeries.of(float).from_columns([5, 6], [5., 6.])
+    series.extend([1, 7], [1., 7.])
+
+    assert list(series.itermilliseconds()) == [(1, 1.), (5, 5.), (6, 6.), (7, 7.)]
+    with pytest.raises(ArgumentValueError):
+        series.extend([1, 2], [1.])
+
+
+def test_interval_series():
+    '''Intervals are kept sorted by start.'''
+    series = IntervalSeries.of(float)([((20, 30), 2.), ((0, 50), 1.)])
+
+    assert list(series.itermilliseconds()) == [((0, 50), 1.), ((20, 30), 2.)]
+    assert list(series.slice(10, 40).values) == [2.]
+    with pytest.raises(ArgumentValueError):
+        series.add((10, 5), 1.)
+
+
+@pytest.mark.parametrize('protocol', (0, 2))
+def test_series_pickle(protocol):
+    '''Series and their types pass through multiprocessing queues.'''
+    series_type = IntervalSeries.of(float)
+    series = series_type([((0, 10), 1.)])
+
+    assert cPickle.loads(cPickle.dumps(series_type, protocol)) is series_type
+    assert cPickle.loads(cPickle.dumps(series, protocol)) == series
+    # Receiver "casts" data to stream type.
+    assert series_type(series) == series
@@ -26,12 +26,16 @@ truncated (this can be done using :meth:`check_millisecond_timestamp` method).
 from __future__ import absolute_import
 
 import math
-import calendar
+import time
 from datetime import datetime, timedelta
 
 from .error import Error
 
 
+#: Naive UTC epoch, base for millisecond timestamps arithmetic.
+EPOCH = datetime(1970, 1, 1)
+
+
 def round_time(timestamp, milliseconds=60 * 1000, func=math.ceil):
     '''
     Round time
@@ -103,15 +107,36 @@ def datetime_to_milliseconds(_datetime):
     You shouldn't pass timezone aware :obj:`datetime.datetime`,
     but make sure they are in UTC.'''
 
+    # Plain timedelta arithmetic, much cheaper than building `timetuple` for
+    # `calendar.timegm` - this is called for every row sensors produce.
+    if _datetime.tzinfo is not None:
+        _datetime = _datetime.replace(tzinfo=None)
+    delta = _datetime - EPOCH
     timestamp = int(round(
-        calendar.timegm(_datetime.timetuple()) * 1000
-        + _datetime.microsecond / 1000.0
+        (delta.days * 86400 + delta.seconds) * 1000
+        + delta.microseconds / 1000.0
     ))
 
     check_millisecond_timestamp(timestamp)
     return timestamp
 
 
+def now_milliseconds():
+    ''' Current UTC time as millisecond timestamp (``int``).
+
+    Single clock read, no :obj:`datetime.datetime` is built on the way. '''
+    return int(time.time() * 1000)
+
+
+def to_milliseconds(timestamp):
+    ''' Convert ``timestamp`` given either as millisecond timestamp
+    (``int`` or ``long``) or as naive :obj:`datetime.datetime` to millisecond
+    timestamp. '''
+    if isinstance(timestamp, datetime):
+        return datetime_to_milliseconds(timestamp)
+    return check_millisecond_timestamp(timestamp)
+
+
 def milliseconds_to_datetime(timestamp):
     ''' Convert millisecond timestamp (``int``) to naive :obj:`datetime.datetime`. '''
     check_millisecond_timestamp(timestamp)
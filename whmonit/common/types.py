@@ -133,15 +133,20 @@ To illustrate above rules there is an example:
 
 
 '''
+import copy_reg
 import re
+from array import array
+from bisect import bisect_left, bisect_right
 # TODO #704: short time ranges in datetime object
 from datetime import datetime
 from collections import namedtuple
+from itertools import islice, izip
 from enum import Enum
 
 from whmonit.common.enums import ID_BYTES_LENGTH
 from whmonit.common.error import Error, ArgumentTypeError
 from whmonit.common.error import ArgumentValueError
+from whmonit.common.time import milliseconds_to_datetime, to_milliseconds
 
 
 class RegistryBaseError(Error):
@@ -187,6 +192,335 @@ class GenericContainer(object):
     item_type = None
 
 
+def _timestamps_typecode():
+    '''
+    Returns `array` typecode for 8-byte signed integers. Python 2 has no
+    ``'q'`` typecode, but ``'l'`` is 8 bytes long on 64-bit unices. Doubles
+    hold integer milliseconds exactly otherwise (up to 2**53).
+    '''
+    for typecode in ('q', 'l'):
+        try:
+            if array(typecode).itemsize == 8:
+                return typecode
+        except ValueError:
+            continue
+    return 'd'
+
+
+#: `array` typecode used to keep millisecond timestamps in series.
+TIMESTAMPS_TYPECODE = _timestamps_typecode()
+
+
+class SeriesMeta(type):
+    '''
+    Metaclass for series containers.
+
+    Specialized series types (like ``TimeSeries<float>``) are created on
+    demand, so they can't be pickled by name. Pickling them by their template
+    and `item_type` lets them pass through multiprocessing queues.
+    '''
+
+
+def _specialize_series(template, item_type):
+    '''Unpickling helper, see :class:`SeriesMeta`.'''
+    return template.of(item_type)
+
+
+def _reduce_series_type(cls):
+    '''Pickling helper, see :class:`SeriesMeta`.'''
+    if cls.item_type is None:
+        return cls.__name__
+    return _specialize_series, (cls.template, cls.item_type)
+
+
+copy_reg.pickle(SeriesMeta, _reduce_series_type)
+
+
+class SeriesBase(GenericContainer):
+    '''
+    Base class for containers of values sorted by millisecond timestamps.
+
+    Timestamps are kept in compact `array` buffers, so are the values if
+    `item_type` is ``float``. Other value types are kept in a ``list``.
+
+    Series template can't hold data itself, use :meth:`of` to get type
+    specialized for given `item_type`::
+
+        >>> series = TimeSeries.of(float)()
+        >>> series.add(1000, 1.5)
+
+    Timestamps may be passed either as millisecond timestamps or naive UTC
+    :obj:`datetime.datetime` objects.
+    '''
+    __metaclass__ = SeriesMeta
+
+    #: Generic (not specialized) series type. Set by :meth:`of`.
+    template = None
+
+    def __init__(self):
+        if self.item_type is None:
+            raise NotASpecificTypeError(self.__class__, self.__class__.__name__)
+        self._timestamps = array(TIMESTAMPS_TYPECODE)
+        self._values = self._new_values()
+
+    @classmethod
+    def of(cls, item_type):
+        '''
+        Returns `cls` specialized for `item_type` values. The same type is
+        returned for the same `item_type`.
+        '''
+        template = cls.template or cls
+        # Every template has its own specializations.
+        specializations = template.__dict__.get('_specializations')
+        if specializations is None:
+            specializations = {}
+            setattr(template, '_specializations', specializations)
+        if item_type not in specializations:
+            specializations[item_type] = SeriesMeta(
+                '{}<{}>'.format(template.__name__, item_type.__name__),
+                (template,),
+                {'item_type': item_type, 'template': template,
+                 '__module__': template.__module__},
+            )
+        return specializations[item_type]
+
+    def _new_values(self):
+        '''Empty values buffer.'''
+        if self.item_type is float:
+            return array('d')
+        return []
+
+    def _check_value(self, value):
+        '''Raises `ArgumentTypeError` if `value` doesn't fit the series.'''
+        expected = (float, int, long) if self.item_type is float else self.item_type
+        if not isinstance(value, expected):
+            raise ArgumentTypeError('value', type(value), self.item_type)
+
+    @property
+    def timestamps(self):
+        '''Millisecond timestamps (start timestamps for intervals).'''
+        return self._timestamps
+
+    @property
+    def values(self):
+        '''Values in timestamps order.'''
+        return self._values
+
+    def __len__(self):
+        return len(self._timestamps)
+
+    def __nonzero__(self):
+        return bool(self._timestamps)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def _range(self, start, end):
+        '''
+        Returns (first, last) indexes of items with timestamp in
+        [`start`, `end`). `None` means unbounded.
+        '''
+        first = 0 if start is None else bisect_left(
+            self._timestamps, to_milliseconds(start))
+        last = len(self) if end is None else bisect_left(
+            self._timestamps, to_milliseconds(end))
+        return first, max(first, last)
+
+
+class TimeSeries(SeriesBase):
+    '''
+    Series of (timestamp, value) samples sorted by timestamp.
+
+    Appending samples in order is ``O(1)``, out of order samples are inserted
+    in place.
+    '''
+
+    def __init__(self, items=()):
+        '''
+        :param items: another series of the same type or an iterable of
+            (timestamp, value) pairs
+        '''
+        super(TimeSeries, self).__init__()
+        if isinstance(items, TimeSeries):
+            self.extend(items.timestamps, items.values)
+        else:
+            for timestamp, value in items:
+                self.add(timestamp, value)
+
+    @classmethod
+    def from_columns(cls, timestamps, values):
+        '''
+        Builds series from a sequence of millisecond timestamps and
+        a sequence of values of the same length.
+        '''
+        series = cls()
+        series.extend(timestamps, values)
+        return series
+
+    def add(self, timestamp, value):
+        '''Add a single sample.'''
+        self._check_value(value)
+        timestamp = to_milliseconds(timestamp)
+        timestamps = self._timestamps
+        if not timestamps or timestamps[-1] <= timestamp:
+            timestamps.append(timestamp)
+            self._values.append(value)
+        else:
+            index = bisect_right(timestamps, timestamp)
+            timestamps.insert(index, timestamp)
+            self._values.insert(index, value)
+
+    def extend(self, timestamps, values):
+        '''
+        Add many samples at once, given as a sequence of millisecond
+        timestamps and a sequence of values.
+        '''
+        if len(timestamps) != len(values):
+            raise ArgumentValueError(
+                'values', len(values), 'must have {} items'.format(len(timestamps)))
+        if self.item_type is not float:
+            for value in values:
+                self._check_value(value)
+        in_order = (
+            not self._timestamps or not timestamps or
+            self._timestamps[-1] <= timestamps[0]
+        ) and all(prev <= cur for prev, cur in izip(timestamps, islice(timestamps, 1, None)))
+        if in_order:
+            self._timestamps.extend(array(TIMESTAMPS_TYPECODE, timestamps))
+            self._values.extend(values)
+        else:
+            for timestamp, value in izip(timestamps, values):
+                self.add(timestamp, value)
+
+    def itermilliseconds(self):
+        '''Iterate over (millisecond timestamp, value) pairs.'''
+        return izip(self._timestamps, self._values)
+
+    def iteritems(self):
+        '''Iterate over (``datetime``, value) pairs.'''
+        for timestamp, value in self.itermilliseconds():
+            yield milliseconds_to_datetime(int(timestamp)), value
+
+    def slice(self, start=None, end=None):
+        '''
+        Returns new series with samples from [`start`, `end`) time range.
+        `None` means unbounded.
+        '''
+        first, last = self._range(start, end)
+        series = self.__class__()
+        series.extend(self._timestamps[first:last], self._values[first:last])
+        return series
+
+    def __eq__(self, other):
+        return (
+            type(self) is type(other) and
+            self._timestamps == other.timestamps and
+            self._values == other.values
+        )
+
+    def __repr__(self):
+        return '{}[{}]'.format(self.__class__.__name__, len(self))
+
+
+class IntervalSeries(SeriesBase):
+    '''
+    Series of ((start, end), value) items sorted by interval start.
+    '''
+
+    def __init__(self, items=()):
+        '''
+        :param items: another series of the same type or an iterable of
+            ((start, end), value) pairs
+        '''
+        super(IntervalSeries, self).__init__()
+        self._ends = array(TIMESTAMPS_TYPECODE)
+        if isinstance(items, IntervalSeries):
+            self.extend(items.timestamps, items.ends, items.values)
+        else:
+            for interval, value in items:
+                self.add(interval, value)
+
+    @classmethod
+    def from_columns(cls, starts, ends, values):
+        '''
+        Builds series from sequences of millisecond start and end timestamps
+        and a sequence of values, all of the same length.
+        '''
+        series = cls()
+        series.extend(starts, ends, values)
+        return series
+
+    @property
+    def ends(self):
+        '''Millisecond end timestamps of intervals.'''
+        return self._ends
+
+    def add(self, interval, value):
+        '''Add a single ((start, end), value) item.'''
+        self._check_value(value)
+        start, end = (to_milliseconds(point) for point in interval)
+        if end < start:
+            raise ArgumentValueError('interval', interval, 'must not end before it starts')
+        starts = self._timestamps
+        if not starts or starts[-1] <= start:
+            index = len(starts)
+        else:
+            index = bisect_right(starts, start)
+        starts.insert(index, start)
+        self._ends.insert(index, end)
+        self._values.insert(index, value)
+
+    def extend(self, starts, ends, values):
+        '''
+        Add many items at once, given as sequences of millisecond start and
+        end timestamps and a sequence of values.
+        '''
+        if len(ends) != len(starts):
+            raise ArgumentValueError(
+                'ends', len(ends), 'must have {} items'.format(len(starts)))
+        if len(values) != len(starts):
+            raise ArgumentValueError(
+                'values', len(values), 'must have {} items'.format(len(starts)))
+        for start, end, value in izip(starts, ends, values):
+            self.add((start, end), value)
+
+    def itermilliseconds(self):
+        '''Iterate over ((millisecond start, millisecond end), value) pairs.'''
+        return izip(izip(self._timestamps, self._ends), self._values)
+
+    def iteritems(self):
+        '''Iterate over ((``datetime`` start, ``datetime`` end), value) pairs.'''
+        for (start, end), value in self.itermilliseconds():
+            yield (
+                (milliseconds_to_datetime(int(start)), milliseconds_to_datetime(int(end))),
+                value,
+            )
+
+    def slice(self, start=None, end=None):
+        '''
+        Returns new series with intervals starting in [`start`, `end`) time
+        range. `None` means unbounded.
+        '''
+        first, last = self._range(start, end)
+        series = self.__class__()
+        series.extend(
+            self._timestamps[first:last], self._ends[first:last],
+            self._values[first:last],
+        )
+        return series
+
+    def __eq__(self, other):
+        return (
+            type(self) is type(other) and
+            self._timestamps == other.timestamps and
+            self._ends == other.ends and
+            self._values == other.values
+        )
+
+    def __repr__(self):
+        return '{}[{}]'.format(self.__class__.__name__, len(self))
+
+
 class PrimitiveTypeRegistry(object):
     '''
     Registry-like container for keeping `primitive` types.
@@ -245,6 +579,18 @@ class PrimitiveTypeRegistry(object):
         else:
             raise NotRegisteredError(primitive_type)
 
+    # Method names follow type names.
+    # pylint: disable=C0103
+    @staticmethod
+    def TimeSeries(item_type):
+        '''Returns :class:`TimeSeries` type specialized for `item_type`.'''
+        return TimeSeries.of(item_type)
+
+    @staticmethod
+    def IntervalSeries(item_type):
+        '''Returns :class:`IntervalSeries` type specialized for `item_type`.'''
+        return IntervalSeries.of(item_type)
+
     def is_valid_type(self, primitive_type):
         '''
         Checks if `primitive_type` is a valid type accepted by system.
@@ -284,7 +630,47 @@ LogDBConfigEntry = namedtuple("LogDBConfigEntry", ["config_id", "target_id",
                               "agent_id", "sensor_name", "timestamp", "config"])
 
 
-class ID(unicode):
+class InternedMixin(object):
+    '''
+    Keeps a bounded cache of validated instances keyed by the raw value.
+
+    Validating types (:class:`ID`, :class:`StreamName` ...) run a regex match
+    on every construction, while most of the values flowing through the agent
+    repeat over and over (an agent has only a few hundred distinct
+    ``config_id`` values). :meth:`interned` returns the very same instance
+    for a repeated value and only constructs (and validates) new ones.
+    '''
+    # R0903: Too few public methods.
+    # pylint: disable=R0903
+
+    #: Maximum number of instances cached per type. Cache is flushed
+    #: completely when the limit is hit.
+    intern_limit = 4096
+
+    @classmethod
+    def interned(cls, val):
+        '''
+        Return validated instance of `cls` for `val`. Raises exactly the same
+        exceptions as ``cls(val)`` would, invalid values are never cached.
+        '''
+        # Every subclass gets its own cache, so look in class' own namespace.
+        cache = cls.__dict__.get('_intern_cache')
+        if cache is None:
+            cache = {}
+            setattr(cls, '_intern_cache', cache)
+        try:
+            return cache[val]
+        except (KeyError, TypeError):
+            # TypeError: unhashable value, constructor will reject it.
+            pass
+        instance = cls(val)
+        if len(cache) >= cls.intern_limit:
+            cache.clear()
+        cache[val] = instance
+        return instance
+
+
+class ID(InternedMixin, unicode):
     '''
     Type holds various ids: ``config_id``, ``target_id`` etc. Its purpose
     is similar to ``SensorConfig`` type.
@@ -301,10 +687,10 @@ class ID(unicode):
             raise ArgumentValueError(
                 "val", val,
                 "must match regexp: {} (python SHA1 str)".format(self.regex.pattern))
-        super(ID, self).__init__(val)
+        super(ID, self).__init__()
 
 
-class SensorName(unicode):
+class SensorName(InternedMixin, unicode):
     '''
     Type holds sensor name etc. Its purpose is similar to ``SensorConfig``
     type.
@@ -321,10 +707,10 @@ class SensorName(unicode):
             raise ArgumentValueError(
                 "val", val,
                 "must match regexp: %s" % self.regex.pattern)
-        super(SensorName, self).__init__(val)
+        super(SensorName, self).__init__()
 
 
-class StreamName(unicode):
+class StreamName(InternedMixin, unicode):
     '''
     Type holds stream name. Its purpose is similar to ``SensorConfig`` type.
     '''
@@ -340,7 +726,7 @@ class StreamName(unicode):
             raise ArgumentValueError(
                 "val", val,
                 "must match regexp: %s" % self.regex.pattern)
-        super(StreamName, self).__init__(val)
+        super(StreamName, self).__init__()
 
 
 class AgentRequest(list):
@@ -369,7 +755,7 @@ class AgentRequestChunk(object):
 
         #. config_id
         #. stream_name
-        #. timestamp
+        #. timestamp (naive UTC ``datetime`` or millisecond timestamp ``int``)
         #. data
     '''
     # R0904: Too few public methods.